@@ -19,8 +19,13 @@ setup(
     long_description = ldesc,
     packages = ['spongeshaker'],
     ext_modules = [
-        Extension("spongeshaker.keccak", ["src/keccak.c", "src/pykeccak.c"],
-                  depends = ['src/keccak.h'])],
+        Extension("spongeshaker.keccak",
+                  ["src/keccak.c", "src/keccak_xn.c", "src/strobe.c", "src/pykeccak.c"],
+                  depends = ['src/keccak.h', 'src/strobe.h', 'src/keccak_xn_tmpl.h',
+                             'src/keccak_small_tmpl.h', 'src/keccak_f_tmpl.h'])],
+    entry_points = {
+        'console_scripts': ['spongeshaker-bench = spongeshaker.bench:main'],
+    },
     license = "ISC",
     url = "https://github.com/markokr/spongeshaker",
     maintainer = "Marko Kreen",
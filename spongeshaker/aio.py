@@ -0,0 +1,213 @@
+"""Asyncio wrappers.
+
+Wrap hash, stream cipher or SpongeWrap object, so that it can be
+fed from coroutines without blocking the event loop.  Small chunks
+are processed inline, larger ones in executor thread - the C code
+releases GIL for large buffers, so the loop keeps running meanwhile.
+
+Operations on one object are done in call order, even when
+small chunk arrives while large one is still in executor.
+Data buffers must not be modified until operation finishes.
+
+Requires Python 3.6+.
+"""
+
+import asyncio
+
+__all__ = ['AsyncSpongeHash', 'AsyncStreamCipher', 'AsyncSpongeWrap',
+           'INLINE_LIMIT', 'READ_SIZE']
+
+# larger chunks are sent to executor
+INLINE_LIMIT = 64 * 1024
+
+# read size for StreamReader sources
+READ_SIZE = 256 * 1024
+
+async def _chunks(source, bufsize=READ_SIZE):
+    """Iterate over buffers from StreamReader, async iterator or iterable.
+    """
+    if hasattr(source, 'read'):
+        while True:
+            buf = await source.read(bufsize)
+            if not buf:
+                break
+            yield buf
+    elif hasattr(source, '__aiter__'):
+        async for buf in source:
+            yield buf
+    else:
+        for buf in source:
+            yield buf
+
+class _AsyncWrapper(object):
+    """Runs calls on wrapped object in order, large ones in executor.
+    """
+    __slots__ = ('_obj', '_executor', '_inline_limit', '_lock', '_pending')
+
+    def __init__(self, obj, executor=None, inline_limit=INLINE_LIMIT):
+        self._obj = obj
+        self._executor = executor
+        self._inline_limit = inline_limit
+        self._lock = None
+        self._pending = 0
+
+    @property
+    def wrapped(self):
+        """Wrapped object."""
+        return self._obj
+
+    async def _run(self, func, *args, size=0):
+        # fast path: nothing pending and small chunk.  Lock alone is
+        # not enough, it is unlocked before next waiter wakes up.
+        if size <= self._inline_limit and not self._pending:
+            return func(*args)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        self._pending += 1
+        try:
+            async with self._lock:
+                if size <= self._inline_limit:
+                    return func(*args)
+                loop = asyncio.get_event_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._pending -= 1
+
+class AsyncSpongeHash(_AsyncWrapper):
+    """Async wrapper for :class:`spongeshaker.hashing.SpongeHash`.
+
+    Parameters:
+        obj
+            Hash object, eg. from :func:`spongeshaker.sha3.sha3_256`.
+        executor
+            :class:`concurrent.futures.Executor` for large chunks,
+            default is loop's default executor.
+        inline_limit
+            Chunks up to that size are processed in event loop.
+    """
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self._obj.name
+
+    @property
+    def digest_size(self):
+        return self._obj.digest_size
+
+    @property
+    def block_size(self):
+        return self._obj.block_size
+
+    async def update(self, data):
+        """Update state with data.
+        """
+        await self._run(self._obj.update, data, size=len(memoryview(data)))
+
+    async def update_from(self, source):
+        """Update state with data from StreamReader, async iterator or iterable.
+        """
+        async for buf in _chunks(source):
+            await self.update(buf)
+
+    async def digest(self):
+        """Return digest after pending updates are done.
+        """
+        return await self._run(self._obj.digest)
+
+    async def hexdigest(self):
+        """Return :meth:`digest` value as hexadecimal string.
+        """
+        return await self._run(self._obj.hexdigest)
+
+    async def extract(self, count):
+        """Extract data from hash state.
+        """
+        return await self._run(self._obj.extract, count, size=count)
+
+class AsyncStreamCipher(_AsyncWrapper):
+    """Async wrapper for :class:`spongeshaker.stream_cipher.SpongeStreamCipher`.
+
+    Parameters:
+        obj
+            Cipher object with key added via add_initial_data().
+        executor
+            :class:`concurrent.futures.Executor` for large chunks,
+            default is loop's default executor.
+        inline_limit
+            Chunks up to that size are processed in event loop.
+    """
+    __slots__ = ()
+
+    async def add_initial_data(self, data):
+        """Add key and IV.
+        """
+        await self._run(self._obj.add_initial_data, data, size=len(memoryview(data)))
+
+    async def encrypt(self, plaintext):
+        """Encrypt data, return ciphertext.
+        """
+        return await self._run(self._obj.encrypt, plaintext, size=len(memoryview(plaintext)))
+
+    async def decrypt(self, ciphertext):
+        """Decrypt data, return plaintext.
+        """
+        return await self._run(self._obj.decrypt, ciphertext, size=len(memoryview(ciphertext)))
+
+    async def encrypt_stream(self, source):
+        """Async generator of encrypted chunks from StreamReader, async iterator or iterable.
+        """
+        async for buf in _chunks(source):
+            yield await self.encrypt(buf)
+
+    async def decrypt_stream(self, source):
+        """Async generator of decrypted chunks from StreamReader, async iterator or iterable.
+        """
+        async for buf in _chunks(source):
+            yield await self.decrypt(buf)
+
+class AsyncSpongeWrap(_AsyncWrapper):
+    """Async wrapper for :class:`spongeshaker.spongewrap.SpongeWrap`.
+
+    Parameters:
+        obj
+            SpongeWrap object.
+        executor
+            :class:`concurrent.futures.Executor` for large chunks,
+            default is loop's default executor.
+        inline_limit
+            Chunks up to that size are processed in event loop.
+    """
+    __slots__ = ()
+
+    async def add_header(self, data):
+        """Add header data, that is authenticated but not encrypted.
+        """
+        await self._run(self._obj.add_header, data, size=len(memoryview(data)))
+
+    async def encrypt_body(self, data):
+        """Encrypt body data.
+        """
+        return await self._run(self._obj.encrypt_body, data, size=len(memoryview(data)))
+
+    async def decrypt_body(self, data):
+        """Decrypt body data.
+        """
+        return await self._run(self._obj.decrypt_body, data, size=len(memoryview(data)))
+
+    async def encrypt_stream(self, source):
+        """Async generator of encrypted body chunks.
+        """
+        async for buf in _chunks(source):
+            yield await self.encrypt_body(buf)
+
+    async def decrypt_stream(self, source):
+        """Async generator of decrypted body chunks.
+        """
+        async for buf in _chunks(source):
+            yield await self.decrypt_body(buf)
+
+    async def digest(self, digest_size):
+        """Return authentication tag after pending operations are done.
+        """
+        return await self._run(self._obj.digest, digest_size)
@@ -0,0 +1,272 @@
+"""Benchmarks.
+
+Measures speed of Keccak permutation, :class:`KeccakSponge` methods
+and higher-level APIs over range of message sizes, optionally
+comparing against :mod:`hashlib`.
+
+Usage::
+
+    python -m spongeshaker.bench [--quick] [--json FILE] [--mhz MHZ]
+
+Results are printed as table, with ``--json`` also written
+in machine-readable form.  Cycles/byte is shown only if CPU
+frequency is known, either given with ``--mhz`` or read
+from ``/proc/cpuinfo``.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import argparse
+import hashlib
+import json
+import platform
+import sys
+import timeit
+
+import spongeshaker
+from spongeshaker import keccak
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.prng import KeccakPRNG
+from spongeshaker.sha3 import sha3_224, sha3_256, sha3_384, sha3_512
+from spongeshaker.spongewrap import SpongeWrap
+from spongeshaker.stream_cipher import KeccakStreamCipher
+
+__all__ = ['Bench', 'main']
+
+# SHA3 capacities
+CAPACITIES = (448, 512, 768, 1024)
+
+SIZES = (16, 64, 256, 1024, 4096, 16384, 65536,
+         1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024)
+
+QUICK_SIZES = (16, 256, 4096, 65536)
+
+GROUPS = ('permute', 'sponge', 'hash', 'modes')
+
+SPONGE_METHODS = ('absorb', 'squeeze', 'squeeze_xor', 'encrypt', 'decrypt')
+
+SHA3_FUNCS = {448: sha3_224, 512: sha3_256, 768: sha3_384, 1024: sha3_512}
+
+def cpu_mhz():
+    """Return CPU frequency from /proc/cpuinfo or None.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            for ln in f:
+                if ln.startswith('cpu MHz'):
+                    return float(ln.split(':')[1])
+    except (EnvironmentError, ValueError, IndexError):
+        pass
+    return None
+
+def fmt_size(n):
+    for unit in ('', 'K', 'M'):
+        if n < 1024 or n % 1024:
+            return '%d%s' % (n, unit)
+        n //= 1024
+    return '%dG' % n
+
+class Bench(object):
+    """Benchmark runner.
+
+    Parameters:
+        sizes
+            Message sizes in bytes.
+        capacities
+            Capacities in bits.
+        min_time
+            Minimal time for one measurement in seconds.
+        repeat
+            Number of measurements, best one is taken.
+        mhz
+            CPU frequency for cycles/byte calculation.
+    """
+
+    def __init__(self, sizes=SIZES, capacities=CAPACITIES,
+                 min_time=0.2, repeat=3, mhz=None):
+        self.sizes = sizes
+        self.capacities = capacities
+        self.min_time = min_time
+        self.repeat = repeat
+        self.mhz = mhz
+        self.results = []
+
+    def measure(self, func):
+        """Return best time for one func() call, in seconds.
+        """
+        loops = 1
+        while True:
+            t = timeit.timeit(func, number=loops)
+            if t >= self.min_time / 10 or loops >= 1 << 20:
+                break
+            loops *= 10
+        loops = max(1, int(loops * self.min_time / max(t, 1e-9)))
+        best = min(timeit.repeat(func, number=loops, repeat=self.repeat))
+        return best / loops
+
+    def record(self, group, name, capacity, size, func, nbytes=None):
+        """Measure func and add result.
+        """
+        if nbytes is None:
+            nbytes = size
+        secs = self.measure(func)
+        res = {
+            'group': group,
+            'name': name,
+            'capacity': capacity,
+            'size': size,
+            'ns_per_call': secs * 1e9,
+            'mb_per_sec': nbytes / secs / 1e6,
+            'cycles_per_byte': None,
+        }
+        if self.mhz:
+            res['cycles_per_byte'] = secs * self.mhz * 1e6 / nbytes
+        self.results.append(res)
+        return res
+
+    def bench_permute(self):
+        """Permutation speed, measured via squeeze() of many blocks.
+        """
+        for cap in self.capacities:
+            s = KeccakSponge(cap)
+            nblocks = 1024
+            nbytes = nblocks * s.rbytes
+            res = self.record('permute', 'keccak_f', cap, s.rbytes,
+                              lambda s=s, nbytes=nbytes: s.squeeze(nbytes), nbytes)
+            res['ns_per_call'] /= nblocks
+
+    def bench_sponge(self):
+        """KeccakSponge methods.
+        """
+        for meth in SPONGE_METHODS:
+            for cap in self.capacities:
+                s = KeccakSponge(cap)
+                func = getattr(s, meth)
+                for size in self.sizes:
+                    if meth == 'squeeze':
+                        self.record('sponge', meth, cap, size, lambda func=func, size=size: func(size))
+                    else:
+                        data = b'\0' * size
+                        self.record('sponge', meth, cap, size, lambda func=func, data=data: func(data))
+
+    def bench_hash(self):
+        """One-shot SHA3 hashing, with hashlib for comparison.
+        """
+        for cap in self.capacities:
+            sfunc = SHA3_FUNCS.get(cap)
+            if sfunc is None:
+                continue
+            hname = sfunc.__name__
+            hfunc = getattr(hashlib, hname, None)
+            for size in self.sizes:
+                data = b'\0' * size
+                self.record('hash', hname, cap, size, lambda sfunc=sfunc, data=data: sfunc(data).digest())
+                if hfunc:
+                    self.record('hash', 'hashlib.' + hname, cap, size,
+                                lambda hfunc=hfunc, data=data: hfunc(data).digest())
+
+    def bench_modes(self):
+        """SpongeWrap, stream cipher and PRNG.
+        """
+        for cap in self.capacities:
+            for size in self.sizes:
+                data = b'\0' * size
+
+                def wrap(cap=cap, data=data):
+                    w = SpongeWrap(cap)
+                    w.add_header(b'key')
+                    w.encrypt_body(data)
+                    return w.digest(16)
+                self.record('modes', 'spongewrap', cap, size, wrap)
+
+                def cipher(cap=cap, data=data):
+                    c = KeccakStreamCipher(cap)
+                    c.add_initial_data(b'key')
+                    return c.encrypt(data)
+                self.record('modes', 'stream_cipher', cap, size, cipher)
+
+                prng = KeccakPRNG(cap)
+                prng.add_entropy(b'seed')
+                self.record('modes', 'prng', cap, size,
+                            lambda prng=prng, size=size: prng.get_random_bytes(size))
+
+    def run(self, groups=GROUPS, out=None):
+        """Run benchmark groups, print results to out.
+        """
+        for grp in groups:
+            start = len(self.results)
+            getattr(self, 'bench_' + grp)()
+            if out:
+                self.show(self.results[start:], out)
+        return self.results
+
+    def show(self, results, out):
+        """Print results as table.
+        """
+        for r in results:
+            cpb = r['cycles_per_byte']
+            cpb = ('%8.2f c/b' % cpb) if cpb is not None else ''
+            print('%-8s %-22s c=%-5d %6s %12.1f ns %10.2f MB/s %s' % (
+                  r['group'], r['name'], r['capacity'], fmt_size(r['size']),
+                  r['ns_per_call'], r['mb_per_sec'], cpb), file=out)
+        out.flush()
+
+    def info(self):
+        """Environment information for JSON output.
+        """
+        return {
+            'version': spongeshaker.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'backend': getattr(keccak, 'backend', None),
+            'batch_backend': getattr(keccak, 'batch_backend', None),
+            'mhz': self.mhz,
+            'min_time': self.min_time,
+            'repeat': self.repeat,
+        }
+
+def main(argv=None):
+    """Command-line entry point.
+    """
+    p = argparse.ArgumentParser(prog='spongeshaker-bench',
+                                description='Benchmark spongeshaker.')
+    p.add_argument('--quick', action='store_true',
+                   help='small message sizes and short measurements')
+    p.add_argument('--group', action='append', choices=GROUPS,
+                   help='benchmark group to run, can be repeated (default: all)')
+    p.add_argument('--sizes', type=lambda v: [int(x) for x in v.split(',')],
+                   help='comma-separated message sizes in bytes')
+    p.add_argument('--capacity', type=int, action='append',
+                   help='capacity in bits, can be repeated (default: SHA3 capacities)')
+    p.add_argument('--min-time', type=float,
+                   help='minimal time for one measurement in seconds')
+    p.add_argument('--repeat', type=int, default=3,
+                   help='measurements per result, best is taken (default: 3)')
+    p.add_argument('--mhz', type=float,
+                   help='CPU frequency for cycles/byte (default: from /proc/cpuinfo)')
+    p.add_argument('--json', metavar='FILE',
+                   help='write results as JSON to FILE, "-" for stdout')
+    args = p.parse_args(argv)
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    min_time = args.min_time or (0.02 if args.quick else 0.2)
+    bench = Bench(sizes, args.capacity or CAPACITIES, min_time,
+                  args.repeat, args.mhz or cpu_mhz())
+
+    out = sys.stdout if args.json != '-' else sys.stderr
+    results = bench.run(args.group or GROUPS, out)
+
+    if args.json:
+        doc = {'info': bench.info(), 'results': results}
+        if args.json == '-':
+            json.dump(doc, sys.stdout, indent=1, sort_keys=True)
+            print()
+        else:
+            with open(args.json, 'w') as f:
+                json.dump(doc, f, indent=1, sort_keys=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,9 +3,24 @@
 
 from __future__ import division, absolute_import, print_function
 
-from spongeshaker.util import tohex
+import io
+import mmap
+import os
+import stat
+import struct
 
-__all__ = ['SpongeHash', 'SpongeHashInvalidState']
+from spongeshaker.util import tohex, pack_state, unpack_state, sponge_from_bytes, _restore
+
+__all__ = ['SpongeHash', 'SpongeHashInvalidState', 'hash_file']
+
+# buffer size for readinto()
+FILE_BUFSIZE = 256 * 1024
+
+# slice size when absorbing from mmap
+MMAP_CHUNK = 16 * 1024 * 1024
+
+# hash_file() algorithms that can be given by name
+_FILE_HASHES = ('sha3_224', 'sha3_256', 'sha3_384', 'sha3_512', 'shake128', 'shake256')
 
 class SpongeHashInvalidState(Exception):
     """Extracting has started, cannot .update()/.digest()."""
@@ -13,12 +28,12 @@ class SpongeHashInvalidState(Exception):
 class SpongeHash(object):
     """Generic :mod:`hashlib` compatible hash function API.
     """
-    __slots__ = ('name', 'block_size', 'digest_size', '_padding', '_sponge', '_extracting')
+    __slots__ = ('name', 'block_size', 'digest_size', '_padding', '_sponge', '_extracting', '_prefix')
 
     def __init__(self, capacity_bits, output_bits,
                  data=None, name=None,
                  sponge_class=None, padding=None,
-                 _sponge=None, _extracting=False):
+                 _sponge=None, _extracting=False, _prefix=b''):
         """Initialize sponge instance with specified parameters.
 
         Parameters:
@@ -37,7 +52,12 @@ class SpongeHash(object):
                 Start bytes for padding bytes to use, final bit
                 is always added.
         """
-        self._sponge = _sponge or sponge_class(capacity_bits)
+        self._prefix = _prefix
+        if _sponge is None:
+            _sponge = sponge_class(capacity_bits)
+            if _prefix:
+                _sponge.absorb(_prefix)
+        self._sponge = _sponge
         self._padding = padding
         self.name = name or _sponge.name
         self.block_size, rem1 = divmod(self._sponge.rate, 8)
@@ -54,7 +74,40 @@ class SpongeHash(object):
         clone = self._sponge.copy()
         return SpongeHash(clone.capacity, self.digest_size * 8,
                 None, self.name, None, self._padding,
-                clone, self._extracting)
+                clone, self._extracting, self._prefix)
+
+    # to_bytes() layout version
+    _STATE_VERSION = 1
+
+    def to_bytes(self):
+        """Export current state as bytes.
+
+        Hashing can be resumed later, or in other process,
+        with :meth:`from_bytes`.  Pickle uses same format.
+        """
+        extra = struct.pack('<IB', self.digest_size, self._extracting) + self._prefix
+        return pack_state(self._STATE_VERSION, self._sponge.to_bytes(),
+                          self.name.encode('utf8'), self._padding, extra)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Create hash object from :meth:`to_bytes` result.
+        """
+        sponge, name, padding, extra = unpack_state(data, cls._STATE_VERSION, 4)
+        if len(extra) < 5:
+            raise ValueError("Invalid state")
+        obj = cls.__new__(cls)
+        obj._sponge = sponge_from_bytes(sponge)
+        obj._padding = padding
+        obj.name = name.decode('utf8')
+        obj.block_size = obj._sponge.rate // 8
+        obj.digest_size, extracting = struct.unpack('<IB', extra[:5])
+        obj._prefix = extra[5:]
+        obj._extracting = bool(extracting)
+        return obj
+
+    def __reduce__(self):
+        return (_restore, (self.__class__, self.to_bytes()))
 
     def update(self, data):
         """Update state with data.
@@ -65,6 +118,39 @@ class SpongeHash(object):
             raise SpongeHashInvalidState()
         self._sponge.absorb(data)
 
+    def reset(self):
+        """Clear state, so object can be reused for new message.
+
+        Also allowed after :meth:`extract`.  Prefix of cSHAKE-based
+        functions is absorbed again.
+        """
+        self._sponge.reset()
+        if self._prefix:
+            self._sponge.absorb(self._prefix)
+        self._extracting = False
+
+    def reinit(self, data=None):
+        """Reset state and start new message with data.
+        """
+        self.reset()
+        if data is not None:
+            self.update(data)
+
+    def update_from_file(self, f, bufsize=FILE_BUFSIZE):
+        """Update state with data from binary file object, starting
+        from current position until end of file.
+
+        Regular files are mapped with :mod:`mmap` and absorbed
+        without copying.  Other files are read with readinto()
+        into reused buffer.  GIL is released during absorb,
+        so other threads can run meanwhile.
+
+        Cannot be used after :meth:`extract` is called.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        _update_from_file(self, f, bufsize)
+
     def digest(self):
         """Return final hash digest.
 
@@ -74,9 +160,7 @@ class SpongeHash(object):
         """
         if self._extracting:
             raise SpongeHashInvalidState()
-        tmp = self._sponge.copy()
-        tmp.pad(self._padding)
-        return tmp.squeeze(self.digest_size)
+        return self._sponge.finalize_copy(self._padding, self.digest_size)
 
     def hexdigest(self):
         """Return :meth:`digest` value as hexadecimal string.
@@ -98,3 +182,74 @@ class SpongeHash(object):
             self._extracting = True
         return self._sponge.squeeze(count)
 
+
+
+def _update_from_file(h, f, bufsize=FILE_BUFSIZE):
+    """File reading for update_from_file(), shared with keccak.Sha3Hash.
+    """
+    if not _update_mmap(h, f):
+        buf = bytearray(bufsize)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+
+def _update_mmap(h, f):
+    try:
+        fd = f.fileno()
+        st = os.fstat(fd)
+        pos = f.tell()
+    except (AttributeError, EnvironmentError, io.UnsupportedOperation):
+        return False
+    if not stat.S_ISREG(st.st_mode) or st.st_size <= pos:
+        return False
+    try:
+        m = mmap.mmap(fd, st.st_size, access=mmap.ACCESS_READ)
+    except (EnvironmentError, ValueError):
+        return False
+    try:
+        view = memoryview(m)
+    except TypeError:
+        # py2 mmap does not support new buffer interface
+        m.close()
+        return False
+    try:
+        for ofs in range(pos, st.st_size, MMAP_CHUNK):
+            h.update(view[ofs : ofs + MMAP_CHUNK])
+    finally:
+        view.release()
+        m.close()
+    f.seek(st.st_size)
+    return True
+
+def hash_file(path_or_fd, algo):
+    """Hash file contents.
+
+    Parameters:
+        path_or_fd
+            Filename, file descriptor or binary file object.
+            Descriptor and file object are read from current position
+            and are left open.
+        algo
+            Hash constructor, eg. :func:`spongeshaker.sha3.sha3_256`,
+            or function name in :mod:`spongeshaker.sha3`.
+
+    Returns hash object, see :meth:`SpongeHash.update_from_file`.
+    """
+    if isinstance(algo, str):
+        from spongeshaker import sha3
+        if algo not in _FILE_HASHES:
+            raise ValueError("unknown hash: %s" % algo)
+        algo = getattr(sha3, algo)
+    h = algo()
+    if isinstance(path_or_fd, int):
+        with io.open(path_or_fd, 'rb', closefd=False) as f:
+            h.update_from_file(f)
+    elif hasattr(path_or_fd, 'readinto'):
+        h.update_from_file(path_or_fd)
+    else:
+        with open(path_or_fd, 'rb') as f:
+            h.update_from_file(f)
+    return h
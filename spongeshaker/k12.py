@@ -0,0 +1,259 @@
+"""TurboSHAKE and KangarooTwelve.
+
+Both use Keccak-p1600 reduced to 12 rounds, which makes them about
+twice as fast as SHAKE128.  KangarooTwelve additionally uses tree
+hashing over 8 KiB chunks, so long messages are processed
+several chunks at a time.
+
+Specification: RFC 9861.
+
+All hash objects follow common :mod:`hashlib` interface,
+same as :class:`spongeshaker.hashing.SpongeHash`.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.hashing import SpongeHash, SpongeHashInvalidState
+from spongeshaker.keccak import KeccakSponge, hash_many
+from spongeshaker.util import tohex, fromhex
+
+__all__ = ['turboshake128', 'turboshake256', 'k12', 'KangarooTwelveHash']
+
+# reduced round count
+TURBO_ROUNDS = 12
+
+# default domain separation byte for TurboSHAKE
+TURBO_DOMAIN = 0x1F
+
+# K12 chunk size
+K12_CHUNK = 8192
+
+# domain bytes used by K12
+_PAD_SINGLE = fromhex('07')
+_PAD_LEAF = fromhex('0b')
+_PAD_FINAL = fromhex('06')
+
+# marks that final node is followed by chaining values
+_NODE_MARKER = fromhex('0300000000000000')
+
+# end of chaining values
+_NODE_END = fromhex('ffff')
+
+
+def _turbo_sponge(capacity):
+    return KeccakSponge(capacity, TURBO_ROUNDS)
+
+def _domain_pad(domain):
+    if domain < 0x01 or domain > 0x7F:
+        raise ValueError("domain must be in range 0x01..0x7F")
+    return bytes(bytearray([domain]))
+
+def length_encode(value):
+    """Encode integer as big-endian bytes followed by their count.
+    """
+    res = bytearray()
+    while value > 0:
+        res.insert(0, value & 0xFF)
+        value >>= 8
+    res.append(len(res))
+    return bytes(res)
+
+#
+# TurboSHAKE
+#
+
+def turboshake128(data=None, domain=TURBO_DOMAIN, digest_size=256):
+    """TurboSHAKE128 (c=256, 12 rounds).
+
+    Security level: 128 bits.
+
+    Parameters:
+        data
+            initial data to hash.
+        domain
+            Domain separation byte, 0x01..0x7F.  Default: 0x1F.
+        digest_size
+            Output size for .digest()/.hexdigest() when used as normal hash.
+            Default: 256 bits.
+
+    Returns :class:`spongeshaker.hashing.SpongeHash` for TurboSHAKE128.
+    """
+    return SpongeHash(256, digest_size, data, "TurboSHAKE128",
+                      _turbo_sponge, _domain_pad(domain))
+
+def turboshake256(data=None, domain=TURBO_DOMAIN, digest_size=512):
+    """TurboSHAKE256 (c=512, 12 rounds).
+
+    Security level: 256 bits.
+
+    Parameters:
+        data
+            initial data to hash.
+        domain
+            Domain separation byte, 0x01..0x7F.  Default: 0x1F.
+        digest_size
+            Output size for .digest()/.hexdigest() when used as normal hash.
+            Default: 512 bits.
+
+    Returns :class:`spongeshaker.hashing.SpongeHash` for TurboSHAKE256.
+    """
+    return SpongeHash(512, digest_size, data, "TurboSHAKE256",
+                      _turbo_sponge, _domain_pad(domain))
+
+#
+# KangarooTwelve
+#
+
+def k12(data=None, custom=b'', digest_size=256):
+    """KangarooTwelve.
+
+    Security level: 128 bits.
+
+    Parameters:
+        data
+            initial data to hash.
+        custom
+            Customization string.
+        digest_size
+            Output size for .digest()/.hexdigest() when used as normal hash.
+            Default: 256 bits.
+
+    Returns :class:`KangarooTwelveHash`.
+    """
+    return KangarooTwelveHash(data, custom, digest_size)
+
+class KangarooTwelveHash(object):
+    """KangarooTwelve hash object.
+
+    Message is split into 8 KiB chunks.  First chunk goes directly
+    into final node, rest of them are hashed separately and their
+    chaining values are added to final node.  Full chunks are
+    hashed several at a time with :func:`spongeshaker.keccak.hash_many`,
+    which uses SIMD instructions and runs without GIL.
+    """
+    __slots__ = ('name', 'block_size', 'digest_size',
+                 '_custom', '_final', '_leaf', '_count', '_leaf_len', '_extracting')
+
+    def __init__(self, data=None, custom=b'', digest_size=256):
+        self.name = "KangarooTwelve"
+        self.block_size = K12_CHUNK
+        self.digest_size, rem = divmod(digest_size, 8)
+        if rem:
+            raise ValueError("digest_size must be multiple of 8")
+        self._custom = bytes(custom)
+        self._final = _turbo_sponge(256)
+        self._leaf = None
+        self._count = 0
+        self._leaf_len = 0
+        self._extracting = False
+        if data is not None:
+            self.update(data)
+
+    def copy(self):
+        """Create copy of current state.
+        """
+        clone = KangarooTwelveHash(None, self._custom, self.digest_size * 8)
+        clone._final = self._final.copy()
+        clone._leaf = self._leaf and self._leaf.copy()
+        clone._count = self._count
+        clone._leaf_len = self._leaf_len
+        clone._extracting = self._extracting
+        return clone
+
+    def update(self, data):
+        """Update state with data.
+
+        Cannot be used after :meth:`extract` is called.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        self._add(data)
+
+    def _add(self, data):
+        data = memoryview(data)
+        total = len(data)
+        if not total:
+            return
+        pos = 0
+
+        # first chunk goes into final node
+        if self._count < K12_CHUNK:
+            pos = min(K12_CHUNK - self._count, total)
+            self._final.absorb(data[:pos])
+            self._count += pos
+            if pos == total:
+                return
+        if self._count == K12_CHUNK:
+            self._final.absorb(_NODE_MARKER)
+        self._count += total - pos
+
+        # complete current leaf
+        if self._leaf_len:
+            n = min(K12_CHUNK - self._leaf_len, total - pos)
+            self._leaf.absorb(data[pos : pos + n])
+            self._leaf_len += n
+            pos += n
+            if self._leaf_len == K12_CHUNK:
+                self._end_leaf()
+
+        # full chunks in one call
+        nfull = (total - pos) // K12_CHUNK
+        if nfull:
+            end = pos + nfull * K12_CHUNK
+            offsets = range(pos, end + 1, K12_CHUNK)
+            cvs = hash_many(256, _PAD_LEAF, 32, data, offsets, TURBO_ROUNDS)
+            self._final.absorb(cvs)
+            pos = end
+
+        # start new leaf with remaining data
+        if pos < total:
+            self._leaf = _turbo_sponge(256)
+            self._leaf.absorb(data[pos:])
+            self._leaf_len = total - pos
+
+    def _end_leaf(self):
+        self._leaf.pad(_PAD_LEAF)
+        self._final.absorb(self._leaf.squeeze(32))
+        self._leaf = None
+        self._leaf_len = 0
+
+    def _finish(self):
+        """Add customization string and pad final node.
+        """
+        self._add(self._custom + length_encode(len(self._custom)))
+        if self._count <= K12_CHUNK:
+            self._final.pad(_PAD_SINGLE)
+        else:
+            if self._leaf_len:
+                self._end_leaf()
+            nleaves = (self._count - 1) // K12_CHUNK
+            self._final.absorb(length_encode(nleaves) + _NODE_END)
+            self._final.pad(_PAD_FINAL)
+
+    def digest(self):
+        """Return final hash digest.
+
+        State is not changed, so :meth:`update` can be
+        called again to add more data to state.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        tmp = self.copy()
+        tmp._finish()
+        return tmp._final.squeeze(self.digest_size)
+
+    def hexdigest(self):
+        """Return :meth:`digest` value as hexadecimal string.
+        """
+        return tohex(self.digest())
+
+    def extract(self, count):
+        """Extract data from hash state.
+
+        Can be called repeatedly to get unlimited stream of bytes.
+        After it, :meth:`update` and :meth:`digest` will throw error.
+        """
+        if not self._extracting:
+            self._finish()
+            self._extracting = True
+        return self._final.squeeze(count)
@@ -0,0 +1,167 @@
+"""ParallelWrap - AEAD encryption with several sponges per message.
+
+Motorist-style mode: message is cut into segments, which are
+distributed round-robin between several Keccak-p[1600, 12] states
+("pistons").  Each piston runs SpongeWrap on its segments, chain
+values from all pistons are then hashed together into tag.
+
+Pistons are independent, so with executor they run in separate
+threads, the C code releases GIL while processing segments.
+
+This is not Keyak - layout is built from :class:`spongeshaker.spongewrap.SpongeWrap`
+steps and is not interoperable with Keyak v2 or other Motorist instances.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import hmac
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.sp800_185 import encode_string, left_encode, right_encode
+from spongeshaker.strobe import AuthenticationFailed
+from spongeshaker.util import fromhex
+
+__all__ = ['ParallelWrap', 'AuthenticationFailed']
+
+# same frame bits as in SpongeWrap
+_PAD_KEYSTREAM = fromhex("03")
+_PAD_PLAINSTREAM = fromhex("02")
+
+# simple 10*1 padding for setup and final hash
+_PAD_KECCAK = fromhex("01")
+
+class ParallelWrap(object):
+    """Authenticated encryption with parallel sponges.
+
+    Parameters:
+        key
+            Secret key.
+        pistons
+            Number of parallel states.
+        tag_size
+            Tag length in bytes.
+        segment_size
+            Bytes given to one piston at a time.
+        capacity
+            Capacity in bits for each state.
+        rounds
+            Rounds in Keccak-p permutation.
+        executor
+            :class:`concurrent.futures.Executor` to run pistons in
+            parallel, if message is longer than one segment.
+
+    All parameters except executor must be same for encryption
+    and decryption.  Nonce must be unique for each message.
+    """
+    __slots__ = ('pistons', 'tag_size', 'segment_size', '_keyed', '_final', '_executor')
+
+    def __init__(self, key, pistons=4, tag_size=16, segment_size=32 * 1024,
+                 capacity=256, rounds=12, executor=None):
+        if pistons < 1 or pistons > 255:
+            raise ValueError("pistons must be between 1 and 255")
+        if tag_size < 1 or segment_size < 1:
+            raise ValueError("tag_size and segment_size must be positive")
+        self.pistons = pistons
+        self.tag_size = tag_size
+        self.segment_size = segment_size
+        self._executor = executor
+
+        # keyed state for each piston, messages start from copies
+        params = (encode_string(b"ParallelWrap") + left_encode(pistons) +
+                  left_encode(segment_size) + left_encode(tag_size))
+        self._keyed = []
+        for i in range(pistons):
+            sponge = KeccakSponge(capacity, rounds)
+            sponge.absorb(params + left_encode(i) + encode_string(key))
+            sponge.pad(_PAD_KECCAK)
+            self._keyed.append(sponge)
+
+        self._final = KeccakSponge(capacity, rounds)
+        self._final.absorb(params + encode_string(key))
+
+    def _segments(self, piston, data):
+        size = self.segment_size
+        step = size * self.pistons
+        for pos in range(piston * size, len(data), step):
+            yield pos, min(pos + size, len(data))
+
+    def _run_piston(self, piston, nonce, ad, src, dst, decrypt):
+        sponge = self._keyed[piston].copy()
+        sponge.wrap_absorb(nonce, _PAD_PLAINSTREAM)
+        for start, end in self._segments(piston, ad):
+            sponge.wrap_absorb(ad[start:end], _PAD_PLAINSTREAM)
+        sponge.pad(_PAD_KEYSTREAM)
+        for start, end in self._segments(piston, src):
+            if decrypt:
+                sponge.wrap_decrypt_into(src[start:end], dst[start:end], _PAD_KEYSTREAM)
+            else:
+                sponge.wrap_encrypt_into(src[start:end], dst[start:end], _PAD_KEYSTREAM)
+        sponge.pad(_PAD_PLAINSTREAM)
+        return sponge.squeeze(sponge.capacity // 8)
+
+    def _process(self, nonce, ad, src, dst, decrypt):
+        nonce = encode_string(nonce)
+        ad = memoryview(ad)
+        if self._executor and self.pistons > 1 and len(src) > self.segment_size:
+            jobs = [self._executor.submit(self._run_piston, i, nonce, ad, src, dst, decrypt)
+                    for i in range(self.pistons)]
+            chains = [job.result() for job in jobs]
+        else:
+            chains = [self._run_piston(i, nonce, ad, src, dst, decrypt)
+                      for i in range(self.pistons)]
+
+        final = self._final.copy()
+        final.absorb(nonce)
+        final.absorb(b''.join(chains))
+        final.absorb(right_encode(len(ad)) + right_encode(len(src)))
+        final.pad(_PAD_KECCAK)
+        return final.squeeze(self.tag_size)
+
+    def encrypt(self, nonce, ad, plaintext):
+        """Encrypt and authenticate plaintext, authenticate ad.
+
+        Returns ciphertext with tag appended.
+        """
+        res = bytearray(len(memoryview(plaintext)) + self.tag_size)
+        self.encrypt_into(nonce, ad, plaintext, res)
+        return bytes(res)
+
+    def encrypt_into(self, nonce, ad, plaintext, out):
+        """Encrypt into writable buffer of len(plaintext) + tag_size bytes.
+        """
+        src = memoryview(plaintext)
+        out = memoryview(out)
+        if len(out) != len(src) + self.tag_size:
+            raise ValueError("output buffer must be len(plaintext) + tag_size bytes")
+        out[len(src):] = self._process(nonce, ad, src, out, False)
+
+    def decrypt(self, nonce, ad, ciphertext):
+        """Check tag and decrypt ciphertext from :meth:`encrypt`.
+
+        Raises :class:`AuthenticationFailed` if ciphertext, ad or
+        nonce was modified.
+        """
+        nbytes = len(memoryview(ciphertext)) - self.tag_size
+        if nbytes < 0:
+            raise AuthenticationFailed("ciphertext too short")
+        res = bytearray(nbytes)
+        self.decrypt_into(nonce, ad, ciphertext, res)
+        return bytes(res)
+
+    def decrypt_into(self, nonce, ad, ciphertext, out):
+        """Decrypt into writable buffer of len(ciphertext) - tag_size bytes.
+
+        If tag does not match, buffer is cleared and
+        :class:`AuthenticationFailed` is raised.
+        """
+        data = memoryview(ciphertext)
+        out = memoryview(out)
+        if len(data) < self.tag_size:
+            raise AuthenticationFailed("ciphertext too short")
+        src = data[:len(data) - self.tag_size]
+        if len(out) != len(src):
+            raise ValueError("output buffer must be len(ciphertext) - tag_size bytes")
+        tag = self._process(nonce, ad, src, out, True)
+        if not hmac.compare_digest(tag, data[len(src):].tobytes()):
+            out[:] = bytearray(len(out))
+            raise AuthenticationFailed("tag does not match")
@@ -3,10 +3,26 @@
 
 from __future__ import division, absolute_import, print_function
 
+import os
+import random
+import struct
+import threading
+import weakref
+
 from spongeshaker.keccak import KeccakSponge
-from spongeshaker.util import PAD_KECCAK
+from spongeshaker.util import PAD_KECCAK, tohex, pack_state, unpack_state, sponge_from_bytes, _restore
+
+__all__ = ['SpongePRNG', 'KeccakPRNG', 'KeccakRandom', 'KeccakBitGenerator']
+
+# 2**-53
+_RECIP_BPF = 1.0 / (1 << 53)
 
-__all__ = ['SpongePRNG', 'KeccakPRNG']
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("NumPy is required for this function")
+    return numpy
 
 class SpongePRNG(object):
     """Sponge as PRNG.
@@ -21,6 +37,36 @@ class SpongePRNG(object):
         self._extracting = 0
         self._padding = padding
 
+    # to_bytes() layout version
+    _STATE_VERSION = 1
+
+    def to_bytes(self):
+        """Export current state as bytes.
+
+        Result must be kept secret, it allows to predict output.
+        """
+        flags = bytearray([self._initialized and 1 or 0, self._extracting and 1 or 0])
+        return pack_state(self._STATE_VERSION, self._sponge.to_bytes(),
+                          self._padding, bytes(flags))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Create PRNG from :meth:`to_bytes` result.
+        """
+        sponge, padding, flags = unpack_state(data, cls._STATE_VERSION, 3)
+        if len(flags) != 2:
+            raise ValueError("Invalid state")
+        flags = bytearray(flags)
+        obj = cls.__new__(cls)
+        obj._sponge = sponge_from_bytes(sponge)
+        obj._padding = padding
+        obj._initialized = flags[0]
+        obj._extracting = flags[1]
+        return obj
+
+    def __reduce__(self):
+        return (_restore, (self.__class__, self.to_bytes()))
+
     def add_entropy(self, data):
         """Import new random data into state.
         """
@@ -31,20 +77,267 @@ class SpongePRNG(object):
             self._sponge.absorb(data)
             self._initialized = 1
 
-    def get_random_bytes(self, nbytes):
-        """Return random bytes from state.
-        """
+    def _start(self):
         if not self._initialized:
             raise Exception("PRNG has no entropy.")
         if not self._extracting:
             # add_entropy was called, need to pad+permute
             self._sponge.pad(self._padding)
             self._extracting = 1
+
+    def get_random_bytes(self, nbytes):
+        """Return random bytes from state.
+        """
+        self._start()
         return self._sponge.squeeze(nbytes)
 
+    def fill(self, buffer):
+        """Fill writable buffer with random bytes.
+
+        Bytes are squeezed directly into buffer, so it gives
+        same data as :meth:`get_random_bytes` without copying.
+        """
+        self._start()
+        self._sponge.squeeze_into(buffer)
+
+    def random_uint32(self, size):
+        """Return NumPy array of uint32 values.
+
+        Values are read as little-endian, so result does not depend
+        on platform.  Requires NumPy.
+        """
+        arr = _numpy().empty(size, dtype='<u4')
+        self.fill(arr)
+        return arr
+
+    def random_uint64(self, size):
+        """Return NumPy array of uint64 values.
+
+        Values are read as little-endian, so result does not depend
+        on platform.  Requires NumPy.
+        """
+        arr = _numpy().empty(size, dtype='<u8')
+        self.fill(arr)
+        return arr
+
+    def random_float64(self, size):
+        """Return NumPy array of floats in range [0.0, 1.0).
+
+        Each value uses top 53 bits of :meth:`random_uint64` value.
+        Requires NumPy.
+        """
+        np = _numpy()
+        arr = self.random_uint64(size)
+        arr >>= np.uint64(11)
+        res = arr.astype(np.float64)
+        res *= _RECIP_BPF
+        return res
+
 class KeccakPRNG(SpongePRNG):
     """Keccak as PRNG.
     """
     def __init__(self, capacity=512, padding=PAD_KECCAK):
         super(KeccakPRNG, self).__init__(KeccakSponge(capacity), padding)
 
+
+#
+# random.Random API
+#
+
+# live KeccakRandom instances to reseed after fork
+_fork_instances = weakref.WeakSet()
+
+def _reseed_after_fork():
+    for rnd in list(_fork_instances):
+        rnd._reseed_child()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reseed_after_fork)
+
+def _seed_bytes(a):
+    """Encode seed with type tag, so different types do not collide.
+    """
+    if a is None:
+        return b'b' + os.urandom(32)
+    if isinstance(a, bytes):
+        return b'b' + a
+    if isinstance(a, type(u'')):
+        return b's' + a.encode('utf8')
+    if isinstance(a, float):
+        return b'f' + a.hex().encode('ascii')
+    if isinstance(a, int) or type(a).__name__ == 'long':
+        return b'i' + ('%x' % a).encode('ascii')
+    try:
+        return b'b' + memoryview(a).tobytes()
+    except TypeError:
+        return b'o' + str(a).encode('utf8')
+
+class KeccakRandom(random.Random):
+    """:class:`random.Random` with Keccak sponge as generator.
+
+    Random bytes are squeezed into internal buffer of bufsize bytes
+    and unpacked to 64-bit words, :meth:`random` and :meth:`getrandbits`
+    take values from there, so most calls do not need to go into C.
+
+    Parameters:
+        seed
+            Initial seed: None for os.urandom(), int, float, str
+            or bytes-like object.  Values of different types give
+            different streams.
+        capacity
+            Sponge capacity in bits.
+        bufsize
+            Size of prefetch buffer in bytes, rounded down to multiple of 8.
+        reseed_on_fork
+            Mix new entropy into state in child process after
+            :func:`os.fork`, so child does not repeat parent's stream.
+            Requires Python 3.7+.
+
+    State from :meth:`getstate` contains sponge state and
+    unconsumed buffered words, so restored object continues
+    with same stream.  It must be kept secret.
+    """
+    __slots__ = ('_capacity', '_sponge', '_bufsize', '_unpack', '_words')
+
+    def __init__(self, seed=None, capacity=512, bufsize=4096, reseed_on_fork=True):
+        nwords = bufsize // 8
+        if nwords < 1:
+            raise ValueError("bufsize must be at least 8")
+        self._capacity = capacity
+        self._bufsize = nwords * 8
+        self._unpack = struct.Struct('<%dQ' % nwords).unpack
+        self._words = iter(())
+        self._sponge = None
+        super(KeccakRandom, self).__init__(seed)
+        if reseed_on_fork:
+            _fork_instances.add(self)
+
+    def seed(self, a=None, version=2):
+        """Initialize state from seed.
+
+        If a is None, seed is taken from :func:`os.urandom`.
+        """
+        self._sponge = KeccakSponge(self._capacity)
+        self._sponge.absorb(_seed_bytes(a))
+        self._sponge.pad(PAD_KECCAK)
+        self._words = iter(())
+        self.gauss_next = None
+
+    def _reseed_child(self):
+        self._sponge.absorb(struct.pack('<Q', os.getpid()) + os.urandom(32))
+        self._sponge.pad(PAD_KECCAK)
+        # buffered words are shared with parent
+        self._words = iter(())
+        self.gauss_next = None
+
+    def _next_word(self):
+        try:
+            return next(self._words)
+        except StopIteration:
+            self._words = iter(self._unpack(self._sponge.squeeze(self._bufsize)))
+            return next(self._words)
+
+    def random(self):
+        """Return float in range [0.0, 1.0).
+        """
+        try:
+            return (next(self._words) >> 11) * _RECIP_BPF
+        except StopIteration:
+            return (self._next_word() >> 11) * _RECIP_BPF
+
+    def getrandbits(self, k):
+        """Return non-negative int with k random bits.
+        """
+        if k <= 64:
+            if k <= 0:
+                if k < 0:
+                    raise ValueError("number of bits must be non-negative")
+                return 0
+            try:
+                return next(self._words) >> (64 - k)
+            except StopIteration:
+                return self._next_word() >> (64 - k)
+        nbytes = (k + 7) // 8
+        data = self._sponge.squeeze(nbytes)
+        return int(tohex(data[::-1]), 16) >> (nbytes * 8 - k)
+
+    def randbytes(self, n):
+        """Return n random bytes.
+        """
+        return self._sponge.squeeze(n)
+
+    # getstate() layout version
+    _STATE_VERSION = 1
+
+    def getstate(self):
+        """Return internal state, can be passed to :meth:`setstate`.
+        """
+        words = tuple(self._words)
+        self._words = iter(words)
+        return (self._STATE_VERSION, self._sponge.to_bytes(), words,
+                self._bufsize, self.gauss_next)
+
+    def setstate(self, state):
+        """Restore internal state from :meth:`getstate` result.
+        """
+        if not isinstance(state, tuple) or len(state) != 5 or state[0] != self._STATE_VERSION:
+            raise ValueError("Invalid state")
+        version, sponge, words, bufsize, gauss_next = state
+        self._sponge = sponge_from_bytes(sponge)
+        self._capacity = self._sponge.capacity
+        self._bufsize = bufsize
+        self._unpack = struct.Struct('<%dQ' % (bufsize // 8)).unpack
+        self._words = iter(tuple(words))
+        self.gauss_next = gauss_next
+
+#
+# NumPy
+#
+
+class KeccakBitGenerator(object):
+    """Bit generator for :class:`numpy.random.Generator`.
+
+    Usage::
+
+        gen = numpy.random.Generator(KeccakBitGenerator(key))
+
+    Generator draws values directly from sponge state in C,
+    via capsule returned by :meth:`KeccakSponge.numpy_capsule`.
+    It is not subclass of numpy.random.BitGenerator,
+    but provides same attributes that Generator uses.
+
+    Stream is same as from :class:`KeccakPRNG` with same
+    capacity, seeded with add_entropy(seed).
+
+    Parameters:
+        seed
+            Seed bytes.
+        capacity
+            Sponge capacity in bits.
+    """
+    __slots__ = ('capsule', 'lock', '_sponge')
+
+    def __init__(self, seed, capacity=512):
+        if not seed:
+            raise ValueError("seed must not be empty")
+        self._sponge = KeccakSponge(capacity)
+        self._sponge.absorb(seed)
+        self._sponge.pad(PAD_KECCAK)
+        self.capsule = self._sponge.numpy_capsule()
+        self.lock = threading.Lock()
+
+    def random_raw(self, size=None, output=True):
+        """Return raw 64-bit values, as NumPy BitGenerator.random_raw().
+        """
+        np = _numpy()
+        if size is None:
+            arr = np.empty(1, dtype='<u8')
+        else:
+            arr = np.empty(size, dtype='<u8')
+        with self.lock:
+            self._sponge.squeeze_into(arr)
+        if not output:
+            return None
+        if size is None:
+            return int(arr[0])
+        return arr.astype(np.uint64, copy=False)
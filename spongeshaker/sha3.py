@@ -10,12 +10,15 @@ to init function.
 
 Alternatively, .extract() function can be called
 repeatedly to get unlimited stream of result bytes.
+
+For hashing large number of messages at once there are
+batch functions: sha3_256_many() etc.  They hash all messages
+in one C call and return digests concatenated together.
 """
 
 from __future__ import division, absolute_import, print_function
 
-from spongeshaker.hashing import SpongeHash
-from spongeshaker.keccak import KeccakSponge
+from spongeshaker.keccak import Sha3Hash, hash_many
 from spongeshaker.util import fromhex
 
 __all__ = [
@@ -25,6 +28,12 @@ __all__ = [
     'sha3_512',
     'shake128',
     'shake256',
+    'sha3_224_many',
+    'sha3_256_many',
+    'sha3_384_many',
+    'sha3_512_many',
+    'shake128_many',
+    'shake256_many',
 ]
 
 # Add Sakura padding to basic Keccak padding
@@ -46,36 +55,36 @@ def sha3_224(data=None):
 
     Security level: 112/224 bits.
 
-    Returns :class:`spongeshaker.hashing.SpongeHash` for SHA3-224.
+    Returns :class:`spongeshaker.keccak.Sha3Hash` for SHA3-224.
     """
-    return SpongeHash(448, 224, data, "SHA3-224", KeccakSponge, PAD_SHA3)
+    return Sha3Hash(448, 224, data, "SHA3-224", PAD_SHA3)
 
 def sha3_256(data=None):
     """Proposed SHA3-256 by NIST (c=512).
 
     Security level: 128/256 bits.
 
-    Returns :class:`spongeshaker.hashing.SpongeHash` for SHA3-256.
+    Returns :class:`spongeshaker.keccak.Sha3Hash` for SHA3-256.
     """
-    return SpongeHash(512, 256, data, "SHA3-256", KeccakSponge, PAD_SHA3)
+    return Sha3Hash(512, 256, data, "SHA3-256", PAD_SHA3)
 
 def sha3_384(data=None):
     """Proposed SHA3-384 by NIST (c=768).
 
     Security level: 192/384 bits.
 
-    Returns :class:`spongeshaker.hashing.SpongeHash` for SHA3-384.
+    Returns :class:`spongeshaker.keccak.Sha3Hash` for SHA3-384.
     """
-    return SpongeHash(768, 384, data, "SHA3-384", KeccakSponge, PAD_SHA3)
+    return Sha3Hash(768, 384, data, "SHA3-384", PAD_SHA3)
 
 def sha3_512(data=None):
     """Proposed SHA3-512 by NIST (c=1024).
 
     Security level: 256/512 bits.
 
-    Returns :class:`spongeshaker.hashing.SpongeHash` for SHA3-512.
+    Returns :class:`spongeshaker.keccak.Sha3Hash` for SHA3-512.
     """
-    return SpongeHash(1024, 512, data, "SHA3-512", KeccakSponge, PAD_SHA3)
+    return Sha3Hash(1024, 512, data, "SHA3-512", PAD_SHA3)
 
 #
 # Variable-length SHAKE functions.
@@ -93,9 +102,9 @@ def shake128(data=None, digest_size=256):
             Output size for .digest()/.hexdigest() when used as normal hash.
             Default: 256 bits.
 
-    Returns :class:`spongeshaker.hashing.SpongeHash` for SHAKE128.
+    Returns :class:`spongeshaker.keccak.Sha3Hash` for SHAKE128.
     """
-    return SpongeHash(256, digest_size, data, "SHAKE128", KeccakSponge, PAD_SHAKE)
+    return Sha3Hash(256, digest_size, data, "SHAKE128", PAD_SHAKE)
 
 def shake256(data=None, digest_size=512):
     """Proposed SHAKE256 hash by NIST (c=512).
@@ -109,7 +118,72 @@ def shake256(data=None, digest_size=512):
             Output size for .digest()/.hexdigest() when used as normal hash.
             Default: 512 bits.
 
-    Returns :class:`spongeshaker.hashing.SpongeHash` for SHAKE256.
+    Returns :class:`spongeshaker.keccak.Sha3Hash` for SHAKE256.
+    """
+    return Sha3Hash(512, digest_size, data, "SHAKE256", PAD_SHAKE)
+
+#
+# Batch hashing.
+#
+
+def sha3_224_many(messages, offsets=None):
+    """SHA3-224 for many messages.
+
+    Parameters:
+        messages
+            Sequence of byte strings or other objects supporting
+            buffer interface.  Or single buffer, if offsets is given.
+        offsets
+            N+1 increasing positions in messages buffer, so
+            message i is messages[offsets[i]:offsets[i+1]].
+
+    Returns digests for all messages concatenated into one bytes object,
+    digest for message i is at res[i*28 : (i+1)*28].
+    """
+    return hash_many(448, PAD_SHA3, 224 // 8, messages, offsets)
+
+def sha3_256_many(messages, offsets=None):
+    """SHA3-256 for many messages.
+
+    Digest for message i is at res[i*32 : (i+1)*32].
+    Arguments are same as for :func:`sha3_224_many`.
+    """
+    return hash_many(512, PAD_SHA3, 256 // 8, messages, offsets)
+
+def sha3_384_many(messages, offsets=None):
+    """SHA3-384 for many messages.
+
+    Digest for message i is at res[i*48 : (i+1)*48].
+    Arguments are same as for :func:`sha3_224_many`.
+    """
+    return hash_many(768, PAD_SHA3, 384 // 8, messages, offsets)
+
+def sha3_512_many(messages, offsets=None):
+    """SHA3-512 for many messages.
+
+    Digest for message i is at res[i*64 : (i+1)*64].
+    Arguments are same as for :func:`sha3_224_many`.
+    """
+    return hash_many(1024, PAD_SHA3, 512 // 8, messages, offsets)
+
+def shake128_many(messages, offsets=None, digest_size=256):
+    """SHAKE128 for many messages.
+
+    Output length is given with digest_size in bits.
+    Other arguments are same as for :func:`sha3_224_many`.
+    """
+    return hash_many(256, PAD_SHAKE, _digest_bytes(digest_size), messages, offsets)
+
+def shake256_many(messages, offsets=None, digest_size=512):
+    """SHAKE256 for many messages.
+
+    Output length is given with digest_size in bits.
+    Other arguments are same as for :func:`sha3_224_many`.
     """
-    return SpongeHash(512, digest_size, data, "SHAKE256", KeccakSponge, PAD_SHAKE)
+    return hash_many(512, PAD_SHAKE, _digest_bytes(digest_size), messages, offsets)
 
+def _digest_bytes(digest_size):
+    nbytes, rem = divmod(digest_size, 8)
+    if rem:
+        raise ValueError("digest_size must be multiple of 8")
+    return nbytes
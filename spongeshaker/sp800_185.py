@@ -0,0 +1,524 @@
+"""SHA-3 derived functions from NIST SP 800-185.
+
+http://dx.doi.org/10.6028/NIST.SP.800-185
+
+All hash objects follow common :mod:`hashlib` interface.
+Output sizes are given in bits, same as in :mod:`spongeshaker.sha3`.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.hashing import SpongeHash, SpongeHashInvalidState
+from spongeshaker.keccak import KeccakSponge, hash_many
+from spongeshaker.sha3 import PAD_SHAKE
+from spongeshaker.util import tohex, fromhex
+
+__all__ = [
+    'cshake128', 'cshake256',
+    'kmac128', 'kmac256', 'kmac128_key', 'kmac256_key', 'KMACKey',
+    'tuplehash128', 'tuplehash256', 'TupleHash',
+    'parallelhash128', 'parallelhash256', 'ParallelHash',
+    'SP800Hash',
+]
+
+# cSHAKE: 0 0 1 0*
+PAD_CSHAKE = fromhex('04')
+
+#
+# Encoding helpers.
+#
+
+def _int_bytes(value):
+    res = bytearray()
+    while value > 0:
+        res.insert(0, value & 0xFF)
+        value >>= 8
+    if not res:
+        res.append(0)
+    return res
+
+def left_encode(value):
+    """Encode integer with length byte in front.
+    """
+    res = _int_bytes(value)
+    res.insert(0, len(res))
+    return bytes(res)
+
+def right_encode(value):
+    """Encode integer with length byte at the end.
+    """
+    res = _int_bytes(value)
+    res.append(len(res))
+    return bytes(res)
+
+def encode_string(data):
+    """Encode byte string with bit-length in front.
+    """
+    return left_encode(len(data) * 8) + bytes(data)
+
+def bytepad(data, width):
+    """Prepend width and pad with zeros to multiple of width.
+    """
+    res = left_encode(width) + data
+    rem = len(res) % width
+    if rem:
+        res += b'\0' * (width - rem)
+    return res
+
+def _cshake_prefix(capacity, name, custom):
+    """Return cSHAKE prefix for capacity.
+    """
+    rbytes = (1600 - capacity) // 8
+    return bytepad(encode_string(name) + encode_string(custom), rbytes)
+
+def _cshake_sponge(capacity, name, custom):
+    """Return sponge with cSHAKE prefix absorbed.
+
+    Returns None if both strings are empty, then plain SHAKE must be used.
+    """
+    if not name and not custom:
+        return None
+    sponge = KeccakSponge(capacity)
+    sponge.absorb(_cshake_prefix(capacity, name, custom))
+    return sponge
+
+#
+# cSHAKE
+#
+
+def cshake128(data=None, name=b'', custom=b'', digest_size=256):
+    """cSHAKE128 (c=256).
+
+    Security level: 128 bits.
+
+    Parameters:
+        data
+            initial data to hash.
+        name
+            Function name, reserved for NIST-defined functions.
+        custom
+            Customization string.
+        digest_size
+            Output size for .digest()/.hexdigest() when used as normal hash.
+            Default: 256 bits.
+
+    If both name and custom are empty, result is same as SHAKE128.
+
+    Prefix is absorbed and permuted in constructor, so for
+    many messages with same parameters it is cheaper to create
+    one object and then :meth:`copy` it for each message.
+
+    Returns :class:`spongeshaker.hashing.SpongeHash` for cSHAKE128.
+    """
+    return _cshake(256, data, name, custom, digest_size)
+
+def cshake256(data=None, name=b'', custom=b'', digest_size=512):
+    """cSHAKE256 (c=512).
+
+    Security level: 256 bits.
+
+    Parameters are same as for :func:`cshake128`,
+    but default digest_size is 512 bits.
+
+    Returns :class:`spongeshaker.hashing.SpongeHash` for cSHAKE256.
+    """
+    return _cshake(512, data, name, custom, digest_size)
+
+def _cshake(capacity, data, name, custom, digest_size):
+    hname = "cSHAKE%d" % (capacity // 2)
+    if not name and not custom:
+        return SpongeHash(capacity, digest_size, data, hname, KeccakSponge, PAD_SHAKE)
+    prefix = _cshake_prefix(capacity, name, custom)
+    return SpongeHash(capacity, digest_size, data, hname, KeccakSponge, PAD_CSHAKE,
+                      _prefix=prefix)
+
+class SP800Hash(SpongeHash):
+    """Hash object for cSHAKE-based functions that encode output length.
+
+    :meth:`digest` appends bit-length of digest to data before padding,
+    :meth:`extract` appends 0, as required for XOF variants.
+    """
+    __slots__ = ()
+
+    def copy(self):
+        """Create copy of current state.
+        """
+        clone = self._sponge.copy()
+        return self.__class__(clone.capacity, self.digest_size * 8,
+                None, self.name, None, self._padding,
+                clone, self._extracting, self._prefix)
+
+    def digest(self):
+        """Return final hash digest.
+
+        State is not changed, so :meth:`update` can be
+        called again to add more data to state.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        pad = right_encode(self.digest_size * 8) + self._padding
+        return self._sponge.finalize_copy(pad, self.digest_size)
+
+    def extract(self, count):
+        """Extract XOF output.
+
+        Can be called repeatedly to get unlimited stream of bytes.
+        After it, :meth:`update` and :meth:`digest` will throw error.
+        """
+        if not self._extracting:
+            self._sponge.absorb(right_encode(0))
+            self._sponge.pad(self._padding)
+            self._extracting = True
+        return self._sponge.squeeze(count)
+
+#
+# KMAC
+#
+
+def kmac128(key, data=None, custom=b'', digest_size=256):
+    """KMAC128 (c=256).
+
+    Security level: 128 bits.
+
+    Parameters:
+        key
+            MAC key.
+        data
+            initial data to hash.
+        custom
+            Customization string.
+        digest_size
+            Output size for .digest()/.hexdigest().  Default: 256 bits.
+
+    :meth:`SP800Hash.extract` gives KMACXOF128 output.
+
+    For many messages with same key use :func:`kmac128_key`.
+
+    Returns :class:`SP800Hash` for KMAC128.
+    """
+    return KMACKey(256, key, custom, digest_size).new(data)
+
+def kmac256(key, data=None, custom=b'', digest_size=512):
+    """KMAC256 (c=512).
+
+    Security level: 256 bits.
+
+    Parameters are same as for :func:`kmac128`,
+    but default digest_size is 512 bits.
+
+    Returns :class:`SP800Hash` for KMAC256.
+    """
+    return KMACKey(512, key, custom, digest_size).new(data)
+
+def kmac128_key(key, custom=b'', digest_size=256):
+    """Prepared key for KMAC128.
+
+    Returns :class:`KMACKey`.
+    """
+    return KMACKey(256, key, custom, digest_size)
+
+def kmac256_key(key, custom=b'', digest_size=512):
+    """Prepared key for KMAC256.
+
+    Returns :class:`KMACKey`.
+    """
+    return KMACKey(512, key, custom, digest_size)
+
+class KMACKey(object):
+    """KMAC key with prefix already processed.
+
+    Function name, customization string and key are absorbed
+    and permuted once, each message starts from copy of that state.
+    This saves at least 2 permutations per message.
+
+    Parameters:
+        capacity
+            256 for KMAC128, 512 for KMAC256.
+        key
+            MAC key.
+        custom
+            Customization string.
+        digest_size
+            Default output size in bits.
+    """
+    __slots__ = ('name', 'digest_size', '_sponge', '_prefix')
+
+    def __init__(self, capacity, key, custom=b'', digest_size=None):
+        if digest_size is None:
+            digest_size = capacity
+        self.name = "KMAC%d" % (capacity // 2)
+        self.digest_size, rem = divmod(digest_size, 8)
+        if rem:
+            raise ValueError("digest_size must be multiple of 8")
+        self._sponge = KeccakSponge(capacity)
+        self._prefix = (_cshake_prefix(capacity, b"KMAC", custom) +
+                        bytepad(encode_string(key), self._sponge.rbytes))
+        self._sponge.absorb(self._prefix)
+
+    def new(self, data=None, digest_size=None):
+        """Start new message.
+
+        Returns :class:`SP800Hash`.
+        """
+        if digest_size is None:
+            digest_size = self.digest_size * 8
+        sponge = self._sponge.copy()
+        return SP800Hash(sponge.capacity, digest_size, data, self.name,
+                         None, PAD_CSHAKE, sponge, False, self._prefix)
+
+    def mac(self, data, digest_size=None):
+        """Calculate MAC for single message.
+        """
+        nbytes = self.digest_size
+        if digest_size is not None:
+            nbytes, rem = divmod(digest_size, 8)
+            if rem:
+                raise ValueError("digest_size must be multiple of 8")
+        sponge = self._sponge.copy()
+        sponge.absorb(data)
+        sponge.absorb(right_encode(nbytes * 8))
+        sponge.pad(PAD_CSHAKE)
+        return sponge.squeeze(nbytes)
+
+#
+# TupleHash
+#
+
+def tuplehash128(data=None, custom=b'', digest_size=256):
+    """TupleHash128 (c=256).
+
+    Security level: 128 bits.
+
+    Parameters:
+        data
+            Sequence of byte strings to hash.
+        custom
+            Customization string.
+        digest_size
+            Output size for .digest()/.hexdigest().  Default: 256 bits.
+
+    Returns :class:`TupleHash`.
+    """
+    return TupleHash(256, digest_size, data, custom)
+
+def tuplehash256(data=None, custom=b'', digest_size=512):
+    """TupleHash256 (c=512).
+
+    Security level: 256 bits.
+
+    Parameters are same as for :func:`tuplehash128`,
+    but default digest_size is 512 bits.
+
+    Returns :class:`TupleHash`.
+    """
+    return TupleHash(512, digest_size, data, custom)
+
+class TupleHash(SP800Hash):
+    """TupleHash hash object.
+
+    Each :meth:`update` call adds one element to tuple.
+    """
+    __slots__ = ()
+
+    def __init__(self, capacity_bits, output_bits, data=None, custom=b'',
+                 name=None, padding=PAD_CSHAKE, _sponge=None, _extracting=False,
+                 _prefix=None):
+        if _prefix is None:
+            _prefix = _cshake_prefix(capacity_bits, b"TupleHash", custom)
+        name = name or "TupleHash%d" % (capacity_bits // 2)
+        super(TupleHash, self).__init__(capacity_bits, output_bits, None, name,
+                                        KeccakSponge, padding, _sponge, _extracting,
+                                        _prefix)
+        if data is not None:
+            for elem in data:
+                self.update(elem)
+
+    def copy(self):
+        """Create copy of current state.
+        """
+        clone = self._sponge.copy()
+        return TupleHash(clone.capacity, self.digest_size * 8, None, None,
+                         self.name, self._padding, clone, self._extracting,
+                         self._prefix)
+
+    def update(self, data):
+        """Add one element to tuple.
+
+        Cannot be used after :meth:`extract` is called.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        self._sponge.absorb(encode_string(data))
+
+#
+# ParallelHash
+#
+
+def parallelhash128(data=None, block_size=8192, custom=b'', digest_size=256, executor=None):
+    """ParallelHash128 (c=256).
+
+    Security level: 128 bits.
+
+    Parameters:
+        data
+            initial data to hash.
+        block_size
+            Size of leaf blocks in bytes.
+        custom
+            Customization string.
+        digest_size
+            Output size for .digest()/.hexdigest().  Default: 256 bits.
+        executor
+            Optional :class:`concurrent.futures.Executor`, used
+            to hash leaf blocks in several threads.
+
+    Returns :class:`ParallelHash`.
+    """
+    return ParallelHash(256, data, block_size, custom, digest_size, executor)
+
+def parallelhash256(data=None, block_size=8192, custom=b'', digest_size=512, executor=None):
+    """ParallelHash256 (c=512).
+
+    Security level: 256 bits.
+
+    Parameters are same as for :func:`parallelhash128`,
+    but default digest_size is 512 bits.
+
+    Returns :class:`ParallelHash`.
+    """
+    return ParallelHash(512, data, block_size, custom, digest_size, executor)
+
+class ParallelHash(object):
+    """ParallelHash hash object.
+
+    Message is split into blocks, which are hashed independently
+    with SHAKE.  Their results are hashed again with cSHAKE.
+
+    Full blocks are hashed several at a time with
+    :func:`spongeshaker.keccak.hash_many`, which uses SIMD instructions
+    and runs without GIL.  If executor is given, large updates are
+    split between its threads, so all CPU cores can be used.
+
+    :meth:`digest` gives ParallelHash result, :meth:`extract`
+    gives ParallelHashXOF output.
+    """
+    __slots__ = ('name', 'block_size', 'digest_size', '_capacity', '_chain_size',
+                 '_final', '_buf', '_blocks', '_executor', '_extracting')
+
+    # number of blocks in one job for executor
+    _BATCH = 64
+
+    def __init__(self, capacity, data=None, block_size=8192, custom=b'',
+                 digest_size=None, executor=None):
+        if block_size < 1:
+            raise ValueError("block_size must be positive")
+        if digest_size is None:
+            digest_size = capacity
+        self.name = "ParallelHash%d" % (capacity // 2)
+        self.block_size = block_size
+        self.digest_size, rem = divmod(digest_size, 8)
+        if rem:
+            raise ValueError("digest_size must be multiple of 8")
+        self._capacity = capacity
+        self._chain_size = capacity // 8
+        self._final = _cshake_sponge(capacity, b"ParallelHash", custom)
+        self._final.absorb(left_encode(block_size))
+        self._buf = bytearray()
+        self._blocks = 0
+        self._executor = executor
+        self._extracting = False
+        if data is not None:
+            self.update(data)
+
+    def copy(self):
+        """Create copy of current state.
+        """
+        clone = ParallelHash.__new__(ParallelHash)
+        for attr in self.__slots__:
+            setattr(clone, attr, getattr(self, attr))
+        clone._final = self._final.copy()
+        clone._buf = bytearray(self._buf)
+        return clone
+
+    def update(self, data):
+        """Update state with data.
+
+        Cannot be used after :meth:`extract` is called.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        data = memoryview(data)
+        pos = 0
+
+        # fill partial block
+        if self._buf:
+            pos = min(self.block_size - len(self._buf), len(data))
+            self._buf += data[:pos]
+            if len(self._buf) < self.block_size:
+                return
+            self._add_blocks(self._buf, 1)
+            self._buf = bytearray()
+
+        # full blocks
+        count = (len(data) - pos) // self.block_size
+        if count:
+            end = pos + count * self.block_size
+            self._add_blocks(data[pos:end], count)
+            pos = end
+
+        if pos < len(data):
+            self._buf = bytearray(data[pos:])
+
+    def _hash_blocks(self, data, count):
+        offsets = range(0, count * self.block_size + 1, self.block_size)
+        return hash_many(self._capacity, PAD_SHAKE, self._chain_size, data, offsets)
+
+    def _add_blocks(self, data, count):
+        if not self._executor or count < 2 * self._BATCH:
+            self._final.absorb(self._hash_blocks(data, count))
+        else:
+            # run batches in parallel, collect results in order
+            jobs = []
+            for i in range(0, count, self._BATCH):
+                n = min(self._BATCH, count - i)
+                part = data[i * self.block_size : (i + n) * self.block_size]
+                jobs.append(self._executor.submit(self._hash_blocks, part, n))
+            for job in jobs:
+                self._final.absorb(job.result())
+        self._blocks += count
+
+    def _finish(self, outbits):
+        blocks = self._blocks
+        if self._buf:
+            self._final.absorb(hash_many(self._capacity, PAD_SHAKE, self._chain_size, [self._buf]))
+            blocks += 1
+        self._final.absorb(right_encode(blocks) + right_encode(outbits))
+        self._final.pad(PAD_CSHAKE)
+
+    def digest(self):
+        """Return final hash digest.
+
+        State is not changed, so :meth:`update` can be
+        called again to add more data to state.
+        """
+        if self._extracting:
+            raise SpongeHashInvalidState()
+        tmp = self.copy()
+        tmp._finish(self.digest_size * 8)
+        return tmp._final.squeeze(self.digest_size)
+
+    def hexdigest(self):
+        """Return :meth:`digest` value as hexadecimal string.
+        """
+        return tohex(self.digest())
+
+    def extract(self, count):
+        """Extract ParallelHashXOF output.
+
+        Can be called repeatedly to get unlimited stream of bytes.
+        After it, :meth:`update` and :meth:`digest` will throw error.
+        """
+        if not self._extracting:
+            self._finish(0)
+            self._extracting = True
+        return self._final.squeeze(count)
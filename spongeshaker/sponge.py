@@ -40,6 +40,56 @@ class Sponge(object):
         This function reverses it.
         """
 
+    def squeeze_into(self, buf):
+        """Fill writable buffer with bytes extracted from state.
+        """
+
+    def squeeze_xor_into(self, data, out):
+        """Same as .squeeze_xor(), but write result into out.
+
+        The out buffer may be same object as data.
+        """
+
+    def encrypt_into(self, data, out):
+        """Same as .encrypt(), but write result into out.
+
+        The out buffer may be same object as data.
+        """
+
+    def decrypt_into(self, enc_data, out):
+        """Same as .decrypt(), but write result into out.
+
+        The out buffer may be same object as enc_data.
+        """
+
+    def wrap_absorb(self, data, pad):
+        """Absorb data in SpongeWrap blocks.
+
+        Data is added in blocks of rbytes-1 bytes, last byte of
+        rate is left for frame bit.  When block is full and more
+        data follows, state is padded with pad.
+        """
+
+    def wrap_encrypt(self, data, pad):
+        """Same as .encrypt(), but in SpongeWrap blocks.
+        """
+
+    def wrap_decrypt(self, enc_data, pad):
+        """Same as .decrypt(), but in SpongeWrap blocks.
+        """
+
+    def wrap_encrypt_into(self, data, out, pad):
+        """Same as .wrap_encrypt(), but write result into out.
+
+        The out buffer may be same object as data.
+        """
+
+    def wrap_decrypt_into(self, enc_data, out, pad):
+        """Same as .wrap_decrypt(), but write result into out.
+
+        The out buffer may be same object as enc_data.
+        """
+
     def pad(self, suffix):
         """pad(suffix) - Add padding and permute state.
 
@@ -52,6 +102,17 @@ class Sponge(object):
         is bad style.
         """
 
+    def finalize_copy(self, suffix, nbytes):
+        """Pad and squeeze temporary copy of state.
+
+        Same as copy() + pad(suffix) + squeeze(nbytes), but without
+        allocating new object.  State is not changed.
+        """
+
+    def reset(self):
+        """Clear whole state, keep capacity and rounds.
+        """
+
     def rewind(self):
         """Move internal position to start of state.
 
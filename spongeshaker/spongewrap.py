@@ -6,13 +6,10 @@ http://sponge.noekeon.org/SpongeDuplex.pdf
 from __future__ import division, absolute_import, print_function
 
 from spongeshaker.keccak import KeccakSponge
-from spongeshaker.util import fromhex
+from spongeshaker.util import fromhex, pack_state, unpack_state, sponge_from_bytes, _restore
 
 __all__ = ['SpongeWrap']
 
-# empty byte-string
-_EMPTY = fromhex("")
-
 # next block will be key stream
 _PAD_KEYSTREAM = fromhex("03")
 
@@ -27,6 +24,8 @@ class SpongeWrap(object):
 
     Frame bit = 0: next block will not be keystream.
     Frame bit = 1: next block will be keystream.
+
+    Block loop runs in C, see :meth:`spongeshaker.sponge.Sponge.wrap_encrypt`.
     """
     __slots__ = ('_sponge', '_cur_pad')
 
@@ -34,7 +33,33 @@ class SpongeWrap(object):
         self._sponge = sponge_class(capacity)
         self._cur_pad = _PAD_PLAINSTREAM
 
-    def _add(self, data, this_pad, sfunc):
+    # to_bytes() layout version
+    _STATE_VERSION = 1
+
+    def to_bytes(self):
+        """Export current state as bytes.
+
+        Result contains keyed state, so it must be kept secret.
+        """
+        return pack_state(self._STATE_VERSION, self._sponge.to_bytes(),
+                          self._cur_pad or b'')
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Create object from :meth:`to_bytes` result.
+        """
+        sponge, cur_pad = unpack_state(data, cls._STATE_VERSION, 2)
+        if cur_pad not in (b'', _PAD_KEYSTREAM, _PAD_PLAINSTREAM):
+            raise ValueError("Invalid state")
+        obj = cls.__new__(cls)
+        obj._sponge = sponge_from_bytes(sponge)
+        obj._cur_pad = cur_pad or None
+        return obj
+
+    def __reduce__(self):
+        return (_restore, (self.__class__, self.to_bytes()))
+
+    def _start(self, this_pad):
         if not self._cur_pad:
             raise Exception("SpongeWrap: cannot add data after digest is called")
         if this_pad != self._cur_pad:
@@ -42,34 +67,33 @@ class SpongeWrap(object):
             self._sponge.pad(this_pad)
             self._cur_pad = this_pad
 
-        # add data block-by-block
-        dpos = 0
-        maxbytes = self._sponge.rbytes - 1
-        res = []
-        while dpos < len(data):
-            bpos = self._sponge.pos
-            avail = maxbytes - bpos
-            if avail == 0:
-                self._sponge.pad(this_pad)
-                continue
-            dlen = len(data) - dpos
-            if dlen > avail:
-                dlen = avail
-            processed = sfunc(data[dpos : dpos + dlen])
-            res.append(processed)
-            dpos += dlen
-        return res
-
     def add_header(self, data):
-        self._add(data, _PAD_PLAINSTREAM, self._sponge.absorb)
+        self._start(_PAD_PLAINSTREAM)
+        self._sponge.wrap_absorb(data, _PAD_PLAINSTREAM)
 
     def encrypt_body(self, data):
-        res = self._add(data, _PAD_KEYSTREAM, self._sponge.encrypt)
-        return _EMPTY.join(res)
+        self._start(_PAD_KEYSTREAM)
+        return self._sponge.wrap_encrypt(data, _PAD_KEYSTREAM)
 
     def decrypt_body(self, data):
-        res = self._add(data, _PAD_KEYSTREAM, self._sponge.decrypt)
-        return _EMPTY.join(res)
+        self._start(_PAD_KEYSTREAM)
+        return self._sponge.wrap_decrypt(data, _PAD_KEYSTREAM)
+
+    def encrypt_body_into(self, data, out):
+        """Encrypt data into writable buffer.
+
+        The out buffer may be same object as data.
+        """
+        self._start(_PAD_KEYSTREAM)
+        self._sponge.wrap_encrypt_into(data, out, _PAD_KEYSTREAM)
+
+    def decrypt_body_into(self, data, out):
+        """Decrypt data into writable buffer.
+
+        The out buffer may be same object as data.
+        """
+        self._start(_PAD_KEYSTREAM)
+        self._sponge.wrap_decrypt_into(data, out, _PAD_KEYSTREAM)
 
     def digest(self, digest_size):
         if self._cur_pad:
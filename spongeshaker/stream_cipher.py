@@ -10,10 +10,16 @@ can be trivially recovered.
 
 from __future__ import division, absolute_import, print_function
 
+import struct
+
 from spongeshaker.keccak import KeccakSponge
-from spongeshaker.util import PAD_KECCAK
+from spongeshaker.util import PAD_KECCAK, pack_state, unpack_state, sponge_from_bytes, _restore
+
+__all__ = ['SpongeStreamCipher', 'KeccakStreamCipher',
+           'SpongeSeekableCipher', 'KeccakSeekableCipher']
 
-__all__ = ['SpongeStreamCipher']
+# segment counter: 64-bit little-endian
+_COUNTER = struct.Struct('<Q')
 
 class SpongeStreamCipher(object):
     """Keccak Stream Cipher.
@@ -48,6 +54,36 @@ class SpongeStreamCipher(object):
         self._initial_data_pad = initial_data_pad
         self._data_pad = data_pad
 
+    # to_bytes() layout version
+    _STATE_VERSION = 1
+
+    def to_bytes(self):
+        """Export current state as bytes.
+
+        Result contains keyed state, so it must be kept secret.
+        """
+        return pack_state(self._STATE_VERSION, self._sponge.to_bytes(),
+                          self._initial_data_pad, self._data_pad,
+                          bytes(bytearray([self._state])))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Create cipher from :meth:`to_bytes` result.
+        """
+        sponge, initial_data_pad, data_pad, state = unpack_state(data, cls._STATE_VERSION, 4)
+        state = bytearray(state)
+        if len(state) != 1 or state[0] > cls._DECRYPT:
+            raise ValueError("Invalid state")
+        obj = cls.__new__(cls)
+        obj._sponge = sponge_from_bytes(sponge)
+        obj._initial_data_pad = initial_data_pad
+        obj._data_pad = data_pad
+        obj._state = state[0]
+        return obj
+
+    def __reduce__(self):
+        return (_restore, (self.__class__, self.to_bytes()))
+
     def add_initial_data(self, data):
         """Add initial data - key, iv, extra plaintext.
         """
@@ -56,16 +92,19 @@ class SpongeStreamCipher(object):
         self._state = self._INITIAL
         self._sponge.absorb(data)
 
+    def _start(self, state, errmsg):
+        if self._state not in (self._INITIAL, state):
+            raise Exception(errmsg)
+        if self._state == self._INITIAL:
+            self._sponge.pad(self._initial_data_pad)
+        self._state = state
+
     def encrypt(self, plaintext):
         """Encrypt data.
 
         Return plaintext XOR-ed with keystream.
         """
-        if self._state not in (self._INITIAL, self._ENCRYPT):
-            raise Exception("encrypt: wrong moment")
-        if self._state == self._INITIAL:
-            self._sponge.pad(self._initial_data_pad)
-        self._state = self._ENCRYPT
+        self._start(self._ENCRYPT, "encrypt: wrong moment")
         return self._sponge.squeeze_xor(plaintext)
 
     def decrypt(self, ciphertext):
@@ -73,14 +112,235 @@ class SpongeStreamCipher(object):
 
         Return ciphertext XOR-ed with keystream.
         """
-        if self._state not in (self._INITIAL, self._DECRYPT):
-            raise Exception("decrypt: wrong moment")
-        if self._state == self._INITIAL:
-            self._sponge.pad(self._initial_data_pad)
-        self._state = self._DECRYPT
+        self._start(self._DECRYPT, "decrypt: wrong moment")
         return self._sponge.squeeze_xor(ciphertext)
 
+    def encrypt_into(self, plaintext, out):
+        """Encrypt data into writable buffer.
+
+        Writes plaintext XOR-ed with keystream into out,
+        which may be same object as plaintext.
+        """
+        self._start(self._ENCRYPT, "encrypt: wrong moment")
+        self._sponge.squeeze_xor_into(plaintext, out)
+
+    def decrypt_into(self, ciphertext, out):
+        """Decrypt data into writable buffer.
+
+        Writes ciphertext XOR-ed with keystream into out,
+        which may be same object as ciphertext.
+        """
+        self._start(self._DECRYPT, "decrypt: wrong moment")
+        self._sponge.squeeze_xor_into(ciphertext, out)
+
 class KeccakStreamCipher(SpongeStreamCipher):
     def __init__(self, capacity=512, initial_data_pad=PAD_KECCAK, data_pad=PAD_KECCAK):
         super(KeccakStreamCipher, self).__init__(KeccakSponge(capacity), initial_data_pad, data_pad)
 
+
+class SpongeSeekableCipher(object):
+    """Seekable stream cipher.
+
+    Keystream is split into segments of segment_size bytes,
+    each is generated from separate copy of keyed state:
+
+    1. base = absorb(initial data), pad(initial_data_pad)
+    2. segment N = copy(base), absorb(N as 64-bit little-endian), pad(segment_pad)
+    3. keystream for segment N = squeeze(segment_size)
+
+    So any byte offset can be decrypted without processing
+    data before it, and segments can be processed in parallel.
+    Larger segments make sequential processing faster,
+    but random access needs to skip more keystream.
+
+    Same rules apply as for :class:`SpongeStreamCipher` - each
+    stream must have unique key or IV.  This cipher gives no
+    authentication.
+
+    Example::
+
+        c = KeccakSeekableCipher()
+        c.add_initial_data(key + iv)
+        ciphertext = c.encrypt(cleartext)
+
+        c = KeccakSeekableCipher()
+        c.add_initial_data(key + iv)
+        part = c.decrypt_range(ciphertext, 100000, 100)
+    """
+    __slots__ = ('_base', '_ready', '_segment_size', '_initial_data_pad', '_segment_pad',
+                 '_pos', '_cur', '_cur_seg', '_cur_pos')
+
+    # number of segments in one executor job
+    _BATCH = 16
+
+    def __init__(self, sponge, segment_size=4096,
+                 initial_data_pad=PAD_KECCAK, segment_pad=PAD_KECCAK):
+        """Set up cipher with given sponge, segment size and padding.
+        """
+        if segment_size < 1:
+            raise ValueError("segment_size must be positive")
+        self._base = sponge
+        self._ready = False
+        self._segment_size = segment_size
+        self._initial_data_pad = initial_data_pad
+        self._segment_pad = segment_pad
+        self._pos = 0
+        self._cur = None
+        self._cur_seg = -1
+        self._cur_pos = 0
+
+    @property
+    def segment_size(self):
+        """Segment size in bytes."""
+        return self._segment_size
+
+    def add_initial_data(self, data):
+        """Add initial data - key, iv.
+        """
+        if self._ready:
+            raise Exception("add_initial_data: wrong moment")
+        self._base.absorb(data)
+
+    def _start(self):
+        if not self._ready:
+            self._base.pad(self._initial_data_pad)
+            self._ready = True
+
+    def _segment(self, index):
+        """Return sponge positioned at start of segment keystream.
+        """
+        sponge = self._base.copy()
+        sponge.absorb(_COUNTER.pack(index))
+        sponge.pad(self._segment_pad)
+        return sponge
+
+    def _crypt(self, src, out, offset, cache=False):
+        """XOR src with keystream starting at offset, write to out.
+        """
+        ssize = self._segment_size
+        pos = 0
+        while pos < len(src):
+            seg, spos = divmod(offset + pos, ssize)
+            n = min(ssize - spos, len(src) - pos)
+            if cache and seg == self._cur_seg and spos == self._cur_pos:
+                sponge = self._cur
+            else:
+                sponge = self._segment(seg)
+                if spos:
+                    sponge.squeeze(spos)
+            sponge.squeeze_xor_into(src[pos : pos + n], out[pos : pos + n])
+            pos += n
+            if cache:
+                self._cur, self._cur_seg, self._cur_pos = sponge, seg, spos + n
+
+    def _crypt_range(self, data, offset, length, executor):
+        self._start()
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        src = memoryview(data)[offset:]
+        if length is not None:
+            src = src[:length]
+        out = bytearray(len(src))
+        dst = memoryview(out)
+        job_size = self._segment_size * self._BATCH
+        if executor is None or len(src) <= job_size:
+            self._crypt(src, dst, offset)
+            return bytes(out)
+
+        # jobs start at segment boundary, except first one
+        jobs = []
+        pos = 0
+        while pos < len(src):
+            end = min(len(src), pos + job_size - (offset + pos) % job_size)
+            jobs.append(executor.submit(self._crypt, src[pos:end], dst[pos:end], offset + pos))
+            pos = end
+        for job in jobs:
+            job.result()
+        return bytes(out)
+
+    def keystream(self, offset, length):
+        """Return keystream bytes at given offset.
+        """
+        self._start()
+        out = bytearray(length)
+        self._crypt(memoryview(out), memoryview(out), offset)
+        return bytes(out)
+
+    def encrypt_range(self, data, offset, length=None, executor=None):
+        """Encrypt part of data.
+
+        Parameters:
+            data
+                Whole plaintext stream, or buffer object over it (eg. mmap).
+            offset
+                Start position in stream.
+            length
+                Number of bytes, default: until end of data.
+            executor
+                Optional :class:`concurrent.futures.Executor`
+                to process segments in parallel.
+
+        Returns encrypted bytes for data[offset:offset+length].
+        Does not affect position of :meth:`encrypt`.
+        """
+        return self._crypt_range(data, offset, length, executor)
+
+    def decrypt_range(self, data, offset, length=None, executor=None):
+        """Decrypt part of data.
+
+        Parameters are same as for :meth:`encrypt_range`,
+        data is whole ciphertext.
+
+        Returns decrypted bytes for data[offset:offset+length].
+        """
+        return self._crypt_range(data, offset, length, executor)
+
+    def seek(self, offset):
+        """Set position for :meth:`encrypt` and :meth:`decrypt`.
+        """
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+        self._pos = offset
+
+    def tell(self):
+        """Return current position.
+        """
+        return self._pos
+
+    def encrypt(self, plaintext):
+        """Encrypt data at current position.
+        """
+        out = bytearray(len(plaintext))
+        self.encrypt_into(plaintext, out)
+        return bytes(out)
+
+    def decrypt(self, ciphertext):
+        """Decrypt data at current position.
+        """
+        return self.encrypt(ciphertext)
+
+    def encrypt_into(self, plaintext, out):
+        """Encrypt data at current position into writable buffer.
+
+        The out buffer may be same object as plaintext.
+        """
+        src = memoryview(plaintext)
+        dst = memoryview(out)
+        if len(dst) < len(src):
+            raise ValueError("Output buffer too small")
+        self._start()
+        self._crypt(src, dst, self._pos, True)
+        self._pos += len(src)
+
+    def decrypt_into(self, ciphertext, out):
+        """Decrypt data at current position into writable buffer.
+
+        The out buffer may be same object as ciphertext.
+        """
+        self.encrypt_into(ciphertext, out)
+
+class KeccakSeekableCipher(SpongeSeekableCipher):
+    def __init__(self, capacity=512, segment_size=4096,
+                 initial_data_pad=PAD_KECCAK, segment_pad=PAD_KECCAK):
+        super(KeccakSeekableCipher, self).__init__(KeccakSponge(capacity), segment_size,
+                                                   initial_data_pad, segment_pad)
@@ -0,0 +1,56 @@
+"""STROBE protocol framework.
+
+Implements STROBE v1.0.2 with 128-bit security on Keccak-f1600,
+compatible with reference implementation and Merlin transcripts.
+
+https://strobe.sourceforge.io/specs/
+
+Operations are methods of :class:`Strobe`, each of them is one C call.
+Every operation has meta_* variant for framing data, and takes
+optional ``more`` argument that continues previous operation::
+
+    >>> s = Strobe(b'example protocol')
+    >>> s.key(b'secret key')
+    >>> s.meta_ad(b'len=5')
+    >>> ct = s.send_enc(b'hello')
+    >>> mac = s.send_mac(16)
+    >>> r = Strobe(b'example protocol')
+    >>> r.key(b'secret key')
+    >>> r.meta_ad(b'len=5')
+    >>> r.recv_enc(ct)
+    b'hello'
+    >>> r.recv_mac(mac)
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.keccak import Strobe
+
+__all__ = ['Strobe', 'AuthenticationFailed',
+           'FLAG_I', 'FLAG_A', 'FLAG_C', 'FLAG_T', 'FLAG_M',
+           'OP_AD', 'OP_KEY', 'OP_PRF', 'OP_SEND_CLR', 'OP_RECV_CLR',
+           'OP_SEND_ENC', 'OP_RECV_ENC', 'OP_SEND_MAC', 'OP_RECV_MAC', 'OP_RATCHET']
+
+# operation flags, for Strobe.operate()
+FLAG_I = 0x01
+FLAG_A = 0x02
+FLAG_C = 0x04
+FLAG_T = 0x08
+FLAG_M = 0x10
+
+OP_AD = FLAG_A
+OP_KEY = FLAG_A | FLAG_C
+OP_PRF = FLAG_I | FLAG_A | FLAG_C
+OP_SEND_CLR = FLAG_A | FLAG_T
+OP_RECV_CLR = FLAG_I | FLAG_A | FLAG_T
+OP_SEND_ENC = FLAG_A | FLAG_C | FLAG_T
+OP_RECV_ENC = FLAG_I | FLAG_A | FLAG_C | FLAG_T
+OP_SEND_MAC = FLAG_C | FLAG_T
+OP_RECV_MAC = FLAG_I | FLAG_C | FLAG_T
+OP_RATCHET = FLAG_C
+
+class AuthenticationFailed(Exception):
+    """Raised by :meth:`Strobe.recv_mac` if MAC does not match.
+
+    State is then unusable for further messages.
+    """
@@ -0,0 +1,290 @@
+"""Tree hashing with SHAKE.
+
+Input is split into chunks, each chunk is hashed separately
+into chaining value (CV), then CVs are hashed in final node.
+Chunks can be hashed in parallel, and when data changes only
+affected chunks need to be hashed again.
+
+Format, for SHAKE128 (c=256, 32-byte CVs) or SHAKE256 (c=512, 64-byte CVs):
+
+1. CV[i] = SHAKE(chunk[i] || 0x00), chunk_size bytes, last one may be shorter.
+2. digest = SHAKE(CV[0] || ... || CV[n-1] || u64(n) || u64(chunk_size) || u64(length) || 0x01)
+
+Integers are little-endian.  Empty input has no chunks.
+
+This is not compatible with any standard tree hash,
+it is meant for content addressing in closed systems.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import mmap
+import os
+import struct
+
+from spongeshaker.keccak import KeccakSponge, hash_many
+from spongeshaker.sha3 import PAD_SHAKE
+from spongeshaker.util import tohex, pack_state, unpack_state, _restore
+
+__all__ = ['TreeHash', 'tree_hash']
+
+# leaf: 0x00 suffix, then SHAKE padding
+_PAD_LEAF = b'\x00' + PAD_SHAKE
+
+# final node: 0x01 suffix, then SHAKE padding
+_PAD_ROOT = b'\x01' + PAD_SHAKE
+
+_ROOT_INFO = struct.Struct('<QQQ')
+
+DEFAULT_CHUNK = 1024 * 1024
+
+# chunks per job
+DEFAULT_BATCH = 16
+
+def _hash_chunks(data, capacity, chunk_size, first, count):
+    """Return CVs for count chunks starting from first.
+    """
+    start = first * chunk_size
+    end = min(len(data), start + count * chunk_size)
+    offsets = list(range(start, end, chunk_size)) + [end]
+    return hash_many(capacity, _PAD_LEAF, capacity // 8, data, offsets)
+
+def _hash_file_chunks(path, capacity, chunk_size, first, count):
+    """Same as _hash_chunks(), but on file.
+
+    Each worker maps file itself, so only path is sent to it.
+    """
+    with open(path, 'rb') as f:
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _hash_chunks(m, capacity, chunk_size, first, count)
+        finally:
+            m.close()
+
+def _runs(indexes, batch):
+    """Split sorted chunk indexes into (first, count) runs of at most batch chunks.
+    """
+    first = count = 0
+    for i in indexes:
+        if count and (i != first + count or count == batch):
+            yield first, count
+            count = 0
+        if not count:
+            first = i
+        count += 1
+    if count:
+        yield first, count
+
+class _Source(object):
+    """Data for hashing: buffer or mapped file.
+    """
+    __slots__ = ('path', 'data', 'length', '_map')
+
+    def __init__(self, source):
+        self.path = None
+        self._map = None
+        if isinstance(source, (str, type(u''))):
+            self.path = source
+            with open(source, 'rb') as f:
+                self.length = os.fstat(f.fileno()).st_size
+                if self.length:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.data = self._map or b''
+        else:
+            self.data = source
+            self.length = len(memoryview(source))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+class TreeHash(object):
+    """Tree hash state: leaf CVs and parameters.
+
+    It works as index for incremental re-hashing: :meth:`update`
+    with list of changed ranges hashes only chunks that overlap them.
+
+    Parameters:
+        capacity
+            256 for SHAKE128, 512 for SHAKE256.
+        chunk_size
+            Leaf size in bytes.
+        digest_size
+            Output size for :meth:`digest` in bits.
+            Default: same as capacity.
+    """
+    __slots__ = ('capacity', 'chunk_size', 'digest_size', 'length', '_cvs')
+
+    # to_bytes() layout version
+    _STATE_VERSION = 1
+
+    def __init__(self, capacity=256, chunk_size=DEFAULT_CHUNK, digest_size=None):
+        if capacity not in (256, 512):
+            raise ValueError("capacity must be 256 or 512")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        if digest_size is None:
+            digest_size = capacity
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.digest_size, rem = divmod(digest_size, 8)
+        if rem:
+            raise ValueError("digest_size must be multiple of 8")
+        self.length = 0
+        self._cvs = bytearray()
+
+    @property
+    def cv_size(self):
+        """Size of one chaining value in bytes."""
+        return self.capacity // 8
+
+    @property
+    def chunk_count(self):
+        """Number of chunks."""
+        return len(self._cvs) // self.cv_size
+
+    def leaf_digest(self, index):
+        """Return CV for chunk.
+        """
+        n = self.cv_size
+        return bytes(self._cvs[index * n : (index + 1) * n])
+
+    def update(self, source, changed=None, executor=None,
+               batch=DEFAULT_BATCH, max_pending=None):
+        """Hash data, reusing CVs of unchanged chunks.
+
+        Parameters:
+            source
+                Filename or buffer object with whole data.
+            changed
+                List of (offset, length) ranges that have changed since
+                last update.  Chunks after old length are always hashed.
+                None means all data is new.
+            executor
+                Optional :class:`concurrent.futures.Executor`.  Process pools
+                work only with filename, then each worker maps file itself.
+            batch
+                Number of chunks in one job.
+            max_pending
+                Number of jobs submitted at once, limits memory used
+                by results waiting in order.  Default: 4 * CPU count.
+        """
+        src = _Source(source)
+        try:
+            self._update(src, changed, executor, batch, max_pending)
+        finally:
+            src.close()
+
+    def _dirty_chunks(self, length, changed):
+        cs = self.chunk_size
+        count = (length + cs - 1) // cs
+        if changed is None:
+            return range(count)
+        dirty = set()
+        for ofs, ln in changed:
+            if ln > 0:
+                dirty.update(range(ofs // cs, min(count, (ofs + ln + cs - 1) // cs)))
+        if length != self.length or count != self.chunk_count:
+            # last chunk and everything after it
+            dirty.update(range(min(length, self.length) // cs, count))
+        return sorted(dirty)
+
+    def _update(self, src, changed, executor, batch, max_pending):
+        cvlen = self.cv_size
+        count = (src.length + self.chunk_size - 1) // self.chunk_size
+        dirty = self._dirty_chunks(src.length, changed)
+
+        cvs = self._cvs[: count * cvlen]
+        if len(cvs) < count * cvlen:
+            cvs += bytearray(count * cvlen - len(cvs))
+
+        if executor is None:
+            for first, n in _runs(dirty, batch):
+                res = _hash_chunks(src.data, self.capacity, self.chunk_size, first, n)
+                cvs[first * cvlen : (first + n) * cvlen] = res
+        else:
+            if max_pending is None:
+                max_pending = 4 * (os.cpu_count() if hasattr(os, 'cpu_count') else 1)
+            pending = []
+            for first, n in _runs(dirty, batch):
+                if src.path is not None:
+                    fut = executor.submit(_hash_file_chunks, src.path, self.capacity,
+                                          self.chunk_size, first, n)
+                else:
+                    fut = executor.submit(_hash_chunks, src.data, self.capacity,
+                                          self.chunk_size, first, n)
+                pending.append((first, n, fut))
+                if len(pending) >= max_pending:
+                    first, n, fut = pending.pop(0)
+                    cvs[first * cvlen : (first + n) * cvlen] = fut.result()
+            for first, n, fut in pending:
+                cvs[first * cvlen : (first + n) * cvlen] = fut.result()
+
+        self._cvs = cvs
+        self.length = src.length
+
+    def digest(self):
+        """Return root digest.
+        """
+        s = KeccakSponge(self.capacity)
+        s.absorb(self._cvs)
+        s.absorb(_ROOT_INFO.pack(self.chunk_count, self.chunk_size, self.length))
+        s.pad(_PAD_ROOT)
+        return s.squeeze(self.digest_size)
+
+    def hexdigest(self):
+        """Return :meth:`digest` value as hexadecimal string.
+        """
+        return tohex(self.digest())
+
+    def to_bytes(self):
+        """Export parameters and CVs, for caching between runs.
+        """
+        params = struct.pack('<HQIQ', self.capacity, self.chunk_size,
+                             self.digest_size, self.length)
+        return pack_state(self._STATE_VERSION, params) + bytes(self._cvs)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load :meth:`to_bytes` result.
+        """
+        data = bytes(data)
+        hdrlen = 1 + 2 + 22
+        params, = unpack_state(data[:hdrlen], cls._STATE_VERSION, 1)
+        if len(params) != 22:
+            raise ValueError("Invalid state")
+        capacity, chunk_size, digest_size, length = struct.unpack('<HQIQ', params)
+        obj = cls(capacity, chunk_size, digest_size * 8)
+        obj.length = length
+        obj._cvs = bytearray(data[hdrlen:])
+        count = (length + chunk_size - 1) // chunk_size
+        if len(obj._cvs) != count * obj.cv_size:
+            raise ValueError("Invalid state")
+        return obj
+
+    def __reduce__(self):
+        return (_restore, (self.__class__, self.to_bytes()))
+
+def tree_hash(source, capacity=256, chunk_size=DEFAULT_CHUNK, digest_size=None,
+              executor=None):
+    """Hash file or buffer.
+
+    Parameters:
+        source
+            Filename or buffer object.
+        capacity
+            256 for SHAKE128, 512 for SHAKE256.
+        chunk_size
+            Leaf size in bytes.
+        digest_size
+            Output size in bits.
+        executor
+            Optional :class:`concurrent.futures.Executor`.
+
+    Returns :class:`TreeHash`, which can be kept for
+    incremental updates.
+    """
+    th = TreeHash(capacity, chunk_size, digest_size)
+    th.update(source, None, executor)
+    return th
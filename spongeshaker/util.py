@@ -28,3 +28,64 @@ else:
 # Simple 10*1 padding for basic Keccak
 PAD_KECCAK = fromhex('01')
 
+
+#
+# Serialization helpers for to_bytes()/from_bytes().
+#
+# Layout: version byte, then fields, each prefixed with
+# 2-byte little-endian length.
+#
+
+def pack_state(version, *fields):
+    """Pack byte-string fields with version byte in front.
+
+    Raises ValueError if field is longer than 0xFFFF bytes.
+    """
+    res = bytearray([version])
+    for f in fields:
+        if len(f) > 0xFFFF:
+            raise ValueError("field too long for state layout")
+        res += bytearray([len(f) & 0xFF, len(f) >> 8])
+        res += f
+    return bytes(res)
+
+def unpack_state(data, version, count):
+    """Return list of fields packed with :func:`pack_state`.
+
+    Raises ValueError if version or field count does not match.
+    """
+    data = bytearray(data)
+    if not data or data[0] != version:
+        raise ValueError("Unsupported state version")
+    fields = []
+    pos = 1
+    while pos < len(data):
+        if pos + 2 > len(data):
+            raise ValueError("Invalid state")
+        flen = data[pos] | (data[pos + 1] << 8)
+        pos += 2
+        if pos + flen > len(data):
+            raise ValueError("Invalid state")
+        fields.append(bytes(data[pos : pos + flen]))
+        pos += flen
+    if len(fields) != count:
+        raise ValueError("Invalid state")
+    return fields
+
+def sponge_from_bytes(data):
+    """Create sponge object from its to_bytes() result.
+
+    Class is selected by state width byte.
+    """
+    from spongeshaker import keccak
+    classes = {200: keccak.KeccakSponge, 100: keccak.KeccakSponge800,
+               50: keccak.KeccakSponge400, 25: keccak.KeccakSponge200}
+    data = bytearray(data)
+    if len(data) < 2 or data[1] not in classes:
+        raise ValueError("Invalid sponge state")
+    return classes[data[1]].from_bytes(data)
+
+def _restore(cls, data):
+    """Pickle helper for classes with from_bytes().
+    """
+    return cls.from_bytes(data)
@@ -41,7 +41,7 @@
 #include <limits.h>
 #include <string.h>
 
-/* For SHA3 variant of Keccak */
+/* Rounds in full Keccak-f1600, reduced-round Keccak-p uses last ones */
 #define KECCAK_ROUNDS 24
 
 /*
@@ -151,14 +151,14 @@ static const uint8_t PiLane[24] = {
 	10, 7, 11, 17, 18, 3, 5, 16, 8, 21, 24, 4, 15, 23, 19, 13, 12, 2, 20, 14, 22, 9, 6, 1
 };
 
-static void keccak_f(struct KeccakContext *ctx)
+static void keccak_f_small(struct KeccakContext *ctx)
 {
 	int i, j;
 	uint64_t *A = ctx->u.state64;
 	uint64_t tmpbuf[5 + 2], *tmp = tmpbuf + 1;
 	uint64_t d, c1, c2;
 
-	for (j = 0; j < KECCAK_ROUNDS; j++) {
+	for (j = KECCAK_ROUNDS - ctx->rounds; j < KECCAK_ROUNDS; j++) {
 		/* Theta step */
 		for (i = 0; i < 5; i++)
 			tmp[i] = A[0*5 + i] ^ A[1*5 + i] ^ A[2*5 + i] ^ A[3*5 + i] ^ A[4*5 + i];
@@ -200,7 +200,11 @@ static void keccak_f(struct KeccakContext *ctx)
 
 #else /* !KECCAK_SMALL - fast 64-bit */
 
-static void keccak_f(struct KeccakContext *ctx)
+/*
+ * In-place version, 4 rounds unrolled.
+ */
+
+static void keccak_f_generic(struct KeccakContext *ctx)
 {
 	uint64_t *state = ctx->u.state64;
 	uint64_t Ba, Be, Bi, Bo, Bu;
@@ -234,7 +238,7 @@ static void keccak_f(struct KeccakContext *ctx)
 #define Aso state[23]
 #define Asu state[24]
 
-	for (i = 0; i < KECCAK_ROUNDS; i += 4) {
+	for (i = KECCAK_ROUNDS - ctx->rounds; i < KECCAK_ROUNDS; i += 4) {
 		/* Code for 4 rounds */
 		Ca = Aba^Aga^Aka^Ama^Asa;
 		Ce = Abe^Age^Ake^Ame^Ase;
@@ -504,8 +508,59 @@ static void keccak_f(struct KeccakContext *ctx)
 		Aso =   Bo ^((~Bu)&  Ba );
 		Asu =   Bu ^((~Ba)&  Be );
 	}
+#undef Aba
+#undef Abe
+#undef Abi
+#undef Abo
+#undef Abu
+#undef Aga
+#undef Age
+#undef Agi
+#undef Ago
+#undef Agu
+#undef Aka
+#undef Ake
+#undef Aki
+#undef Ako
+#undef Aku
+#undef Ama
+#undef Ame
+#undef Ami
+#undef Amo
+#undef Amu
+#undef Asa
+#undef Ase
+#undef Asi
+#undef Aso
+#undef Asu
 }
 
+/*
+ * Versions with lanes in local variables, from template.
+ */
+
+#if (defined(__GNUC__) || defined(__clang__)) && defined(__x86_64__)
+#define KECCAK_BMI
+#endif
+
+#define KF_NAME lcomp
+#define KF_TARGET
+#define KF_COMPLEMENT 1
+#include "keccak_f_tmpl.h"
+#undef KF_NAME
+#undef KF_TARGET
+#undef KF_COMPLEMENT
+
+#ifdef KECCAK_BMI
+#define KF_NAME bmi1
+#define KF_TARGET __attribute__((target("bmi")))
+#define KF_COMPLEMENT 0
+#include "keccak_f_tmpl.h"
+#undef KF_NAME
+#undef KF_TARGET
+#undef KF_COMPLEMENT
+#endif
+
 #endif /* !KECCAK_SMALL */
 
 static inline void xor_lane(struct KeccakContext *ctx, int lane, uint64_t val)
@@ -651,7 +706,7 @@ static const uint32_t RoundConstants32[2*KECCAK_ROUNDS] = {
 	Du0 = Cw^rol32(Cz, 1); \
 	Du1 = Cy^Cx;
 
-static void keccak_f(struct KeccakContext *ctx)
+static void keccak_f_32bit(struct KeccakContext *ctx)
 {
 	uint32_t *state = ctx->u.state32;
 	uint32_t Da0, De0, Di0, Do0, Du0;
@@ -717,7 +772,7 @@ static void keccak_f(struct KeccakContext *ctx)
 #define Asu0 state[48]
 #define Asu1 state[49]
 
-	for (i = 0; i < KECCAK_ROUNDS*2; i += 8) {
+	for (i = (KECCAK_ROUNDS - ctx->rounds)*2; i < KECCAK_ROUNDS*2; i += 8) {
 		/* Code for 4 rounds */
 		KeccakAtoD_round0();
 
@@ -1224,6 +1279,112 @@ static void extract(uint8_t *dst, const struct KeccakContext *ctx, int startLane
 #endif /* KECCAK_32BIT */
 
 
+/*
+ * Smaller widths - Keccak-p[200], [400] and [800].
+ *
+ * Lanes are 8, 16 or 32 bits, state is kept as bytes.
+ */
+
+/* low 32 bits of Keccak-f1600 round constants, truncated further to lane size */
+static const uint32_t RoundConstantsSmall[22] = {
+	0x00000001, 0x00008082, 0x0000808A, 0x80008000, 0x0000808B, 0x80000001,
+	0x80008081, 0x00008009, 0x0000008A, 0x00000088, 0x80008009, 0x8000000A,
+	0x8000808B, 0x0000008B, 0x00008089, 0x00008003, 0x00008002, 0x00000080,
+	0x0000800A, 0x8000000A, 0x80008081, 0x00008080,
+};
+
+#define SM_BITS 8
+#define SM_TYPE uint8_t
+#define SM_ROUNDS 18
+#include "keccak_small_tmpl.h"
+#undef SM_BITS
+#undef SM_TYPE
+#undef SM_ROUNDS
+
+#define SM_BITS 16
+#define SM_TYPE uint16_t
+#define SM_ROUNDS 20
+#include "keccak_small_tmpl.h"
+#undef SM_BITS
+#undef SM_TYPE
+#undef SM_ROUNDS
+
+#define SM_BITS 32
+#define SM_TYPE uint32_t
+#define SM_ROUNDS 22
+#include "keccak_small_tmpl.h"
+#undef SM_BITS
+#undef SM_TYPE
+#undef SM_ROUNDS
+
+/*
+ * Keccak-f1600 implementations, in order of preference.
+ */
+
+struct KeccakBackend {
+	const char *name;
+	void (*func)(struct KeccakContext *ctx);
+};
+
+static const struct KeccakBackend backend_list[] = {
+#if defined(KECCAK_32BIT)
+	{ "32bit", keccak_f_32bit },
+#elif defined(KECCAK_SMALL)
+	{ "small", keccak_f_small },
+#else
+#ifdef KECCAK_BMI
+	{ "bmi1", keccak_f_bmi1 },
+#endif
+	{ "lcomp", keccak_f_lcomp },
+	{ "generic", keccak_f_generic },
+#endif
+};
+
+#define BACKEND_COUNT (sizeof(backend_list) / sizeof(backend_list[0]))
+
+static const struct KeccakBackend *backend_cur;
+
+static int backend_supported(const struct KeccakBackend *be)
+{
+#ifdef KECCAK_BMI
+	if (be->func == keccak_f_bmi1) {
+		__builtin_cpu_init();
+		return __builtin_cpu_supports("bmi");
+	}
+#endif
+	return 1;
+}
+
+static void keccak_f(struct KeccakContext *ctx)
+{
+	if (!backend_cur)
+		keccak_set_backend(NULL);
+	backend_cur->func(ctx);
+}
+
+static inline int is_small(const struct KeccakContext *ctx)
+{
+	return ctx->width != 1600;
+}
+
+static void permute(struct KeccakContext *ctx)
+{
+	switch (ctx->width) {
+	case 200:
+		keccak_p8(ctx);
+		break;
+	case 400:
+		keccak_p16(ctx);
+		break;
+	case 800:
+		keccak_p32(ctx);
+		break;
+	default:
+		keccak_f(ctx);
+	}
+}
+
+
 /*
  * Common code
  */
@@ -1233,6 +1394,10 @@ static void xor_byte(struct KeccakContext *ctx, int nbyte, uint8_t val)
 	int o = nbyte / 8;
 	int s = (nbyte % 8) * 8;
 
+	if (is_small(ctx)) {
+		ctx->u.state8[nbyte] ^= val;
+		return;
+	}
 	xor_lane(ctx, o, (uint64_t)(val) << s);
 }
 
@@ -1241,6 +1406,12 @@ static void add_bytes(struct KeccakContext *ctx, const uint8_t *p, unsigned int
 	uint64_t w;
 	unsigned int m = ofs % 8;
 
+	if (is_small(ctx)) {
+		while (len--)
+			ctx->u.state8[ofs++] ^= *p++;
+		return;
+	}
+
 	/* partial word */
 	if (m) {
 		m = 8 - m;
@@ -1271,6 +1442,11 @@ static void extract_bytes(struct KeccakContext *ctx, uint8_t *dst, unsigned int
 	uint8_t lanebuf[8];
 	unsigned int n, avail;
 
+	if (is_small(ctx)) {
+		memcpy(dst, ctx->u.state8 + ofs, count);
+		return;
+	}
+
 	if (ofs % 8 != 0 || count < 8) {
 		avail = 8 - ofs % 8;
 		n = (avail > count) ? count : avail;
@@ -1300,21 +1476,117 @@ static void extract_bytes(struct KeccakContext *ctx, uint8_t *dst, unsigned int
 static inline void permute_if_needed(struct KeccakContext *ctx)
 {
 	if (ctx->pos == ctx->rbytes) {
-		keccak_f(ctx);
+		permute(ctx);
 		ctx->pos = 0;
 	}
 }
 
+/*
+ * Bulk paths for whole blocks, when pos == 0.
+ *
+ * Input is taken as full lanes directly, without per-byte
+ * position tracking.  Position stays at 0.
+ */
+
+static void absorb_blocks(struct KeccakContext *ctx, const uint8_t *src, size_t nblocks)
+{
+	unsigned int i, lanes = ctx->rbytes / 8, rem = ctx->rbytes % 8;
+
+	if (is_small(ctx)) {
+		while (nblocks--) {
+			add_bytes(ctx, src, 0, ctx->rbytes);
+			permute(ctx);
+			src += ctx->rbytes;
+		}
+		return;
+	}
+
+	while (nblocks--) {
+		for (i = 0; i < lanes; i++)
+			xor_lane(ctx, i, le64dec(src + i*8));
+		if (rem)
+			add_bytes(ctx, src + lanes*8, lanes*8, rem);
+		keccak_f(ctx);
+		src += ctx->rbytes;
+	}
+}
+
+static void squeeze_blocks(struct KeccakContext *ctx, uint8_t *dst, size_t nblocks)
+{
+	unsigned int lanes = ctx->rbytes / 8, rem = ctx->rbytes % 8;
+
+	while (nblocks--) {
+		if (is_small(ctx)) {
+			memcpy(dst, ctx->u.state8, ctx->rbytes);
+		} else {
+			extract(dst, ctx, 0, lanes);
+			if (rem)
+				extract_bytes(ctx, dst + lanes*8, lanes*8, rem);
+		}
+		permute(ctx);
+		dst += ctx->rbytes;
+	}
+}
+
+static void squeeze_xor_blocks(struct KeccakContext *ctx, uint8_t *dst, const uint8_t *src, size_t nblocks)
+{
+	uint8_t buf[200];
+	unsigned int i, rbytes = ctx->rbytes;
+
+	while (nblocks--) {
+		/* extract to temp buffer, to allow dst == src */
+		squeeze_blocks(ctx, buf, 1);
+		for (i = 0; i < rbytes; i++)
+			dst[i] = src[i] ^ buf[i];
+		src += rbytes;
+		dst += rbytes;
+	}
+	memset(buf, 0, sizeof(buf));
+}
+
 /*
  * Public API
  */
 
 int keccak_init(struct KeccakContext *ctx, unsigned int capacity)
 {
-	if (capacity % 8 != 0 || capacity < 8 || capacity > (1600 - 8))
+	return keccak_init_rounds(ctx, capacity, KECCAK_ROUNDS);
+}
+
+int keccak_init_rounds(struct KeccakContext *ctx, unsigned int capacity, unsigned int rounds)
+{
+	return keccak_init_width(ctx, 1600, capacity, rounds);
+}
+
+unsigned int keccak_full_rounds(unsigned int width)
+{
+	switch (width) {
+	case 200: return 18;
+	case 400: return 20;
+	case 800: return 22;
+	case 1600: return KECCAK_ROUNDS;
+	}
+	return 0;
+}
+
+int keccak_init_width(struct KeccakContext *ctx, unsigned int width,
+		      unsigned int capacity, unsigned int rounds)
+{
+	unsigned int maxrounds = keccak_full_rounds(width);
+
+	if (!maxrounds)
+		return 0;
+	if (capacity % 8 != 0 || capacity < 8 || capacity > (width - 8))
+		return 0;
+	if (rounds < 1 || rounds > maxrounds)
+		return 0;
+	/* unrolled implementations do 4 rounds at a time */
+	if (width == 1600 && (rounds % 4 != 0 || rounds < 4))
 		return 0;
 	memset(ctx, 0, sizeof(struct KeccakContext));
-	ctx->rbytes = (1600 - capacity) / 8;
+	ctx->rbytes = (width - capacity) / 8;
+	ctx->rounds = rounds;
+	ctx->width = width;
 	return 1;
 }
 
@@ -1322,8 +1594,16 @@ void keccak_absorb(struct KeccakContext *ctx, const void *data, size_t len)
 {
 	unsigned int n, avail;
 	const uint8_t *src = data;
+	size_t nblocks;
 
 	while (len > 0) {
+		if (ctx->pos == 0 && len >= ctx->rbytes) {
+			nblocks = len / ctx->rbytes;
+			absorb_blocks(ctx, src, nblocks);
+			src += nblocks * ctx->rbytes;
+			len -= nblocks * ctx->rbytes;
+			continue;
+		}
 		avail = ctx->rbytes - ctx->pos;
 		n = (len > avail) ? avail : len;
 
@@ -1340,8 +1620,16 @@ void keccak_absorb(struct KeccakContext *ctx, const void *data, size_t len)
 void keccak_squeeze(struct KeccakContext *ctx, uint8_t *dst, size_t len)
 {
 	unsigned int avail, n;
+	size_t nblocks;
 
 	while (len > 0) {
+		if (ctx->pos == 0 && len >= ctx->rbytes) {
+			nblocks = len / ctx->rbytes;
+			squeeze_blocks(ctx, dst, nblocks);
+			dst += nblocks * ctx->rbytes;
+			len -= nblocks * ctx->rbytes;
+			continue;
+		}
 		avail = ctx->rbytes - ctx->pos;
 		n = (len > avail) ? avail : len;
 
@@ -1358,15 +1646,26 @@ void keccak_squeeze(struct KeccakContext *ctx, uint8_t *dst, size_t len)
 void keccak_squeeze_xor(struct KeccakContext *ctx, uint8_t *dst, const void *data, size_t len)
 {
 	const uint8_t *src = data;
+	uint8_t buf[200];
 	unsigned int n, avail, i;
+	size_t nblocks;
 
 	while (len > 0) {
+		if (ctx->pos == 0 && len >= ctx->rbytes) {
+			nblocks = len / ctx->rbytes;
+			squeeze_xor_blocks(ctx, dst, src, nblocks);
+			src += nblocks * ctx->rbytes;
+			dst += nblocks * ctx->rbytes;
+			len -= nblocks * ctx->rbytes;
+			continue;
+		}
 		avail = ctx->rbytes - ctx->pos;
 		n = (len > avail) ? avail : len;
 
-		extract_bytes(ctx, dst, ctx->pos, n);
+		/* extract to temp buffer, to allow dst == src */
+		extract_bytes(ctx, buf, ctx->pos, n);
 		for (i = 0; i < n; i++)
-			dst[i] ^= src[i];
+			dst[i] = src[i] ^ buf[i];
 
 		ctx->pos += n;
 		src += n;
@@ -1375,6 +1674,7 @@ void keccak_squeeze_xor(struct KeccakContext *ctx, uint8_t *dst, const void *dat
 
 		permute_if_needed(ctx);
 	}
+	memset(buf, 0, sizeof(buf));
 }
 
 void keccak_encrypt(struct KeccakContext *ctx, uint8_t *dst, const void *data, size_t len)
@@ -1401,15 +1701,17 @@ void keccak_encrypt(struct KeccakContext *ctx, uint8_t *dst, const void *data, s
 void keccak_decrypt(struct KeccakContext *ctx, uint8_t *dst, const void *data, size_t len)
 {
 	const uint8_t *src = data;
+	uint8_t buf[200];
 	unsigned int n, avail, i;
 
 	while (len > 0) {
 		avail = ctx->rbytes - ctx->pos;
 		n = (len > avail) ? avail : len;
 
-		extract_bytes(ctx, dst, ctx->pos, n);
+		/* extract to temp buffer, to allow dst == src */
+		extract_bytes(ctx, buf, ctx->pos, n);
 		for (i = 0; i < n; i++)
-			dst[i] ^= src[i];
+			dst[i] = src[i] ^ buf[i];
 		add_bytes(ctx, dst, ctx->pos, n);
 
 		ctx->pos += n;
@@ -1419,6 +1721,7 @@ void keccak_decrypt(struct KeccakContext *ctx, uint8_t *dst, const void *data, s
 
 		permute_if_needed(ctx);
 	}
+	memset(buf, 0, sizeof(buf));
 }
 
 void keccak_pad(struct KeccakContext *ctx, const void *pad, size_t len)
@@ -1433,15 +1736,160 @@ void keccak_pad(struct KeccakContext *ctx, const void *pad, size_t len)
 		xor_byte(ctx, ctx->pos, src[0]);
 		xor_byte(ctx, ctx->rbytes - 1, 0x80);
 	}
-	keccak_f(ctx);
+	permute(ctx);
 	ctx->pos = 0;
 }
 
+void keccak_export_state(const struct KeccakContext *ctx, uint8_t dst[200])
+{
+	if (is_small(ctx))
+		memcpy(dst, ctx->u.state8, ctx->width / 8);
+	else
+		extract(dst, ctx, 0, 25);
+}
+
+void keccak_import_state(struct KeccakContext *ctx, const uint8_t src[200])
+{
+	int i;
+
+	memset(ctx->u.state64, 0, sizeof(ctx->u.state64));
+	if (is_small(ctx)) {
+		memcpy(ctx->u.state8, src, ctx->width / 8);
+		return;
+	}
+	for (i = 0; i < 25; i++)
+		xor_lane(ctx, i, le64dec(src + i * 8));
+}
+
+/*
+ * SpongeWrap helpers.  Operations work on single block,
+ * without permuting.
+ */
+
+typedef void (*wrap_op_func)(struct KeccakContext *ctx, uint8_t *dst, const uint8_t *src, unsigned int len);
+
+static void wrap_op_absorb(struct KeccakContext *ctx, uint8_t *dst, const uint8_t *src, unsigned int len)
+{
+	add_bytes(ctx, src, ctx->pos, len);
+}
+
+static void wrap_op_encrypt(struct KeccakContext *ctx, uint8_t *dst, const uint8_t *src, unsigned int len)
+{
+	add_bytes(ctx, src, ctx->pos, len);
+	extract_bytes(ctx, dst, ctx->pos, len);
+}
+
+static void wrap_op_decrypt(struct KeccakContext *ctx, uint8_t *dst, const uint8_t *src, unsigned int len)
+{
+	uint8_t buf[200];
+	unsigned int i;
+
+	/* extract to temp buffer, to allow dst == src */
+	extract_bytes(ctx, buf, ctx->pos, len);
+	for (i = 0; i < len; i++)
+		dst[i] = src[i] ^ buf[i];
+	add_bytes(ctx, dst, ctx->pos, len);
+	memset(buf, 0, len);
+}
+
+static void wrap_run(struct KeccakContext *ctx, uint8_t *dst, const uint8_t *src, size_t len,
+		     const void *pad, size_t padlen, wrap_op_func op)
+{
+	unsigned int maxbytes = ctx->rbytes - 1;
+	unsigned int n, avail;
+
+	while (len > 0) {
+		avail = maxbytes - ctx->pos;
+		if (avail == 0) {
+			keccak_pad(ctx, pad, padlen);
+			continue;
+		}
+		n = (len > avail) ? avail : len;
+
+		op(ctx, dst, src, n);
+
+		ctx->pos += n;
+		src += n;
+		if (dst)
+			dst += n;
+		len -= n;
+	}
+}
+
+void keccak_wrap_absorb(struct KeccakContext *ctx, const void *src, size_t len,
+			const void *pad, size_t padlen)
+{
+	wrap_run(ctx, NULL, src, len, pad, padlen, wrap_op_absorb);
+}
+
+void keccak_wrap_encrypt(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len,
+			 const void *pad, size_t padlen)
+{
+	wrap_run(ctx, dst, src, len, pad, padlen, wrap_op_encrypt);
+}
+
+void keccak_wrap_decrypt(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len,
+			 const void *pad, size_t padlen)
+{
+	wrap_run(ctx, dst, src, len, pad, padlen, wrap_op_decrypt);
+}
+
+int keccak_duplexing(struct KeccakContext *ctx, const void *src, size_t len,
+		     const void *pad, size_t padlen, uint8_t *dst, size_t outlen)
+{
+	const uint8_t *p = pad;
+
+	if (padlen < 1 || len + padlen > ctx->rbytes || outlen > ctx->rbytes)
+		return 0;
+
+	if (len > 0)
+		add_bytes(ctx, src, 0, len);
+	if (padlen > 1)
+		add_bytes(ctx, p, len, padlen - 1);
+	xor_byte(ctx, len + padlen - 1, p[padlen - 1]);
+	xor_byte(ctx, ctx->rbytes - 1, 0x80);
+	permute(ctx);
+	ctx->pos = 0;
+
+	if (outlen > 0)
+		extract_bytes(ctx, dst, 0, outlen);
+	return 1;
+}
+
+const char *keccak_set_backend(const char *name)
+{
+	const struct KeccakBackend *be;
+	size_t i;
+
+	for (i = 0; i < BACKEND_COUNT; i++) {
+		be = &backend_list[i];
+		if (!backend_supported(be))
+			continue;
+		if (!name || strcmp(name, be->name) == 0) {
+			backend_cur = be;
+			return be->name;
+		}
+	}
+	return NULL;
+}
+
+const char *keccak_get_backend(void)
+{
+	if (!backend_cur)
+		keccak_set_backend(NULL);
+	return backend_cur->name;
+}
+
 void keccak_rewind(struct KeccakContext *ctx)
 {
 	ctx->pos = 0;
 }
 
+void keccak_reset(struct KeccakContext *ctx)
+{
+	keccak_init_width(ctx, ctx->width, ctx->width - ctx->rbytes * 8, ctx->rounds);
+}
+
 void keccak_forget(struct KeccakContext *ctx)
 {
 	unsigned int rem = ctx->rbytes % 8;
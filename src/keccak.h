@@ -17,7 +17,10 @@
  */
 
 /** @file
- * Simple API to Keccak1600 permutation + sponge.
+ * Simple API to Keccak permutation + sponge.
+ *
+ * Default width is 1600 bits, smaller Keccak-p[200/400/800]
+ * are available via keccak_init_width().
  */
 
 #ifndef _USUAL_CRYPTO_KECCAK_H_
@@ -30,13 +33,16 @@
  * Keccak state structure for all modes.
  */
 struct KeccakContext {
-	/* 5*5*64 bit state */
+	/* 5*5*64 bit state, smaller widths use state8 as lane bytes */
 	union {
 		uint64_t state64[25];
 		uint32_t state32[2*25];
+		uint8_t state8[200];
 	} u;
 	uint32_t pos;		/* current byte position in buffer */
 	uint32_t rbytes;	/* rate (= block size) in bytes */
+	uint32_t rounds;	/* number of rounds in permutation */
+	uint32_t width;		/* permutation width in bits */
 };
 
 /**
@@ -46,6 +52,35 @@ struct KeccakContext {
  */
 int keccak_init(struct KeccakContext *ctx, unsigned int capacity);
 
+/**
+ * Set up state with specified capacity and reduced-round
+ * Keccak-p permutation, as used by KangarooTwelve & co.
+ *
+ * Rounds must be multiple of 4, between 4 and 24.
+ * The last rounds of full Keccak-f are used.
+ *
+ * Returns 1 if successful, 0 if invalid capacity or rounds.
+ */
+int keccak_init_rounds(struct KeccakContext *ctx, unsigned int capacity, unsigned int rounds);
+
+/**
+ * Set up state for Keccak-p permutation with given width.
+ *
+ * Width is 200, 400, 800 or 1600 bits.  For 1600, rounds are
+ * as in keccak_init_rounds(), for smaller widths any number up to
+ * keccak_full_rounds(width) is allowed.
+ *
+ * Returns 1 if successful, 0 if invalid width, capacity or rounds.
+ */
+int keccak_init_width(struct KeccakContext *ctx, unsigned int width,
+		      unsigned int capacity, unsigned int rounds);
+
+/**
+ * Number of rounds in Keccak-f permutation of given width,
+ * 0 if width is not supported.
+ */
+unsigned int keccak_full_rounds(unsigned int width);
+
 /**
  * Hash additional data.
  */
@@ -58,16 +93,22 @@ void keccak_squeeze(struct KeccakContext *ctx, uint8_t *dst, size_t len);
 
 /**
  * Extract bytes from state, XOR into data.
+ *
+ * dst may be same as src.
  */
 void keccak_squeeze_xor(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len);
 
 /**
  * XOR data into state and return it.
+ *
+ * dst may be same as src.
  */
 void keccak_encrypt(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len);
 
 /**
  * XOR state with data and return it.
+ *
+ * dst may be same as src.
  */
 void keccak_decrypt(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len);
 
@@ -83,10 +124,97 @@ void keccak_pad(struct KeccakContext *ctx, const void *data, size_t len);
  */
 void keccak_rewind(struct KeccakContext *ctx);
 
+/**
+ * Clear whole state, keep capacity and rounds.
+ */
+void keccak_reset(struct KeccakContext *ctx);
+
 /**
  * Clear rate bits.
  */
 void keccak_forget(struct KeccakContext *ctx);
 
+/**
+ * Export state as 25 little-endian lanes, width/8 bytes.
+ *
+ * Layout does not depend on internal representation.
+ */
+void keccak_export_state(const struct KeccakContext *ctx, uint8_t dst[200]);
+
+/**
+ * Import state exported with keccak_export_state().
+ *
+ * Width, capacity, rounds and position must be set separately.
+ */
+void keccak_import_state(struct KeccakContext *ctx, const uint8_t src[200]);
+
+/**
+ * SpongeWrap body processing.
+ *
+ * Data is processed in blocks of rbytes-1 bytes, so last byte of
+ * rate is left for frame bit.  When block is full and more data
+ * follows, state is padded with keccak_pad(pad, padlen).
+ *
+ * dst may be same as src.
+ */
+void keccak_wrap_absorb(struct KeccakContext *ctx, const void *src, size_t len,
+			const void *pad, size_t padlen);
+void keccak_wrap_encrypt(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len,
+			 const void *pad, size_t padlen);
+void keccak_wrap_decrypt(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len,
+			 const void *pad, size_t padlen);
+
+/**
+ * One step of duplex construction.
+ *
+ * Input and padding are XORed into start of rate, final bit is
+ * flipped as in keccak_pad(), state is permuted and outlen
+ * bytes are copied from start of rate into dst.  Position is
+ * ignored and left at 0.
+ *
+ * Padding must be non-empty, len + padlen and outlen must
+ * not exceed rbytes.
+ *
+ * Returns 1 if successful, 0 if lengths are invalid.
+ */
+int keccak_duplexing(struct KeccakContext *ctx, const void *src, size_t len,
+		     const void *pad, size_t padlen, uint8_t *dst, size_t outlen);
+
+/**
+ * Select Keccak-f1600 implementation by name, NULL selects
+ * best one supported by CPU.  Default is best one.
+ *
+ * Returns name of selected implementation, NULL if name is
+ * unknown or not supported by CPU, then selection is not changed.
+ *
+ * Not thread-safe, should be called before use.
+ */
+const char *keccak_set_backend(const char *name);
+
+/**
+ * Name of Keccak-f1600 implementation in use.
+ */
+const char *keccak_get_backend(void);
+
+/**
+ * Hash many independent messages.
+ *
+ * Each message is absorbed into fresh Keccak-f1600 state with given capacity and rounds,
+ * padded with keccak_pad() rules and outlen bytes are squeezed
+ * into dst + i*outlen.  Messages are processed several
+ * at a time with SIMD instructions, if available.
+ *
+ * Returns 1 if successful, 0 if invalid capacity or rounds,
+ * -1 on allocation failure.
+ */
+int keccak_hash_many(unsigned int capacity, unsigned int rounds,
+		     const void *pad, size_t padlen,
+		     const uint8_t * const *msgs, const size_t *lens, size_t count,
+		     uint8_t *dst, size_t outlen);
+
+/**
+ * Name of implementation used by keccak_hash_many().
+ */
+const char *keccak_hash_many_backend(void);
 
 #endif
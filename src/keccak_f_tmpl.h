@@ -0,0 +1,145 @@
+/*
+ * Single-state Keccak-f1600 permutation template.
+ *
+ * Copyright (c) 2026 Marko Kreen
+ *
+ * Permission to use, copy, modify, and/or distribute this software for any
+ * purpose with or without fee is hereby granted, provided that the above
+ * copyright notice and this permission notice appear in all copies.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+ * WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+ * MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ * ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+ * WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ * ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+ * OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+ */
+
+/*
+ * Included from keccak.c several times, with different
+ * parameters, to generate keccak_f variants:
+ *
+ *   KF_NAME       - function name suffix
+ *   KF_TARGET     - function attributes for compiler
+ *   KF_COMPLEMENT - 1 to use lane complementing
+ *
+ * State is loaded into local variables, two rounds are unrolled
+ * so that A and E sets swap roles without copying.
+ *
+ * Lane complementing keeps lanes be, bi, go, ki, mi and sa
+ * inverted during permutation, which turns most of the NOT+AND
+ * in chi into AND or OR.  It is useful on CPUs without ANDN
+ * instruction.  With ANDN available (BMI1) plain chi is better,
+ * as compiler maps (~b & c) to single instruction.
+ */
+
+#define KF_CONCAT2(a, b) a ## b
+#define KF_CONCAT(a, b) KF_CONCAT2(a, b)
+#define KF_FUNC(f)	KF_CONCAT(f, KF_NAME)
+
+#if KF_COMPLEMENT
+
+#define KF_CHI_B(E) \
+	E##ba = Ba ^ (Be | Bi); E##be = Be ^ (~Bi | Bo); E##bi = Bi ^ (Bo & Bu); \
+	E##bo = Bo ^ (Bu | Ba); E##bu = Bu ^ (Ba & Be)
+#define KF_CHI_G(E) \
+	E##ga = Ba ^ (Be | Bi); E##ge = Be ^ (Bi & Bo); E##gi = Bi ^ (Bo | ~Bu); \
+	E##go = Bo ^ (Bu | Ba); E##gu = Bu ^ (Ba & Be)
+#define KF_CHI_K(E) \
+	E##ka = Ba ^ (Be | Bi); E##ke = Be ^ (Bi & Bo); E##ki = Bi ^ (~Bo & Bu); \
+	E##ko = ~Bo ^ (Bu | Ba); E##ku = Bu ^ (Ba & Be)
+#define KF_CHI_M(E) \
+	E##ma = Ba ^ (Be & Bi); E##me = Be ^ (Bi | Bo); E##mi = Bi ^ (~Bo | Bu); \
+	E##mo = ~Bo ^ (Bu & Ba); E##mu = Bu ^ (Ba | Be)
+#define KF_CHI_S(E) \
+	E##sa = Ba ^ (~Be & Bi); E##se = ~Be ^ (Bi | Bo); E##si = Bi ^ (Bo & Bu); \
+	E##so = Bo ^ (Bu | Ba); E##su = Bu ^ (Ba & Be)
+
+#else
+
+#define KF_CHI_PLANE(E, p) \
+	E##p##a = Ba ^ (~Be & Bi); E##p##e = Be ^ (~Bi & Bo); E##p##i = Bi ^ (~Bo & Bu); \
+	E##p##o = Bo ^ (~Bu & Ba); E##p##u = Bu ^ (~Ba & Be)
+#define KF_CHI_B(E) KF_CHI_PLANE(E, b)
+#define KF_CHI_G(E) KF_CHI_PLANE(E, g)
+#define KF_CHI_K(E) KF_CHI_PLANE(E, k)
+#define KF_CHI_M(E) KF_CHI_PLANE(E, m)
+#define KF_CHI_S(E) KF_CHI_PLANE(E, s)
+
+#endif
+
+/* one round from A to E */
+#define KF_ROUND(A, E, i) \
+	Ca = A##ba ^ A##ga ^ A##ka ^ A##ma ^ A##sa; \
+	Ce = A##be ^ A##ge ^ A##ke ^ A##me ^ A##se; \
+	Ci = A##bi ^ A##gi ^ A##ki ^ A##mi ^ A##si; \
+	Co = A##bo ^ A##go ^ A##ko ^ A##mo ^ A##so; \
+	Cu = A##bu ^ A##gu ^ A##ku ^ A##mu ^ A##su; \
+	Da = Cu ^ rol64(Ce, 1); \
+	De = Ca ^ rol64(Ci, 1); \
+	Di = Ce ^ rol64(Co, 1); \
+	Do = Ci ^ rol64(Cu, 1); \
+	Du = Co ^ rol64(Ca, 1); \
+	Ba = A##ba ^ Da; Be = rol64(A##ge ^ De, 44); Bi = rol64(A##ki ^ Di, 43); \
+	Bo = rol64(A##mo ^ Do, 21); Bu = rol64(A##su ^ Du, 14); \
+	KF_CHI_B(E); \
+	E##ba ^= RoundConstants64[i]; \
+	Ba = rol64(A##bo ^ Do, 28); Be = rol64(A##gu ^ Du, 20); Bi = rol64(A##ka ^ Da, 3); \
+	Bo = rol64(A##me ^ De, 45); Bu = rol64(A##si ^ Di, 61); \
+	KF_CHI_G(E); \
+	Ba = rol64(A##be ^ De, 1); Be = rol64(A##gi ^ Di, 6); Bi = rol64(A##ko ^ Do, 25); \
+	Bo = rol64(A##mu ^ Du, 8); Bu = rol64(A##sa ^ Da, 18); \
+	KF_CHI_K(E); \
+	Ba = rol64(A##bu ^ Du, 27); Be = rol64(A##ga ^ Da, 36); Bi = rol64(A##ke ^ De, 10); \
+	Bo = rol64(A##mi ^ Di, 15); Bu = rol64(A##so ^ Do, 56); \
+	KF_CHI_M(E); \
+	Ba = rol64(A##bi ^ Di, 62); Be = rol64(A##go ^ Do, 55); Bi = rol64(A##ku ^ Du, 39); \
+	Bo = rol64(A##ma ^ Da, 41); Bu = rol64(A##se ^ De, 2); \
+	KF_CHI_S(E);
+
+static KF_TARGET void KF_FUNC(keccak_f_)(struct KeccakContext *ctx)
+{
+	uint64_t *st = ctx->u.state64;
+	uint64_t Aba, Abe, Abi, Abo, Abu, Aga, Age, Agi, Ago, Agu, Aka, Ake, Aki;
+	uint64_t Ako, Aku, Ama, Ame, Ami, Amo, Amu, Asa, Ase, Asi, Aso, Asu;
+	uint64_t Eba, Ebe, Ebi, Ebo, Ebu, Ega, Ege, Egi, Ego, Egu, Eka, Eke, Eki;
+	uint64_t Eko, Eku, Ema, Eme, Emi, Emo, Emu, Esa, Ese, Esi, Eso, Esu;
+	uint64_t Ba, Be, Bi, Bo, Bu, Ca, Ce, Ci, Co, Cu, Da, De, Di, Do, Du;
+	unsigned int i;
+
+	Aba = st[0]; Abe = st[1]; Abi = st[2]; Abo = st[3]; Abu = st[4];
+	Aga = st[5]; Age = st[6]; Agi = st[7]; Ago = st[8]; Agu = st[9];
+	Aka = st[10]; Ake = st[11]; Aki = st[12]; Ako = st[13]; Aku = st[14];
+	Ama = st[15]; Ame = st[16]; Ami = st[17]; Amo = st[18]; Amu = st[19];
+	Asa = st[20]; Ase = st[21]; Asi = st[22]; Aso = st[23]; Asu = st[24];
+#if KF_COMPLEMENT
+	Abe = ~Abe; Abi = ~Abi; Ago = ~Ago; Aki = ~Aki; Ami = ~Ami; Asa = ~Asa;
+#endif
+
+	/* rounds is multiple of 4 */
+	for (i = KECCAK_ROUNDS - ctx->rounds; i < KECCAK_ROUNDS; i += 2) {
+		KF_ROUND(A, E, i);
+		KF_ROUND(E, A, i + 1);
+	}
+
+#if KF_COMPLEMENT
+	Abe = ~Abe; Abi = ~Abi; Ago = ~Ago; Aki = ~Aki; Ami = ~Ami; Asa = ~Asa;
+#endif
+	st[0] = Aba; st[1] = Abe; st[2] = Abi; st[3] = Abo; st[4] = Abu;
+	st[5] = Aga; st[6] = Age; st[7] = Agi; st[8] = Ago; st[9] = Agu;
+	st[10] = Aka; st[11] = Ake; st[12] = Aki; st[13] = Ako; st[14] = Aku;
+	st[15] = Ama; st[16] = Ame; st[17] = Ami; st[18] = Amo; st[19] = Amu;
+	st[20] = Asa; st[21] = Ase; st[22] = Asi; st[23] = Aso; st[24] = Asu;
+}
+
+#undef KF_CONCAT2
+#undef KF_CONCAT
+#undef KF_FUNC
+#undef KF_CHI_B
+#undef KF_CHI_G
+#undef KF_CHI_K
+#undef KF_CHI_M
+#undef KF_CHI_S
+#undef KF_CHI_PLANE
+#undef KF_ROUND
@@ -0,0 +1,133 @@
+/*
+ * Keccak-p permutation template for widths 200, 400 and 800.
+ *
+ * Copyright (c) 2026 Marko Kreen
+ *
+ * Permission to use, copy, modify, and/or distribute this software for any
+ * purpose with or without fee is hereby granted, provided that the above
+ * copyright notice and this permission notice appear in all copies.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+ * WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+ * MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ * ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+ * WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ * ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+ * OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+ */
+
+/*
+ * Included from keccak.c several times, with different
+ * parameters, to generate permutation for each lane size:
+ *
+ *   SM_BITS   - lane size in bits: 8, 16 or 32
+ *   SM_TYPE   - unsigned integer type for lane
+ *   SM_ROUNDS - rounds in full Keccak-f: 12 + 2*log2(SM_BITS)
+ *
+ * State is kept as bytes in ctx->u.state8, lanes in little-endian
+ * order, so sponge code can access it directly.  Lanes are
+ * loaded into registers for the permutation.
+ */
+
+#define SM_CONCAT2(a, b) a ## b
+#define SM_CONCAT(a, b) SM_CONCAT2(a, b)
+#define SM_FUNC(f)	SM_CONCAT(f, SM_BITS)
+#define SM_BYTES	(SM_BITS / 8)
+#define SM_ROL(v, n)	((SM_TYPE)(((v) << (n)) | ((v) >> ((SM_BITS - (n)) % SM_BITS))))
+
+/* one full round, rotations are reduced to lane size at compile time */
+#define SM_ROUND() \
+	C0 = A[0] ^ A[5] ^ A[10] ^ A[15] ^ A[20]; \
+	C1 = A[1] ^ A[6] ^ A[11] ^ A[16] ^ A[21]; \
+	C2 = A[2] ^ A[7] ^ A[12] ^ A[17] ^ A[22]; \
+	C3 = A[3] ^ A[8] ^ A[13] ^ A[18] ^ A[23]; \
+	C4 = A[4] ^ A[9] ^ A[14] ^ A[19] ^ A[24]; \
+	D0 = C4 ^ SM_ROL(C1, 1); \
+	D1 = C0 ^ SM_ROL(C2, 1); \
+	D2 = C1 ^ SM_ROL(C3, 1); \
+	D3 = C2 ^ SM_ROL(C4, 1); \
+	D4 = C3 ^ SM_ROL(C0, 1); \
+	B0 = A[0] ^ D0; \
+	B1 = SM_ROL(A[6] ^ D1, 44 % SM_BITS); \
+	B2 = SM_ROL(A[12] ^ D2, 43 % SM_BITS); \
+	B3 = SM_ROL(A[18] ^ D3, 21 % SM_BITS); \
+	B4 = SM_ROL(A[24] ^ D4, 14 % SM_BITS); \
+	B5 = SM_ROL(A[3] ^ D3, 28 % SM_BITS); \
+	B6 = SM_ROL(A[9] ^ D4, 20 % SM_BITS); \
+	B7 = SM_ROL(A[10] ^ D0, 3 % SM_BITS); \
+	B8 = SM_ROL(A[16] ^ D1, 45 % SM_BITS); \
+	B9 = SM_ROL(A[22] ^ D2, 61 % SM_BITS); \
+	B10 = SM_ROL(A[1] ^ D1, 1 % SM_BITS); \
+	B11 = SM_ROL(A[7] ^ D2, 6 % SM_BITS); \
+	B12 = SM_ROL(A[13] ^ D3, 25 % SM_BITS); \
+	B13 = SM_ROL(A[19] ^ D4, 8 % SM_BITS); \
+	B14 = SM_ROL(A[20] ^ D0, 18 % SM_BITS); \
+	B15 = SM_ROL(A[4] ^ D4, 27 % SM_BITS); \
+	B16 = SM_ROL(A[5] ^ D0, 36 % SM_BITS); \
+	B17 = SM_ROL(A[11] ^ D1, 10 % SM_BITS); \
+	B18 = SM_ROL(A[17] ^ D2, 15 % SM_BITS); \
+	B19 = SM_ROL(A[23] ^ D3, 56 % SM_BITS); \
+	B20 = SM_ROL(A[2] ^ D2, 62 % SM_BITS); \
+	B21 = SM_ROL(A[8] ^ D3, 55 % SM_BITS); \
+	B22 = SM_ROL(A[14] ^ D4, 39 % SM_BITS); \
+	B23 = SM_ROL(A[15] ^ D0, 41 % SM_BITS); \
+	B24 = SM_ROL(A[21] ^ D1, 2 % SM_BITS); \
+	A[0] = B0 ^ (~B1 & B2); \
+	A[1] = B1 ^ (~B2 & B3); \
+	A[2] = B2 ^ (~B3 & B4); \
+	A[3] = B3 ^ (~B4 & B0); \
+	A[4] = B4 ^ (~B0 & B1); \
+	A[5] = B5 ^ (~B6 & B7); \
+	A[6] = B6 ^ (~B7 & B8); \
+	A[7] = B7 ^ (~B8 & B9); \
+	A[8] = B8 ^ (~B9 & B5); \
+	A[9] = B9 ^ (~B5 & B6); \
+	A[10] = B10 ^ (~B11 & B12); \
+	A[11] = B11 ^ (~B12 & B13); \
+	A[12] = B12 ^ (~B13 & B14); \
+	A[13] = B13 ^ (~B14 & B10); \
+	A[14] = B14 ^ (~B10 & B11); \
+	A[15] = B15 ^ (~B16 & B17); \
+	A[16] = B16 ^ (~B17 & B18); \
+	A[17] = B17 ^ (~B18 & B19); \
+	A[18] = B18 ^ (~B19 & B15); \
+	A[19] = B19 ^ (~B15 & B16); \
+	A[20] = B20 ^ (~B21 & B22); \
+	A[21] = B21 ^ (~B22 & B23); \
+	A[22] = B22 ^ (~B23 & B24); \
+	A[23] = B23 ^ (~B24 & B20); \
+	A[24] = B24 ^ (~B20 & B21)
+
+static void SM_FUNC(keccak_p)(struct KeccakContext *ctx)
+{
+	SM_TYPE A[25];
+	SM_TYPE B0, B1, B2, B3, B4, B5, B6, B7, B8, B9, B10, B11, B12;
+	SM_TYPE B13, B14, B15, B16, B17, B18, B19, B20, B21, B22, B23, B24;
+	SM_TYPE C0, C1, C2, C3, C4, D0, D1, D2, D3, D4;
+	uint8_t *p = ctx->u.state8;
+	unsigned int i, j, round;
+
+	for (i = 0; i < 25; i++) {
+		A[i] = 0;
+		for (j = 0; j < SM_BYTES; j++)
+			A[i] |= (SM_TYPE)p[i * SM_BYTES + j] << (8 * j);
+	}
+
+	for (round = SM_ROUNDS - ctx->rounds; round < SM_ROUNDS; round++) {
+		SM_ROUND();
+		A[0] ^= (SM_TYPE)RoundConstantsSmall[round];
+	}
+
+	for (i = 0; i < 25; i++) {
+		for (j = 0; j < SM_BYTES; j++)
+			p[i * SM_BYTES + j] = A[i] >> (8 * j);
+	}
+	memset(A, 0, sizeof(A));
+}
+
+#undef SM_CONCAT2
+#undef SM_CONCAT
+#undef SM_FUNC
+#undef SM_BYTES
+#undef SM_ROL
+#undef SM_ROUND
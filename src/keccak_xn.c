@@ -0,0 +1,295 @@
+/*
+ * Batch hashing with multi-state Keccak-f1600.
+ *
+ * Copyright (c) 2026 Marko Kreen
+ *
+ * Permission to use, copy, modify, and/or distribute this software for any
+ * purpose with or without fee is hereby granted, provided that the above
+ * copyright notice and this permission notice appear in all copies.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+ * WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+ * MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ * ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+ * WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ * ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+ * OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+ */
+
+/*
+ * Messages are grouped by number of blocks they need, then each group
+ * is processed with 4 or 8 states permuted together with SIMD instructions.
+ *
+ * Implementation is selected at runtime:
+ *
+ *   avx512  - 8 states, AVX-512F
+ *   avx2    - 4 states, AVX2
+ *   generic - 4 states, compiler vector extensions without special target
+ *   scalar  - one message at a time with keccak_absorb() & co.
+ */
+
+#include "keccak.h"
+
+#include <stdlib.h>
+#include <string.h>
+
+#if defined(__GNUC__) || defined(__clang__)
+#define XN_VECTOR
+#if defined(__x86_64__) || defined(__i386__)
+#define XN_X86
+#endif
+#endif
+
+#define XN_ROUNDS 24
+
+/* one message */
+struct XnJob {
+	const uint8_t *data;
+	size_t len;
+	uint8_t *dst;
+	size_t nblocks;
+};
+
+/* common parameters */
+struct XnBatch {
+	unsigned int rbytes;
+	unsigned int rounds;
+	const uint8_t *pad;
+	size_t padlen;
+	size_t outlen;
+};
+
+typedef void (*xn_run_func)(const struct XnBatch *bt, struct XnJob **jobs);
+
+static inline void le64enc(void *p, uint64_t x)
+{
+	uint8_t *dst = p;
+	int i;
+	for (i = 0; i < 8; i++)
+		dst[i] = x >> (i * 8);
+}
+
+static inline uint64_t le64dec(const void *p)
+{
+	const uint8_t *src = p;
+	uint64_t x = 0;
+	int i;
+	for (i = 7; i >= 0; i--)
+		x = (x << 8) | src[i];
+	return x;
+}
+
+/*
+ * Return pointer to block data.  Full blocks are taken directly
+ * from message, blocks that contain padding are built in tmp.
+ *
+ * Padding follows keccak_pad(): all suffix bytes except last one
+ * are added as data, last one is XOR-ed after that, then final bit.
+ */
+static const uint8_t *xn_block(const struct XnBatch *bt, const struct XnJob *job, size_t blk, uint8_t *tmp)
+{
+	size_t ofs = blk * bt->rbytes;
+	size_t end = ofs + bt->rbytes;
+	size_t i, datalen;
+
+	if (end <= job->len && blk + 1 < job->nblocks)
+		return job->data + ofs;
+
+	memset(tmp, 0, bt->rbytes);
+	if (ofs < job->len)
+		memcpy(tmp, job->data + ofs, ((end < job->len) ? end : job->len) - ofs);
+
+	if (bt->padlen > 0) {
+		datalen = job->len + bt->padlen - 1;
+		for (i = (ofs > job->len) ? ofs : job->len; i < end && i < datalen; i++)
+			tmp[i - ofs] = bt->pad[i - job->len];
+		if (blk + 1 == job->nblocks) {
+			tmp[datalen - ofs] ^= bt->pad[bt->padlen - 1];
+			tmp[bt->rbytes - 1] ^= 0x80;
+		}
+	}
+	return tmp;
+}
+
+#ifdef XN_VECTOR
+
+static const uint64_t XnRoundConstants[XN_ROUNDS] = {
+	UINT64_C(0x0000000000000001), UINT64_C(0x0000000000008082),
+	UINT64_C(0x800000000000808A), UINT64_C(0x8000000080008000),
+	UINT64_C(0x000000000000808B), UINT64_C(0x0000000080000001),
+	UINT64_C(0x8000000080008081), UINT64_C(0x8000000000008009),
+	UINT64_C(0x000000000000008A), UINT64_C(0x0000000000000088),
+	UINT64_C(0x0000000080008009), UINT64_C(0x000000008000000A),
+	UINT64_C(0x000000008000808B), UINT64_C(0x800000000000008B),
+	UINT64_C(0x8000000000008089), UINT64_C(0x8000000000008003),
+	UINT64_C(0x8000000000008002), UINT64_C(0x8000000000000080),
+	UINT64_C(0x000000000000800A), UINT64_C(0x800000008000000A),
+	UINT64_C(0x8000000080008081), UINT64_C(0x8000000000008080),
+	UINT64_C(0x0000000080000001), UINT64_C(0x8000000080008008),
+};
+
+#define ROLV(v, n) (((v) << (n)) | ((v) >> (64 - (n))))
+#define XN_CONCAT2(a, b) a ## b
+#define XN_CONCAT(a, b) XN_CONCAT2(a, b)
+
+/* portable version */
+#define XN_LANES 4
+#define XN_NAME generic
+#define XN_TARGET
+#include "keccak_xn_tmpl.h"
+#undef XN_LANES
+#undef XN_NAME
+#undef XN_TARGET
+
+#ifdef XN_X86
+
+#define XN_LANES 4
+#define XN_NAME avx2
+#define XN_TARGET __attribute__((target("avx2")))
+#include "keccak_xn_tmpl.h"
+#undef XN_LANES
+#undef XN_NAME
+#undef XN_TARGET
+
+#define XN_LANES 8
+#define XN_NAME avx512
+#define XN_TARGET __attribute__((target("avx512f")))
+#include "keccak_xn_tmpl.h"
+#undef XN_LANES
+#undef XN_NAME
+#undef XN_TARGET
+
+#endif /* XN_X86 */
+
+#endif /* XN_VECTOR */
+
+/*
+ * Runtime selection.
+ */
+
+struct XnImpl {
+	const char *name;
+	unsigned int lanes;
+	xn_run_func run;
+};
+
+static const struct XnImpl *xn_select(void)
+{
+#ifdef XN_VECTOR
+#ifdef XN_X86
+	static const struct XnImpl impl_avx512 = { "avx512", 8, xn_run_avx512 };
+	static const struct XnImpl impl_avx2 = { "avx2", 4, xn_run_avx2 };
+#endif
+	static const struct XnImpl impl_generic = { "generic", 4, xn_run_generic };
+#else
+	static const struct XnImpl impl_scalar = { "scalar", 1, NULL };
+#endif
+	static const struct XnImpl *selected = NULL;
+
+	if (selected)
+		return selected;
+#ifdef XN_VECTOR
+#ifdef XN_X86
+	__builtin_cpu_init();
+	if (__builtin_cpu_supports("avx512f"))
+		return selected = &impl_avx512;
+	if (__builtin_cpu_supports("avx2"))
+		return selected = &impl_avx2;
+#endif
+	return selected = &impl_generic;
+#else
+	return selected = &impl_scalar;
+#endif
+}
+
+static int cmp_job(const void *a, const void *b)
+{
+	const struct XnJob *ja = a, *jb = b;
+	if (ja->nblocks != jb->nblocks)
+		return (ja->nblocks < jb->nblocks) ? -1 : 1;
+	return (ja->data < jb->data) ? -1 : (ja->data > jb->data);
+}
+
+static void xn_run_scalar(unsigned int capacity, const struct XnBatch *bt, struct XnJob *job)
+{
+	struct KeccakContext ctx;
+
+	keccak_init_rounds(&ctx, capacity, bt->rounds);
+	keccak_absorb(&ctx, job->data, job->len);
+	keccak_pad(&ctx, bt->pad, bt->padlen);
+	keccak_squeeze(&ctx, job->dst, bt->outlen);
+	memset(&ctx, 0, sizeof(ctx));
+}
+
+/*
+ * Public API
+ */
+
+const char *keccak_hash_many_backend(void)
+{
+	return xn_select()->name;
+}
+
+int keccak_hash_many(unsigned int capacity, unsigned int rounds,
+		     const void *pad, size_t padlen,
+		     const uint8_t * const *msgs, const size_t *lens, size_t count,
+		     uint8_t *dst, size_t outlen)
+{
+	const struct XnImpl *impl = xn_select();
+	struct XnJob *jobs, *group[8];
+	struct XnBatch bt;
+	size_t i, j, n;
+
+	if (capacity % 8 != 0 || capacity < 8 || capacity > (1600 - 8))
+		return 0;
+	if (rounds % 4 != 0 || rounds < 4 || rounds > XN_ROUNDS)
+		return 0;
+	if (count == 0 || outlen == 0)
+		return 1;
+
+	bt.rbytes = (1600 - capacity) / 8;
+	bt.rounds = rounds;
+	bt.pad = pad;
+	bt.padlen = padlen;
+	bt.outlen = outlen;
+
+	jobs = malloc(count * sizeof(*jobs));
+	if (!jobs)
+		return -1;
+
+	for (i = 0; i < count; i++) {
+		jobs[i].data = msgs[i];
+		jobs[i].len = lens[i];
+		jobs[i].dst = dst + i * outlen;
+		jobs[i].nblocks = (lens[i] + (padlen ? padlen - 1 : 0)) / bt.rbytes + 1;
+	}
+
+	if (impl->lanes == 1) {
+		for (i = 0; i < count; i++)
+			xn_run_scalar(capacity, &bt, &jobs[i]);
+		free(jobs);
+		return 1;
+	}
+
+	/* group messages by block count */
+	qsort(jobs, count, sizeof(*jobs), cmp_job);
+
+	for (i = 0; i < count; i += n) {
+		for (n = 1; n < impl->lanes && i + n < count; n++) {
+			if (jobs[i + n].nblocks != jobs[i].nblocks)
+				break;
+		}
+		if (n == 1) {
+			/* single state is faster without SIMD */
+			xn_run_scalar(capacity, &bt, &jobs[i]);
+			continue;
+		}
+		/* unused lanes repeat first job */
+		for (j = 0; j < impl->lanes; j++)
+			group[j] = &jobs[i + ((j < n) ? j : 0)];
+		impl->run(&bt, group);
+	}
+
+	free(jobs);
+	return 1;
+}
@@ -0,0 +1,179 @@
+/*
+ * Multi-state Keccak-f1600 permutation template.
+ *
+ * Copyright (c) 2026 Marko Kreen
+ *
+ * Permission to use, copy, modify, and/or distribute this software for any
+ * purpose with or without fee is hereby granted, provided that the above
+ * copyright notice and this permission notice appear in all copies.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+ * WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+ * MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ * ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+ * WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ * ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+ * OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+ */
+
+/*
+ * Included from keccak_xn.c several times, with different
+ * parameters, to generate code for different instruction sets:
+ *
+ *   XN_LANES  - number of states processed in parallel
+ *   XN_NAME   - function name suffix
+ *   XN_TARGET - function attributes for compiler
+ *
+ * Each 64-bit lane of the state is kept in vector that contains
+ * that lane from XN_LANES states.  Compiler vector extensions
+ * are used, so the code maps directly to SIMD instructions.
+ */
+
+#define XN_VEC		XN_CONCAT(xn_vec_, XN_NAME)
+#define XN_FUNC(f)	XN_CONCAT(f, XN_NAME)
+
+typedef uint64_t XN_VEC __attribute__((vector_size(XN_LANES * 8)));
+
+/* one full round */
+#define XN_ROUND() \
+	C0 = A[0] ^ A[5] ^ A[10] ^ A[15] ^ A[20]; \
+	C1 = A[1] ^ A[6] ^ A[11] ^ A[16] ^ A[21]; \
+	C2 = A[2] ^ A[7] ^ A[12] ^ A[17] ^ A[22]; \
+	C3 = A[3] ^ A[8] ^ A[13] ^ A[18] ^ A[23]; \
+	C4 = A[4] ^ A[9] ^ A[14] ^ A[19] ^ A[24]; \
+	D0 = C4 ^ ROLV(C1, 1); \
+	D1 = C0 ^ ROLV(C2, 1); \
+	D2 = C1 ^ ROLV(C3, 1); \
+	D3 = C2 ^ ROLV(C4, 1); \
+	D4 = C3 ^ ROLV(C0, 1); \
+	B0 = A[0] ^ D0; \
+	B1 = ROLV(A[6] ^ D1, 44); \
+	B2 = ROLV(A[12] ^ D2, 43); \
+	B3 = ROLV(A[18] ^ D3, 21); \
+	B4 = ROLV(A[24] ^ D4, 14); \
+	B5 = ROLV(A[3] ^ D3, 28); \
+	B6 = ROLV(A[9] ^ D4, 20); \
+	B7 = ROLV(A[10] ^ D0, 3); \
+	B8 = ROLV(A[16] ^ D1, 45); \
+	B9 = ROLV(A[22] ^ D2, 61); \
+	B10 = ROLV(A[1] ^ D1, 1); \
+	B11 = ROLV(A[7] ^ D2, 6); \
+	B12 = ROLV(A[13] ^ D3, 25); \
+	B13 = ROLV(A[19] ^ D4, 8); \
+	B14 = ROLV(A[20] ^ D0, 18); \
+	B15 = ROLV(A[4] ^ D4, 27); \
+	B16 = ROLV(A[5] ^ D0, 36); \
+	B17 = ROLV(A[11] ^ D1, 10); \
+	B18 = ROLV(A[17] ^ D2, 15); \
+	B19 = ROLV(A[23] ^ D3, 56); \
+	B20 = ROLV(A[2] ^ D2, 62); \
+	B21 = ROLV(A[8] ^ D3, 55); \
+	B22 = ROLV(A[14] ^ D4, 39); \
+	B23 = ROLV(A[15] ^ D0, 41); \
+	B24 = ROLV(A[21] ^ D1, 2); \
+	A[0] = B0 ^ (~B1 & B2); \
+	A[1] = B1 ^ (~B2 & B3); \
+	A[2] = B2 ^ (~B3 & B4); \
+	A[3] = B3 ^ (~B4 & B0); \
+	A[4] = B4 ^ (~B0 & B1); \
+	A[5] = B5 ^ (~B6 & B7); \
+	A[6] = B6 ^ (~B7 & B8); \
+	A[7] = B7 ^ (~B8 & B9); \
+	A[8] = B8 ^ (~B9 & B5); \
+	A[9] = B9 ^ (~B5 & B6); \
+	A[10] = B10 ^ (~B11 & B12); \
+	A[11] = B11 ^ (~B12 & B13); \
+	A[12] = B12 ^ (~B13 & B14); \
+	A[13] = B13 ^ (~B14 & B10); \
+	A[14] = B14 ^ (~B10 & B11); \
+	A[15] = B15 ^ (~B16 & B17); \
+	A[16] = B16 ^ (~B17 & B18); \
+	A[17] = B17 ^ (~B18 & B19); \
+	A[18] = B18 ^ (~B19 & B15); \
+	A[19] = B19 ^ (~B15 & B16); \
+	A[20] = B20 ^ (~B21 & B22); \
+	A[21] = B21 ^ (~B22 & B23); \
+	A[22] = B22 ^ (~B23 & B24); \
+	A[23] = B23 ^ (~B24 & B20); \
+	A[24] = B24 ^ (~B20 & B21);
+
+static XN_TARGET void XN_FUNC(xn_permute_)(XN_VEC *A, unsigned int rounds)
+{
+	XN_VEC B0, B1, B2, B3, B4, B5, B6, B7, B8, B9, B10, B11, B12;
+	XN_VEC B13, B14, B15, B16, B17, B18, B19, B20, B21, B22, B23, B24;
+	XN_VEC C0, C1, C2, C3, C4, D0, D1, D2, D3, D4;
+	unsigned int i;
+
+	for (i = XN_ROUNDS - rounds; i < XN_ROUNDS; i++) {
+		XN_ROUND();
+		A[0] ^= XnRoundConstants[i];
+	}
+}
+
+/*
+ * Process XN_LANES jobs with same number of blocks.
+ */
+static XN_TARGET void XN_FUNC(xn_run_)(const struct XnBatch *bt, struct XnJob **jobs)
+{
+	XN_VEC A[25];
+	union {
+		XN_VEC v;
+		uint64_t w[XN_LANES];
+	} t;
+	uint8_t tmp[XN_LANES][200];
+	uint8_t lanebuf[8];
+	const uint8_t *p[XN_LANES];
+	size_t blk, nblocks = jobs[0]->nblocks;
+	unsigned int j, w, n, done;
+	unsigned int fullwords = bt->rbytes / 8;
+	unsigned int rem = bt->rbytes % 8;
+
+	memset(A, 0, sizeof(A));
+
+	/* absorb */
+	for (blk = 0; blk < nblocks; blk++) {
+		for (j = 0; j < XN_LANES; j++)
+			p[j] = xn_block(bt, jobs[j], blk, tmp[j]);
+		for (w = 0; w < fullwords; w++) {
+			for (j = 0; j < XN_LANES; j++)
+				t.w[j] = le64dec(p[j] + w*8);
+			A[w] ^= t.v;
+		}
+		if (rem) {
+			for (j = 0; j < XN_LANES; j++) {
+				memset(lanebuf, 0, sizeof(lanebuf));
+				memcpy(lanebuf, p[j] + w*8, rem);
+				t.w[j] = le64dec(lanebuf);
+			}
+			A[w] ^= t.v;
+		}
+		XN_FUNC(xn_permute_)(A, bt->rounds);
+	}
+
+	/* squeeze */
+	done = 0;
+	while (1) {
+		n = bt->outlen - done;
+		if (n > bt->rbytes)
+			n = bt->rbytes;
+		for (w = 0; w*8 < n; w++) {
+			t.v = A[w];
+			for (j = 0; j < XN_LANES; j++) {
+				le64enc(lanebuf, t.w[j]);
+				memcpy(jobs[j]->dst + done + w*8, lanebuf, (n - w*8 < 8) ? n - w*8 : 8);
+			}
+		}
+		done += n;
+		if (done >= bt->outlen)
+			break;
+		XN_FUNC(xn_permute_)(A, bt->rounds);
+	}
+
+	memset(A, 0, sizeof(A));
+	memset(tmp, 0, sizeof(tmp));
+	memset(&t, 0, sizeof(t));
+}
+
+#undef XN_VEC
+#undef XN_FUNC
+#undef XN_ROUND
@@ -18,28 +18,55 @@
 
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
+#include <pythread.h>
 
 #include <stdint.h>
 #include <stdbool.h>
 #include <string.h>
+#include <limits.h>
 
 #include "keccak.h"
+#include "strobe.h"
 
 #if PY_MAJOR_VERSION >= 3
 #define PyString_FromString(s) PyUnicode_FromString(s)
+#define PyString_FromStringAndSize(s, n) PyUnicode_FromStringAndSize(s, n)
+#endif
+
+#ifndef Py_SET_TYPE
+#define Py_SET_TYPE(obj, type) ((Py_TYPE(obj) = (type)), (void)0)
 #endif
 
 #define SPONGE_MODULE	"keccak"
+#define SPONGE_PACKAGE	"spongeshaker"
 #define SPONGE_CLASS	"KeccakSponge"
-#define SPONGE_NAME	"Keccak1600"
+#define SPONGE_NAME	"Keccak"
 #define MODINIT2	initkeccak
 #define MODINIT3	PyInit_keccak
 
 static const char mod_doc[] =
-"Implements Sponge API for Keccak-f1600.";
+"Implements Sponge API for Keccak-f1600, and smaller Keccak-f800/400/200.";
 
 static const char Sponge_doc[] =
-SPONGE_CLASS "(capacity) - Initializes Sponge object with given capacity in bits.";
+SPONGE_CLASS "(capacity, rounds=24) - Initializes Sponge object with given capacity in bits.\n"
+"\n"
+"Optional rounds gives number of rounds for reduced-round Keccak-p\n"
+"permutation, it must be multiple of 4.";
+
+static const char Sponge800_doc[] =
+SPONGE_CLASS "800(capacity, rounds=22) - Sponge on Keccak-f800, 100-byte state.\n"
+"\n"
+"Optional rounds gives number of rounds for reduced-round Keccak-p.";
+
+static const char Sponge400_doc[] =
+SPONGE_CLASS "400(capacity, rounds=20) - Sponge on Keccak-f400, 50-byte state.\n"
+"\n"
+"Optional rounds gives number of rounds for reduced-round Keccak-p.";
+
+static const char Sponge200_doc[] =
+SPONGE_CLASS "200(capacity, rounds=18) - Sponge on Keccak-f200, 25-byte state.\n"
+"\n"
+"Optional rounds gives number of rounds for reduced-round Keccak-p.";
 
 /*
  * Main state object.
@@ -48,26 +75,226 @@ SPONGE_CLASS "(capacity) - Initializes Sponge object with given capacity in bits
 typedef struct {
 	PyObject_HEAD
 	struct KeccakContext md;
+	PyThread_type_lock lock;
 } SpongeObject;
 
-static SpongeObject *alloc_sponge(void);
+/* capacity in bits */
+#define SPONGE_CAPACITY(md) ((md).width - (md).rbytes * 8)
+
+static PyTypeObject SpongeType, Sponge800Type, Sponge400Type, Sponge200Type, DuplexType;
+static SpongeObject *alloc_sponge(unsigned int width);
 static bool get_buffer(PyObject *obj, Py_buffer *buf);
+static bool get_write_buffer(PyObject *obj, Py_buffer *buf);
+
+/*
+ * Threading.
+ *
+ * For buffers larger than SPONGE_GIL_MINSIZE the GIL is released
+ * while Keccak runs.  Then the object gets private lock, which
+ * is taken by all further operations on it, so parallel calls
+ * on same object cannot corrupt the state.
+ */
+
+#define SPONGE_GIL_MINSIZE 2048
+
+#define ENTER_SPONGE(obj) do { \
+	if ((obj)->lock) { \
+		if (!PyThread_acquire_lock((obj)->lock, 0)) { \
+			Py_BEGIN_ALLOW_THREADS \
+			PyThread_acquire_lock((obj)->lock, 1); \
+			Py_END_ALLOW_THREADS \
+		} \
+	} \
+} while (0)
+
+#define LEAVE_SPONGE(obj) do { \
+	if ((obj)->lock) \
+		PyThread_release_lock((obj)->lock); \
+} while (0)
+
+/* Returns true if GIL should be released for operation on len bytes */
+static bool use_threads(SpongeObject *self, Py_ssize_t len)
+{
+	if (len < SPONGE_GIL_MINSIZE)
+		return false;
+	if (!self->lock)
+		self->lock = PyThread_allocate_lock();
+	return self->lock != NULL;
+}
+
+/* raise ValueError if __init__ was not run */
+static bool check_init(const struct KeccakContext *ctx)
+{
+	if (ctx->rbytes == 0) {
+		PyErr_SetString(PyExc_ValueError, "Object is not initialized");
+		return false;
+	}
+	return true;
+}
+
+/* absorb, without GIL for large buffers */
+static void sponge_absorb(SpongeObject *self, const void *data, Py_ssize_t len)
+{
+	if (use_threads(self, len)) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, 1);
+		keccak_absorb(&self->md, data, len);
+		PyThread_release_lock(self->lock);
+		Py_END_ALLOW_THREADS
+	} else {
+		ENTER_SPONGE(self);
+		keccak_absorb(&self->md, data, len);
+		LEAVE_SPONGE(self);
+	}
+}
+
+/* squeeze, without GIL for large buffers */
+static void sponge_squeeze(SpongeObject *self, uint8_t *dst, Py_ssize_t len)
+{
+	if (use_threads(self, len)) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, 1);
+		keccak_squeeze(&self->md, dst, len);
+		PyThread_release_lock(self->lock);
+		Py_END_ALLOW_THREADS
+	} else {
+		ENTER_SPONGE(self);
+		keccak_squeeze(&self->md, dst, len);
+		LEAVE_SPONGE(self);
+	}
+}
 
 
+/*
+ * Fast calling convention.
+ *
+ * Methods are written for METH_FASTCALL, on older Pythons
+ * FASTCALL_WRAPPER() generates METH_VARARGS adapter for them.
+ */
+
+#if PY_VERSION_HEX >= 0x03070000 && !defined(KECCAK_NO_FASTCALL)
+#define HAVE_FASTCALL
+#endif
+
+/* vectorcall for type objects */
+#if PY_VERSION_HEX >= 0x03090000 && defined(HAVE_FASTCALL)
+#define HAVE_VECTORCALL
+#endif
+
+#ifdef HAVE_FASTCALL
+#define FASTCALL_WRAPPER(func)
+#define FASTCALL_ENTRY(name, func, doc) \
+	{ name, (PyCFunction)(void (*)(void))func, METH_FASTCALL, doc }
+#else
+#define FASTCALL_WRAPPER(func) \
+static PyObject *func ## _varargs(PyObject *obj, PyObject *args) \
+{ \
+	return func(obj, &PyTuple_GET_ITEM(args, 0), PyTuple_GET_SIZE(args)); \
+}
+#define FASTCALL_ENTRY(name, func, doc) \
+	{ name, func ## _varargs, METH_VARARGS, doc }
+#endif
+
+/* check positional argument count */
+static bool check_nargs(const char *fname, Py_ssize_t nargs, Py_ssize_t min, Py_ssize_t max)
+{
+	if (nargs >= min && nargs <= max)
+		return true;
+	if (min == max)
+		PyErr_Format(PyExc_TypeError, "%s() takes exactly %zd argument(s) (%zd given)",
+			     fname, min, nargs);
+	else
+		PyErr_Format(PyExc_TypeError, "%s() takes from %zd to %zd arguments (%zd given)",
+			     fname, min, max, nargs);
+	return false;
+}
+
+/* parse unsigned int argument */
+static bool get_uint(PyObject *obj, unsigned int *dst)
+{
+	Py_ssize_t val;
+
+	val = PyNumber_AsSsize_t(obj, PyExc_OverflowError);
+	if (val == -1 && PyErr_Occurred())
+		return false;
+	if (val < 0 || (size_t)val > UINT_MAX) {
+		PyErr_SetString(PyExc_OverflowError, "value out of range");
+		return false;
+	}
+	*dst = val;
+	return true;
+}
+
+#ifdef HAVE_VECTORCALL
+/* call type with keywords via tp_new + tp_init */
+static PyObject *vectorcall_slow(PyObject *type, PyObject *const *args, Py_ssize_t nargs, PyObject *kwnames)
+{
+	PyObject *tuple, *kws = NULL, *res = NULL;
+	Py_ssize_t i;
+
+	tuple = PyTuple_New(nargs);
+	if (!tuple)
+		return NULL;
+	for (i = 0; i < nargs; i++) {
+		Py_INCREF(args[i]);
+		PyTuple_SET_ITEM(tuple, i, args[i]);
+	}
+	if (kwnames) {
+		kws = PyDict_New();
+		if (!kws)
+			goto out;
+		for (i = 0; i < PyTuple_GET_SIZE(kwnames); i++) {
+			if (PyDict_SetItem(kws, PyTuple_GET_ITEM(kwnames, i), args[nargs + i]) < 0)
+				goto out;
+		}
+	}
+	res = PyType_Type.tp_call(type, tuple, kws);
+out:
+	Py_DECREF(tuple);
+	Py_XDECREF(kws);
+	return res;
+}
+#endif
+
 static const char Sponge_new_doc[] =
 SPONGE_CLASS "(capacity_bits) - Create new state object with given capacity.";
 
+/* permutation width for class, also for Python subclasses */
+static unsigned int type_width(PyTypeObject *type)
+{
+	if (PyType_IsSubtype(type, &Sponge800Type))
+		return 800;
+	if (PyType_IsSubtype(type, &Sponge400Type))
+		return 400;
+	if (PyType_IsSubtype(type, &Sponge200Type))
+		return 200;
+	return 1600;
+}
+
+/* class for new objects with given width */
+static PyTypeObject *width_type(unsigned int width)
+{
+	switch (width) {
+	case 800: return &Sponge800Type;
+	case 400: return &Sponge400Type;
+	case 200: return &Sponge200Type;
+	}
+	return &SpongeType;
+}
+
 static int Sponge_init(PyObject *obj, PyObject *args, PyObject *kws)
 {
 	SpongeObject *self = (SpongeObject *)obj;
-	unsigned int cap;
-	static char *kwlist[] = { "capacity", 0 };
+	unsigned int cap, width, rounds;
+	static char *kwlist[] = { "capacity", "rounds", 0 };
 
-        if (!PyArg_ParseTupleAndKeywords(args, kws, "I", kwlist, &cap))
+	width = type_width(Py_TYPE(obj));
+	rounds = keccak_full_rounds(width);
+        if (!PyArg_ParseTupleAndKeywords(args, kws, "I|I", kwlist, &cap, &rounds))
                 return -1;
 
-        if (keccak_init(&self->md, cap) != 1) {
-		PyErr_SetString(PyExc_ValueError, "Invalid capacity");
+        if (keccak_init_width(&self->md, width, cap, rounds) != 1) {
+		PyErr_SetString(PyExc_ValueError, "Invalid capacity or rounds");
 		return -1;
 	}
 
@@ -77,8 +304,12 @@ static int Sponge_init(PyObject *obj, PyObject *args, PyObject *kws)
 static void Sponge_dealloc(PyObject *obj)
 {
 	SpongeObject *self = (SpongeObject *)obj;
+	if (self->lock) {
+		PyThread_free_lock(self->lock);
+		self->lock = NULL;
+	}
 	memset(&self->md, 0, sizeof(self->md));
-        PyObject_Del(obj);
+	Py_TYPE(obj)->tp_free(obj);
 }
 
 static const char Sponge_copy_doc[] =
@@ -89,12 +320,158 @@ static PyObject *Sponge_copy(PyObject *obj, PyObject *args)
 	SpongeObject *self = (SpongeObject *)obj;
 	SpongeObject *res;
 
-        res = alloc_sponge();
+        res = alloc_sponge(self->md.width);
+	if (!res)
+		return NULL;
+
+	ENTER_SPONGE(self);
 	memcpy(&res->md, &self->md, sizeof(res->md));
+	LEAVE_SPONGE(self);
 
 	return (PyObject *)res;
 }
 
+/*
+ * Serialized state:
+ *
+ *   version   - 1 byte
+ *   width     - 1 byte, state size in bytes: 200, 100, 50 or 25
+ *   capacity  - 2 bytes, little-endian, in bits
+ *   rounds    - 1 byte
+ *   pos       - 1 byte
+ *   state     - width bytes, lanes in little-endian
+ */
+
+#define SPONGE_STATE_VERSION	1
+#define SPONGE_STATE_HDR	6
+
+/* parse header for given permutation width, return false with exception set if invalid */
+static bool parse_state(const uint8_t *p, Py_ssize_t len, unsigned int width,
+			unsigned int *cap_p, unsigned int *rounds_p)
+{
+	struct KeccakContext tmp;
+
+	if (len != SPONGE_STATE_HDR + width / 8 || p[0] != SPONGE_STATE_VERSION || p[1] != width / 8)
+		goto invalid;
+	*cap_p = p[2] | (p[3] << 8);
+	*rounds_p = p[4];
+	if (keccak_init_width(&tmp, width, *cap_p, *rounds_p) != 1 || p[5] >= tmp.rbytes)
+		goto invalid;
+	return true;
+invalid:
+	PyErr_SetString(PyExc_ValueError, "Invalid sponge state");
+	return false;
+}
+
+/* load parsed state into object */
+static void load_state(SpongeObject *self, const uint8_t *p)
+{
+	ENTER_SPONGE(self);
+	keccak_init_width(&self->md, p[1] * 8, p[2] | (p[3] << 8), p[4]);
+	keccak_import_state(&self->md, p + SPONGE_STATE_HDR);
+	self->md.pos = p[5];
+	LEAVE_SPONGE(self);
+}
+
+static const char Sponge_to_bytes_doc[] =
+"to_bytes() - Export current state as bytes.\n"
+"\n"
+"Result contains capacity, rounds, position and full state,\n"
+"so it must be kept as secret as the key used.";
+
+static PyObject *Sponge_to_bytes(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	PyObject *res;
+	uint8_t *p;
+
+	res = PyBytes_FromStringAndSize(NULL, SPONGE_STATE_HDR + self->md.width / 8);
+	if (!res)
+		return NULL;
+	p = (uint8_t *)PyBytes_AsString(res);
+
+	ENTER_SPONGE(self);
+	p[0] = SPONGE_STATE_VERSION;
+	p[1] = self->md.width / 8;
+	p[2] = SPONGE_CAPACITY(self->md) & 0xFF;
+	p[3] = SPONGE_CAPACITY(self->md) >> 8;
+	p[4] = self->md.rounds;
+	p[5] = self->md.pos;
+	keccak_export_state(&self->md, p + SPONGE_STATE_HDR);
+	LEAVE_SPONGE(self);
+
+	return res;
+}
+
+static const char Sponge_from_bytes_doc[] =
+"from_bytes(data) - Create new object from to_bytes() result.";
+
+/* create object of class cls, which must give instance of base */
+static PyObject *state_from_bytes(PyObject *cls, PyObject *args, PyTypeObject *base)
+{
+	PyObject *dataobj, *res = NULL;
+	unsigned int cap, rounds;
+	Py_buffer buf;
+
+	if (!PyArg_ParseTuple(args, "O", &dataobj))
+		return NULL;
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+
+	if (parse_state(buf.buf, buf.len, type_width((PyTypeObject *)cls), &cap, &rounds)) {
+		res = PyObject_CallFunction(cls, "II", cap, rounds);
+		if (res && !PyObject_TypeCheck(res, base)) {
+			PyErr_SetString(PyExc_TypeError, "from_bytes: class does not create sponge");
+			Py_CLEAR(res);
+		}
+		if (res)
+			load_state((SpongeObject *)res, buf.buf);
+	}
+
+	PyBuffer_Release(&buf);
+	return res;
+}
+
+static PyObject *Sponge_from_bytes(PyObject *cls, PyObject *args)
+{
+	return state_from_bytes(cls, args, &SpongeType);
+}
+
+static PyObject *Sponge_reduce(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	PyObject *state;
+
+	state = Sponge_to_bytes(obj, NULL);
+	if (!state)
+		return NULL;
+	return Py_BuildValue("O(II)N", (PyObject *)Py_TYPE(obj),
+			     SPONGE_CAPACITY(self->md), self->md.rounds, state);
+}
+
+static PyObject *Sponge_setstate(PyObject *obj, PyObject *args)
+{
+	unsigned int cap, rounds;
+	PyObject *dataobj;
+	Py_buffer buf;
+	bool ok;
+
+	if (!PyArg_ParseTuple(args, "O", &dataobj))
+		return NULL;
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+
+	ok = parse_state(buf.buf, buf.len, ((SpongeObject *)obj)->md.width, &cap, &rounds);
+	if (ok)
+		load_state((SpongeObject *)obj, buf.buf);
+
+	PyBuffer_Release(&buf);
+	if (!ok)
+		return NULL;
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
 static bool get_buffer(PyObject *obj, Py_buffer *buf)
 {
 	if (PyUnicode_Check(obj)) {
@@ -119,27 +496,37 @@ static bool get_buffer(PyObject *obj, Py_buffer *buf)
 	return true;
 }
 
+static bool get_write_buffer(PyObject *obj, Py_buffer *buf)
+{
+	if (PyObject_GetBuffer(obj, buf, PyBUF_WRITABLE) == -1) {
+		return false;
+	}
+	return true;
+}
+
 static const char Sponge_absorb_doc[] =
 "absorb(data) - XOR data into state.";
 
-static PyObject *Sponge_absorb(PyObject *obj, PyObject *args)
+static PyObject *Sponge_absorb(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
 	SpongeObject *self = (SpongeObject *)obj;
 	PyObject *dataobj;
 	Py_buffer buf;
 
-	if (!PyArg_ParseTuple(args, "O", &dataobj))
+	if (!check_nargs("absorb", nargs, 1, 1) || !check_init(&self->md))
 		return NULL;
+	dataobj = args[0];
 	if (!get_buffer(dataobj, &buf))
 		return NULL;
 
-	keccak_absorb(&self->md, buf.buf, buf.len);
+	sponge_absorb(self, buf.buf, buf.len);
 
 	PyBuffer_Release(&buf);
 
 	Py_INCREF(Py_None);
 	return Py_None;
 }
+FASTCALL_WRAPPER(Sponge_absorb)
 
 static const char Sponge_pad_doc[] =
 "pad(suffix) - Add padding and permute state.\n"
@@ -152,37 +539,41 @@ static const char Sponge_pad_doc[] =
 "case when initial data for encryption is added without padding - which\n"
 "is bad style.";
 
-static PyObject *Sponge_pad(PyObject *obj, PyObject *args)
+static PyObject *Sponge_pad(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
 	SpongeObject *self = (SpongeObject *)obj;
 	PyObject *dataobj;
 	Py_buffer buf;
 
-	if (!PyArg_ParseTuple(args, "O", &dataobj))
+	if (!check_nargs("pad", nargs, 1, 1) || !check_init(&self->md))
 		return NULL;
+	dataobj = args[0];
 	if (!get_buffer(dataobj, &buf))
 		return NULL;
 
+	ENTER_SPONGE(self);
 	keccak_pad(&self->md, buf.buf, buf.len);
+	LEAVE_SPONGE(self);
 
 	PyBuffer_Release(&buf);
 
 	Py_INCREF(Py_None);
 	return Py_None;
 }
+FASTCALL_WRAPPER(Sponge_pad)
 
 static const char Sponge_squeeze_doc[] =
 "squeeze(nbytes) - extract given number of bytes from state.";
 
-static PyObject *Sponge_squeeze(PyObject *obj, PyObject *args)
+static PyObject *Sponge_squeeze(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
 	SpongeObject *self = (SpongeObject *)obj;
 	unsigned int nbytes;
 	PyObject *res;
 	void *resdata;
 
-        if (!PyArg_ParseTuple(args, "I", &nbytes))
-                return NULL;
+	if (!check_nargs("squeeze", nargs, 1, 1) || !check_init(&self->md) || !get_uint(args[0], &nbytes))
+		return NULL;
 
 	/* allocate result object */
 	res = PyBytes_FromStringAndSize(NULL, nbytes);
@@ -196,57 +587,44 @@ static PyObject *Sponge_squeeze(PyObject *obj, PyObject *args)
 		return NULL;
 	}
 
-	keccak_squeeze(&self->md, resdata, nbytes);
+	sponge_squeeze(self, resdata, nbytes);
 
 	return res;
 }
+FASTCALL_WRAPPER(Sponge_squeeze)
 
-static const char Sponge_squeeze_xor_doc[] =
-"squeeze_xor(data) - return data XOR-ed with state.";
+static const char Sponge_squeeze_into_doc[] =
+"squeeze_into(buf) - fill writable buffer with bytes from state.";
 
-static PyObject *Sponge_squeeze_xor(PyObject *obj, PyObject *args)
+static PyObject *Sponge_squeeze_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
 	SpongeObject *self = (SpongeObject *)obj;
-	PyObject *res;
-	PyObject *dataobj;
-	void *resdata;
-	Py_buffer buf;
-
-	if (!PyArg_ParseTuple(args, "O", &dataobj))
-		return NULL;
-	if (!get_buffer(dataobj, &buf))
-		return NULL;
+	PyObject *dstobj;
+	Py_buffer dst;
 
-	/* allocate result object */
-	res = PyBytes_FromStringAndSize(NULL, buf.len);
-	if (!res) {
-		PyBuffer_Release(&buf);
+	if (!check_nargs("squeeze_into", nargs, 1, 1) || !check_init(&self->md))
 		return NULL;
-	}
-
-	/* get internal buffer */
-	resdata = PyBytes_AsString(res);
-	if (!resdata) {
-		PyBuffer_Release(&buf);
-		Py_CLEAR(res);
+	dstobj = args[0];
+	if (!get_write_buffer(dstobj, &dst))
 		return NULL;
-	}
 
-	keccak_squeeze_xor(&self->md, resdata, buf.buf, buf.len);
+	sponge_squeeze(self, dst.buf, dst.len);
 
-	PyBuffer_Release(&buf);
+	PyBuffer_Release(&dst);
 
-	return res;
+	Py_INCREF(Py_None);
+	return Py_None;
 }
+FASTCALL_WRAPPER(Sponge_squeeze_into)
 
-static const char Sponge_encrypt_doc[] =
-"encrypt(data) - return data XOR-ed into state.\n"
-"\n"
-"The state should already absorbed and permuted before\n"
-"encrypting starts.  This means .absorb(key) + .pad()\n"
-"should be called.";
+typedef void (*xor_op_func)(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len);
 
-static PyObject *Sponge_encrypt(PyObject *obj, PyObject *args)
+/*
+ * Common code for operations that take data and
+ * return same amount of transformed bytes.
+ */
+static PyObject *run_xor_op(PyObject *obj, PyObject *const *args, Py_ssize_t nargs,
+			    const char *fname, xor_op_func func)
 {
 	SpongeObject *self = (SpongeObject *)obj;
 	PyObject *res;
@@ -254,8 +632,9 @@ static PyObject *Sponge_encrypt(PyObject *obj, PyObject *args)
 	void *resdata;
 	Py_buffer buf;
 
-	if (!PyArg_ParseTuple(args, "O", &dataobj))
+	if (!check_nargs(fname, nargs, 1, 1) || !check_init(&self->md))
 		return NULL;
+	dataobj = args[0];
 	if (!get_buffer(dataobj, &buf))
 		return NULL;
 
@@ -274,108 +653,541 @@ static PyObject *Sponge_encrypt(PyObject *obj, PyObject *args)
 		return NULL;
 	}
 
-	keccak_encrypt(&self->md, resdata, buf.buf, buf.len);
+	if (use_threads(self, buf.len)) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, 1);
+		func(&self->md, resdata, buf.buf, buf.len);
+		PyThread_release_lock(self->lock);
+		Py_END_ALLOW_THREADS
+	} else {
+		ENTER_SPONGE(self);
+		func(&self->md, resdata, buf.buf, buf.len);
+		LEAVE_SPONGE(self);
+	}
 
 	PyBuffer_Release(&buf);
 
 	return res;
 }
 
-static const char Sponge_decrypt_doc[] =
-"decrypt(enc_data) - return enc_data XOR-ed with state.\n"
-"\n"
-"This is reverse of .encrypt() - it assumes enc_data\n"
-"was created by XOR-ing current state with cleartext.\n"
-"This function reverses it.";
-
-static PyObject *Sponge_decrypt(PyObject *obj, PyObject *args)
+/*
+ * Same as run_xor_op(), but result is written into
+ * caller-provided buffer.  The buffers may be same object.
+ */
+static PyObject *run_xor_into_op(PyObject *obj, PyObject *const *args, Py_ssize_t nargs,
+				 const char *fname, xor_op_func func)
 {
 	SpongeObject *self = (SpongeObject *)obj;
-	PyObject *res;
-	PyObject *dataobj;
-	void *resdata;
-	Py_buffer buf;
+	PyObject *dataobj, *dstobj;
+	Py_buffer buf, dst;
 
-	if (!PyArg_ParseTuple(args, "O", &dataobj))
+	if (!check_nargs(fname, nargs, 2, 2) || !check_init(&self->md))
 		return NULL;
+	dataobj = args[0];
+	dstobj = args[1];
 	if (!get_buffer(dataobj, &buf))
 		return NULL;
-
-	/* allocate result object */
-	res = PyBytes_FromStringAndSize(NULL, buf.len);
-	if (!res) {
+	if (!get_write_buffer(dstobj, &dst)) {
 		PyBuffer_Release(&buf);
 		return NULL;
 	}
-
-	/* get internal buffer */
-	resdata = PyBytes_AsString(res);
-	if (!resdata) {
+	if (dst.len < buf.len) {
+		PyErr_SetString(PyExc_ValueError, "Output buffer too small");
 		PyBuffer_Release(&buf);
-		Py_CLEAR(res);
+		PyBuffer_Release(&dst);
 		return NULL;
 	}
 
-	keccak_decrypt(&self->md, resdata, buf.buf, buf.len);
+	if (use_threads(self, buf.len)) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, 1);
+		func(&self->md, dst.buf, buf.buf, buf.len);
+		PyThread_release_lock(self->lock);
+		Py_END_ALLOW_THREADS
+	} else {
+		ENTER_SPONGE(self);
+		func(&self->md, dst.buf, buf.buf, buf.len);
+		LEAVE_SPONGE(self);
+	}
 
 	PyBuffer_Release(&buf);
-
-	return res;
-}
-
-static const char Sponge_rewind_doc[] =
-"rewind() - move internal position to start of state.\n"
-"\n"
-"Useful for PRNG/duplex modes.  In fact, it should not\n"
-"be touched at all in other modes.";
-
-static PyObject *Sponge_rewind(PyObject *obj, PyObject *args)
-{
-	SpongeObject *self = (SpongeObject *)obj;
-
-	keccak_rewind(&self->md);
+	PyBuffer_Release(&dst);
 
 	Py_INCREF(Py_None);
 	return Py_None;
 }
 
-static const char Sponge_forget_doc[] =
-"forget() - clear internal state, except capacity.";
+static const char Sponge_squeeze_xor_doc[] =
+"squeeze_xor(data) - return data XOR-ed with state.";
 
-static PyObject *Sponge_forget(PyObject *obj, PyObject *args)
+static PyObject *Sponge_squeeze_xor(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
-	SpongeObject *self = (SpongeObject *)obj;
+	return run_xor_op(obj, args, nargs, "squeeze_xor", keccak_squeeze_xor);
+}
+FASTCALL_WRAPPER(Sponge_squeeze_xor)
 
-	keccak_forget(&self->md);
+static const char Sponge_squeeze_xor_into_doc[] =
+"squeeze_xor_into(data, out) - same as squeeze_xor(), but write result into out.\n"
+"\n"
+"Output buffer must be writable and at least len(data) bytes.\n"
+"It may be same object as data.";
 
-	Py_INCREF(Py_None);
-	return Py_None;
+static PyObject *Sponge_squeeze_xor_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_xor_into_op(obj, args, nargs, "squeeze_xor_into", keccak_squeeze_xor);
 }
+FASTCALL_WRAPPER(Sponge_squeeze_xor_into)
 
-/*
- * getters
- */
+static const char Sponge_encrypt_doc[] =
+"encrypt(data) - return data XOR-ed into state.\n"
+"\n"
+"The state should already absorbed and permuted before\n"
+"encrypting starts.  This means .absorb(key) + .pad()\n"
+"should be called.";
 
-static PyObject *Sponge_get_name(PyObject *obj, void *xtra)
+static PyObject *Sponge_encrypt(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
-	SpongeObject *self = (SpongeObject *)obj;
-	int cap = 1600 - self->md.rbytes * 8;
-	char buf[128];
-
-	snprintf(buf, sizeof(buf), "%s-%d", SPONGE_NAME, cap);
-	return PyString_FromString(buf);
+	return run_xor_op(obj, args, nargs, "encrypt", keccak_encrypt);
 }
+FASTCALL_WRAPPER(Sponge_encrypt)
 
-static PyObject *Sponge_get_rate(PyObject *obj, void *xtra)
+static const char Sponge_encrypt_into_doc[] =
+"encrypt_into(data, out) - same as encrypt(), but write result into out.\n"
+"\n"
+"Output buffer must be writable and at least len(data) bytes.\n"
+"It may be same object as data.";
+
+static PyObject *Sponge_encrypt_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
 {
-	SpongeObject *self = (SpongeObject *)obj;
-	return PyLong_FromLong(self->md.rbytes * 8);
+	return run_xor_into_op(obj, args, nargs, "encrypt_into", keccak_encrypt);
 }
+FASTCALL_WRAPPER(Sponge_encrypt_into)
 
-static PyObject *Sponge_get_capacity(PyObject *obj, void *xtra)
+static const char Sponge_decrypt_doc[] =
+"decrypt(enc_data) - return enc_data XOR-ed with state.\n"
+"\n"
+"This is reverse of .encrypt() - it assumes enc_data\n"
+"was created by XOR-ing current state with cleartext.\n"
+"This function reverses it.";
+
+static PyObject *Sponge_decrypt(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_xor_op(obj, args, nargs, "decrypt", keccak_decrypt);
+}
+FASTCALL_WRAPPER(Sponge_decrypt)
+
+static const char Sponge_decrypt_into_doc[] =
+"decrypt_into(enc_data, out) - same as decrypt(), but write result into out.\n"
+"\n"
+"Output buffer must be writable and at least len(enc_data) bytes.\n"
+"It may be same object as enc_data.";
+
+static PyObject *Sponge_decrypt_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_xor_into_op(obj, args, nargs, "decrypt_into", keccak_decrypt);
+}
+FASTCALL_WRAPPER(Sponge_decrypt_into)
+
+/*
+ * SpongeWrap operations.
+ */
+
+typedef void (*wrap_func)(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len,
+			  const void *pad, size_t padlen);
+
+static void wrap_absorb(struct KeccakContext *ctx, uint8_t *dst, const void *src, size_t len,
+			const void *pad, size_t padlen)
+{
+	keccak_wrap_absorb(ctx, src, len, pad, padlen);
+}
+
+/* one byte is needed for frame bit */
+static bool check_wrap(SpongeObject *self)
+{
+	if (!check_init(&self->md))
+		return false;
+	if (self->md.rbytes < 2) {
+		PyErr_SetString(PyExc_ValueError, "Rate too small for SpongeWrap");
+		return false;
+	}
+	return true;
+}
+
+static void run_wrap(SpongeObject *self, wrap_func func, uint8_t *dst, Py_buffer *buf, Py_buffer *pad)
+{
+	if (use_threads(self, buf->len)) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, 1);
+		func(&self->md, dst, buf->buf, buf->len, pad->buf, pad->len);
+		PyThread_release_lock(self->lock);
+		Py_END_ALLOW_THREADS
+	} else {
+		ENTER_SPONGE(self);
+		func(&self->md, dst, buf->buf, buf->len, pad->buf, pad->len);
+		LEAVE_SPONGE(self);
+	}
+}
+
+/*
+ * Parse (data, pad), run func and return result as bytes,
+ * or None if with_result is false.
+ */
+static PyObject *run_wrap_op(PyObject *obj, PyObject *const *args, Py_ssize_t nargs,
+			     const char *fname, wrap_func func, bool with_result)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	PyObject *dataobj, *padobj;
+	PyObject *res = NULL;
+	uint8_t *resdata = NULL;
+	Py_buffer buf, pad;
+
+	if (!check_nargs(fname, nargs, 2, 2))
+		return NULL;
+	dataobj = args[0];
+	padobj = args[1];
+	if (!check_wrap(self))
+		return NULL;
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+	if (!get_buffer(padobj, &pad)) {
+		PyBuffer_Release(&buf);
+		return NULL;
+	}
+
+	if (with_result) {
+		res = PyBytes_FromStringAndSize(NULL, buf.len);
+		if (!res)
+			goto out;
+		resdata = (uint8_t *)PyBytes_AsString(res);
+		if (!resdata) {
+			Py_CLEAR(res);
+			goto out;
+		}
+	} else {
+		res = Py_None;
+		Py_INCREF(res);
+	}
+
+	run_wrap(self, func, resdata, &buf, &pad);
+out:
+	PyBuffer_Release(&buf);
+	PyBuffer_Release(&pad);
+	return res;
+}
+
+/*
+ * Parse (data, out, pad) and run func.
+ */
+static PyObject *run_wrap_into_op(PyObject *obj, PyObject *const *args, Py_ssize_t nargs,
+				  const char *fname, wrap_func func)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	PyObject *dataobj, *dstobj, *padobj;
+	PyObject *res = NULL;
+	Py_buffer buf, dst, pad;
+
+	if (!check_nargs(fname, nargs, 3, 3))
+		return NULL;
+	dataobj = args[0];
+	dstobj = args[1];
+	padobj = args[2];
+	if (!check_wrap(self))
+		return NULL;
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+	if (!get_write_buffer(dstobj, &dst)) {
+		PyBuffer_Release(&buf);
+		return NULL;
+	}
+	if (!get_buffer(padobj, &pad)) {
+		PyBuffer_Release(&buf);
+		PyBuffer_Release(&dst);
+		return NULL;
+	}
+
+	if (dst.len < buf.len) {
+		PyErr_SetString(PyExc_ValueError, "Output buffer too small");
+	} else {
+		run_wrap(self, func, dst.buf, &buf, &pad);
+		res = Py_None;
+		Py_INCREF(res);
+	}
+
+	PyBuffer_Release(&buf);
+	PyBuffer_Release(&dst);
+	PyBuffer_Release(&pad);
+	return res;
+}
+
+static const char Sponge_wrap_absorb_doc[] =
+"wrap_absorb(data, pad) - absorb data in SpongeWrap blocks.\n"
+"\n"
+"Data is added in blocks of rbytes-1 bytes, state is padded\n"
+"with pad between full blocks.";
+
+static PyObject *Sponge_wrap_absorb(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_wrap_op(obj, args, nargs, "wrap_absorb", wrap_absorb, false);
+}
+FASTCALL_WRAPPER(Sponge_wrap_absorb)
+
+static const char Sponge_wrap_encrypt_doc[] =
+"wrap_encrypt(data, pad) - encrypt() in SpongeWrap blocks.\n"
+"\n"
+"Data is processed in blocks of rbytes-1 bytes, state is padded\n"
+"with pad between full blocks.";
+
+static PyObject *Sponge_wrap_encrypt(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_wrap_op(obj, args, nargs, "wrap_encrypt", keccak_wrap_encrypt, true);
+}
+FASTCALL_WRAPPER(Sponge_wrap_encrypt)
+
+static const char Sponge_wrap_decrypt_doc[] =
+"wrap_decrypt(enc_data, pad) - decrypt() in SpongeWrap blocks.";
+
+static PyObject *Sponge_wrap_decrypt(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_wrap_op(obj, args, nargs, "wrap_decrypt", keccak_wrap_decrypt, true);
+}
+FASTCALL_WRAPPER(Sponge_wrap_decrypt)
+
+static const char Sponge_wrap_encrypt_into_doc[] =
+"wrap_encrypt_into(data, out, pad) - same as wrap_encrypt(), but write result into out.\n"
+"\n"
+"Output buffer must be writable and at least len(data) bytes.\n"
+"It may be same object as data.";
+
+static PyObject *Sponge_wrap_encrypt_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_wrap_into_op(obj, args, nargs, "wrap_encrypt_into", keccak_wrap_encrypt);
+}
+FASTCALL_WRAPPER(Sponge_wrap_encrypt_into)
+
+static const char Sponge_wrap_decrypt_into_doc[] =
+"wrap_decrypt_into(enc_data, out, pad) - same as wrap_decrypt(), but write result into out.\n"
+"\n"
+"Output buffer must be writable and at least len(enc_data) bytes.\n"
+"It may be same object as enc_data.";
+
+static PyObject *Sponge_wrap_decrypt_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	return run_wrap_into_op(obj, args, nargs, "wrap_decrypt_into", keccak_wrap_decrypt);
+}
+FASTCALL_WRAPPER(Sponge_wrap_decrypt_into)
+
+static const char Sponge_finalize_copy_doc[] =
+"finalize_copy(pad, nbytes) - pad and squeeze temporary copy of state.\n"
+"\n"
+"Same as copy() + pad(pad) + squeeze(nbytes), but copy is made\n"
+"on C stack, so no temporary object is allocated.  Object state\n"
+"is not changed.";
+
+static PyObject *Sponge_finalize_copy(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	struct KeccakContext tmp;
+	PyObject *padobj, *res;
+	unsigned int nbytes;
+	Py_buffer pad;
+
+	if (!check_nargs("finalize_copy", nargs, 2, 2) || !check_init(&self->md) || !get_uint(args[1], &nbytes))
+		return NULL;
+	padobj = args[0];
+	if (!get_buffer(padobj, &pad))
+		return NULL;
+
+	res = PyBytes_FromStringAndSize(NULL, nbytes);
+	if (!res) {
+		PyBuffer_Release(&pad);
+		return NULL;
+	}
+
+	ENTER_SPONGE(self);
+	tmp = self->md;
+	LEAVE_SPONGE(self);
+
+	/* copy is private, so only GIL matters */
+	if (nbytes >= SPONGE_GIL_MINSIZE) {
+		Py_BEGIN_ALLOW_THREADS
+		keccak_pad(&tmp, pad.buf, pad.len);
+		keccak_squeeze(&tmp, (uint8_t *)PyBytes_AS_STRING(res), nbytes);
+		Py_END_ALLOW_THREADS
+	} else {
+		keccak_pad(&tmp, pad.buf, pad.len);
+		keccak_squeeze(&tmp, (uint8_t *)PyBytes_AS_STRING(res), nbytes);
+	}
+	memset(&tmp, 0, sizeof(tmp));
+
+	PyBuffer_Release(&pad);
+	return res;
+}
+FASTCALL_WRAPPER(Sponge_finalize_copy)
+
+static const char Sponge_reset_doc[] =
+"reset() - clear whole state, keep capacity and rounds.\n"
+"\n"
+"Object is then same as freshly created one.";
+
+static PyObject *Sponge_reset(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+
+	ENTER_SPONGE(self);
+	keccak_reset(&self->md);
+	LEAVE_SPONGE(self);
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static const char Sponge_rewind_doc[] =
+"rewind() - move internal position to start of state.\n"
+"\n"
+"Useful for PRNG/duplex modes.  In fact, it should not\n"
+"be touched at all in other modes.";
+
+static PyObject *Sponge_rewind(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+
+	ENTER_SPONGE(self);
+	keccak_rewind(&self->md);
+	LEAVE_SPONGE(self);
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static const char Sponge_forget_doc[] =
+"forget() - clear internal state, except capacity.";
+
+static PyObject *Sponge_forget(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+
+	ENTER_SPONGE(self);
+	keccak_forget(&self->md);
+	LEAVE_SPONGE(self);
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+/*
+ * NumPy bit generator interface.  Layout must match bitgen_t
+ * in numpy/random/bitgen.h, it is copied here to avoid
+ * build dependency on NumPy.
+ */
+
+struct NumpyBitGen {
+	void *state;
+	uint64_t (*next_uint64)(void *st);
+	uint32_t (*next_uint32)(void *st);
+	double (*next_double)(void *st);
+	uint64_t (*next_raw)(void *st);
+};
+
+#define BITGEN_CAPSULE "BitGenerator"
+
+static uint64_t bitgen_next_uint64(void *st)
+{
+	uint8_t buf[8];
+	uint64_t val = 0;
+	int i;
+
+	keccak_squeeze(st, buf, 8);
+	for (i = 7; i >= 0; i--)
+		val = (val << 8) | buf[i];
+	return val;
+}
+
+static uint32_t bitgen_next_uint32(void *st)
+{
+	uint8_t buf[4];
+
+	keccak_squeeze(st, buf, 4);
+	return buf[0] | ((uint32_t)buf[1] << 8) | ((uint32_t)buf[2] << 16) | ((uint32_t)buf[3] << 24);
+}
+
+static double bitgen_next_double(void *st)
+{
+	return (bitgen_next_uint64(st) >> 11) * (1.0 / 9007199254740992.0);
+}
+
+static void bitgen_destructor(PyObject *capsule)
+{
+	struct NumpyBitGen *bg = PyCapsule_GetPointer(capsule, BITGEN_CAPSULE);
+	PyObject *sponge = PyCapsule_GetContext(capsule);
+
+	PyMem_Free(bg);
+	Py_XDECREF(sponge);
+}
+
+static const char Sponge_numpy_capsule_doc[] =
+"numpy_capsule() - return PyCapsule with NumPy bitgen_t struct.\n"
+"\n"
+"Values are squeezed from state as little-endian integers.\n"
+"Capsule keeps reference to sponge.  While it is used by\n"
+"numpy.random.Generator, sponge must not be used directly.";
+
+static PyObject *Sponge_numpy_capsule(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	struct NumpyBitGen *bg;
+	PyObject *capsule;
+
+	if (!check_init(&self->md))
+		return NULL;
+	bg = PyMem_Malloc(sizeof(*bg));
+	if (!bg)
+		return PyErr_NoMemory();
+	bg->state = &self->md;
+	bg->next_uint64 = bitgen_next_uint64;
+	bg->next_uint32 = bitgen_next_uint32;
+	bg->next_double = bitgen_next_double;
+	bg->next_raw = bitgen_next_uint64;
+
+	capsule = PyCapsule_New(bg, BITGEN_CAPSULE, bitgen_destructor);
+	if (!capsule) {
+		PyMem_Free(bg);
+		return NULL;
+	}
+	if (PyCapsule_SetContext(capsule, obj) < 0) {
+		Py_DECREF(capsule);
+		return NULL;
+	}
+	Py_INCREF(obj);
+	return capsule;
+}
+
+/*
+ * getters
+ */
+
+static PyObject *Sponge_get_name(PyObject *obj, void *xtra)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	int cap = SPONGE_CAPACITY(self->md);
+	char buf[128];
+
+	if (self->md.rounds != keccak_full_rounds(self->md.width))
+		snprintf(buf, sizeof(buf), "%s%d-%d-r%d", SPONGE_NAME, (int)self->md.width, cap, (int)self->md.rounds);
+	else
+		snprintf(buf, sizeof(buf), "%s%d-%d", SPONGE_NAME, (int)self->md.width, cap);
+	return PyString_FromString(buf);
+}
+
+static PyObject *Sponge_get_rate(PyObject *obj, void *xtra)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	return PyLong_FromLong(self->md.rbytes * 8);
+}
+
+static PyObject *Sponge_get_capacity(PyObject *obj, void *xtra)
 {
 	SpongeObject *self = (SpongeObject *)obj;
-	return PyLong_FromLong(1600 - self->md.rbytes * 8);
+	return PyLong_FromLong(SPONGE_CAPACITY(self->md));
 }
 
 static PyObject *Sponge_get_pos(PyObject *obj, void *xtra)
@@ -384,6 +1196,12 @@ static PyObject *Sponge_get_pos(PyObject *obj, void *xtra)
 	return PyLong_FromLong(self->md.pos);
 }
 
+static PyObject *Sponge_get_rounds(PyObject *obj, void *xtra)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	return PyLong_FromLong(self->md.rounds);
+}
+
 static PyObject *Sponge_get_rbytes(PyObject *obj, void *xtra)
 {
 	SpongeObject *self = (SpongeObject *)obj;
@@ -396,12 +1214,28 @@ static PyObject *Sponge_get_rbytes(PyObject *obj, void *xtra)
 
 static PyMethodDef Sponge_methods[] = {
 	{ "copy", Sponge_copy, METH_NOARGS, Sponge_copy_doc},
-	{ "absorb", Sponge_absorb, METH_VARARGS, Sponge_absorb_doc },
-	{ "squeeze", Sponge_squeeze, METH_VARARGS, Sponge_squeeze_doc },
-	{ "squeeze_xor", Sponge_squeeze_xor, METH_VARARGS, Sponge_squeeze_xor_doc },
-	{ "encrypt", Sponge_encrypt, METH_VARARGS, Sponge_encrypt_doc },
-	{ "decrypt", Sponge_decrypt, METH_VARARGS, Sponge_decrypt_doc },
-	{ "pad", Sponge_pad, METH_VARARGS, Sponge_pad_doc },
+	{ "to_bytes", Sponge_to_bytes, METH_NOARGS, Sponge_to_bytes_doc },
+	{ "from_bytes", Sponge_from_bytes, METH_VARARGS | METH_CLASS, Sponge_from_bytes_doc },
+	{ "__reduce__", Sponge_reduce, METH_NOARGS, NULL },
+	{ "__setstate__", Sponge_setstate, METH_VARARGS, NULL },
+	FASTCALL_ENTRY("absorb", Sponge_absorb, Sponge_absorb_doc),
+	FASTCALL_ENTRY("squeeze", Sponge_squeeze, Sponge_squeeze_doc),
+	FASTCALL_ENTRY("squeeze_xor", Sponge_squeeze_xor, Sponge_squeeze_xor_doc),
+	FASTCALL_ENTRY("encrypt", Sponge_encrypt, Sponge_encrypt_doc),
+	FASTCALL_ENTRY("decrypt", Sponge_decrypt, Sponge_decrypt_doc),
+	FASTCALL_ENTRY("squeeze_into", Sponge_squeeze_into, Sponge_squeeze_into_doc),
+	FASTCALL_ENTRY("squeeze_xor_into", Sponge_squeeze_xor_into, Sponge_squeeze_xor_into_doc),
+	FASTCALL_ENTRY("encrypt_into", Sponge_encrypt_into, Sponge_encrypt_into_doc),
+	FASTCALL_ENTRY("decrypt_into", Sponge_decrypt_into, Sponge_decrypt_into_doc),
+	FASTCALL_ENTRY("wrap_absorb", Sponge_wrap_absorb, Sponge_wrap_absorb_doc),
+	FASTCALL_ENTRY("wrap_encrypt", Sponge_wrap_encrypt, Sponge_wrap_encrypt_doc),
+	FASTCALL_ENTRY("wrap_decrypt", Sponge_wrap_decrypt, Sponge_wrap_decrypt_doc),
+	FASTCALL_ENTRY("wrap_encrypt_into", Sponge_wrap_encrypt_into, Sponge_wrap_encrypt_into_doc),
+	FASTCALL_ENTRY("wrap_decrypt_into", Sponge_wrap_decrypt_into, Sponge_wrap_decrypt_into_doc),
+	FASTCALL_ENTRY("pad", Sponge_pad, Sponge_pad_doc),
+	{ "numpy_capsule", Sponge_numpy_capsule, METH_NOARGS, Sponge_numpy_capsule_doc },
+	FASTCALL_ENTRY("finalize_copy", Sponge_finalize_copy, Sponge_finalize_copy_doc),
+	{ "reset", Sponge_reset, METH_NOARGS, Sponge_reset_doc },
 	{ "rewind", Sponge_rewind, METH_NOARGS, Sponge_rewind_doc },
 	{ "forget", Sponge_forget, METH_NOARGS, Sponge_forget_doc },
 	{ NULL }
@@ -412,6 +1246,7 @@ static PyGetSetDef Sponge_getters[] = {
 	{ "name", Sponge_get_name, NULL, "Sponge name", NULL },
 	{ "rate", Sponge_get_rate, NULL, "Sponge rate in bits", NULL },
 	{ "capacity", Sponge_get_capacity, NULL, "Sponge capacity in bits", NULL },
+	{ "rounds", Sponge_get_rounds, NULL, "Number of rounds in permutation", NULL },
 	{ "rbytes", Sponge_get_rbytes, NULL, "Current position in bytes", NULL },
 	{ "pos", Sponge_get_pos, NULL, "Current position in bytes", NULL },
 	{ NULL }
@@ -419,7 +1254,7 @@ static PyGetSetDef Sponge_getters[] = {
 
 static PyTypeObject SpongeType = {
 	PyVarObject_HEAD_INIT(NULL, 0)
-	SPONGE_MODULE "." SPONGE_CLASS,	/* tp_name */
+	SPONGE_PACKAGE "." SPONGE_MODULE "." SPONGE_CLASS,	/* tp_name */
 	sizeof(SpongeObject),	/* tp_size */
 	0,			/* tp_itemsize */
 	Sponge_dealloc,	/* tp_dealloc */
@@ -459,37 +1294,1681 @@ static PyTypeObject SpongeType = {
 	PyObject_Del,		/* tp_free */
 };
 
-static SpongeObject *alloc_sponge(void)
-{
-	return PyObject_New(SpongeObject, &SpongeType);
-}
-
 /*
- * Module initialization
+ * Smaller widths share all code with KeccakSponge, only
+ * constructor defaults differ.  Rest of fields are filled
+ * by PyType_Ready() from tp_base.
  */
 
-/* common module init */
-static PyObject *mod_init(PyObject *mod)
+#define SMALL_SPONGE_TYPE(var, width, doc) \
+static PyTypeObject var = { \
+	PyVarObject_HEAD_INIT(NULL, 0) \
+	SPONGE_PACKAGE "." SPONGE_MODULE "." SPONGE_CLASS #width,	/* tp_name */ \
+	sizeof(SpongeObject),	/* tp_size */ \
+	0,			/* tp_itemsize */ \
+	0,			/* tp_dealloc */ \
+	0,			/* tp_print */ \
+	0,			/* tp_getattr */ \
+	0,			/* tp_setattr */ \
+	0,			/* tp_reserved */ \
+	0,			/* tp_repr */ \
+	0,			/* tp_as_number */ \
+	0,			/* tp_as_sequence */ \
+	0,			/* tp_as_mapping */ \
+	PyObject_HashNotImplemented, /* tp_hash */ \
+	0,			/* tp_call */ \
+	0,			/* tp_str */ \
+	0,			/* tp_getattro */ \
+	0,			/* tp_setattro */ \
+	0,			/* tp_as_buffer */ \
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,	/* tp_flags */ \
+	doc,			/* tp_doc */ \
+}
+
+SMALL_SPONGE_TYPE(Sponge800Type, 800, Sponge800_doc);
+SMALL_SPONGE_TYPE(Sponge400Type, 400, Sponge400_doc);
+SMALL_SPONGE_TYPE(Sponge200Type, 200, Sponge200_doc);
+
+static SpongeObject *alloc_sponge(unsigned int width)
 {
-	PyObject *name, *all;
+	SpongeObject *res;
 
-	Py_TYPE(&SpongeType) = &PyType_Type;
-	if (PyType_Ready(&SpongeType) != 0)
+	res = PyObject_New(SpongeObject, width_type(width));
+	if (res)
+		res->lock = NULL;
+	return res;
+}
+
+#ifdef HAVE_VECTORCALL
+/* KeccakSponge*(capacity, rounds) without argument tuple */
+static PyObject *Sponge_vectorcall(PyObject *type, PyObject *const *args, size_t nargsf, PyObject *kwnames)
+{
+	Py_ssize_t nargs = PyVectorcall_NARGS(nargsf);
+	unsigned int cap, width, rounds;
+	SpongeObject *res;
+
+	width = type_width((PyTypeObject *)type);
+	if (kwnames || type != (PyObject *)width_type(width))
+		return vectorcall_slow(type, args, nargs, kwnames);
+
+	rounds = keccak_full_rounds(width);
+	if (!check_nargs(strrchr(((PyTypeObject *)type)->tp_name, '.') + 1, nargs, 1, 2))
+		return NULL;
+	if (!get_uint(args[0], &cap))
+		return NULL;
+	if (nargs > 1 && !get_uint(args[1], &rounds))
 		return NULL;
 
-	Py_INCREF((PyObject *)&SpongeType);
-	if (PyModule_AddObject(mod, SPONGE_CLASS, (PyObject *)&SpongeType) != 0)
+	res = alloc_sponge(width);
+	if (!res)
 		return NULL;
+	if (keccak_init_width(&res->md, width, cap, rounds) != 1) {
+		PyErr_SetString(PyExc_ValueError, "Invalid capacity or rounds");
+		Py_DECREF(res);
+		return NULL;
+	}
+	return (PyObject *)res;
+}
+#endif
+
+/*
+ * Duplex object.
+ *
+ * Uses same object layout as sponge, so state helpers and
+ * getters are shared.  Each duplexing() call is one permutation.
+ */
 
+#define DUPLEX_CLASS	"KeccakDuplex"
 
-	name = PyString_FromString(SPONGE_CLASS);
-	if (name) {
-		all = PyTuple_Pack(1, name);
-		if (all)
-			PyModule_AddObject(mod, "__all__", all);
-		else
-			Py_CLEAR(name);
+static const char Duplex_doc[] =
+DUPLEX_CLASS "(capacity, rounds=24) - Duplex construction on Keccak-f1600.\n"
+"\n"
+"Each duplexing() call absorbs up to one block of input with padding,\n"
+"permutes state and returns output from start of rate.";
+
+/* validate lengths, raise ValueError if invalid */
+static bool check_duplex(SpongeObject *self, Py_ssize_t len, Py_ssize_t padlen, Py_ssize_t outlen)
+{
+	if (!check_init(&self->md))
+		return false;
+	if (padlen < 1) {
+		PyErr_SetString(PyExc_ValueError, "duplexing: padding must not be empty");
+		return false;
+	}
+	if (len > (Py_ssize_t)self->md.rbytes - padlen) {
+		PyErr_SetString(PyExc_ValueError, "duplexing: input and padding do not fit into rate");
+		return false;
+	}
+	if (outlen > (Py_ssize_t)self->md.rbytes) {
+		PyErr_SetString(PyExc_ValueError, "duplexing: output longer than rate");
+		return false;
 	}
+	return true;
+}
+
+/* parse data and optional padding arguments, default padding is 10*1 */
+static bool get_duplex_args(PyObject *const *args, Py_ssize_t nargs, const char *fname,
+			    Py_buffer *buf, Py_buffer *pad)
+{
+	if (!check_nargs(fname, nargs, 2, 3))
+		return false;
+	if (!get_buffer(args[0], buf))
+		return false;
+	if (nargs < 3) {
+		pad->buf = "\x01";
+		pad->len = 1;
+		pad->obj = NULL;
+	} else if (!get_buffer(args[2], pad)) {
+		PyBuffer_Release(buf);
+		return false;
+	}
+	return true;
+}
+
+static const char Duplex_duplexing_doc[] =
+"duplexing(data, nbytes, padding=b'\\\\x01') - one duplex step, returns nbytes of output.\n"
+"\n"
+"Data and padding together must fit into rate, nbytes must not exceed rate.\n"
+"Padding is given as for KeccakSponge.pad(), it must not be empty.";
+
+static PyObject *Duplex_duplexing(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	PyObject *res = NULL;
+	Py_buffer buf, pad;
+	unsigned int nbytes;
+
+	if (!get_duplex_args(args, nargs, "duplexing", &buf, &pad))
+		return NULL;
+	if (!get_uint(args[1], &nbytes) || !check_duplex(self, buf.len, pad.len, nbytes))
+		goto out;
+
+	res = PyBytes_FromStringAndSize(NULL, nbytes);
+	if (!res)
+		goto out;
+
+	ENTER_SPONGE(self);
+	keccak_duplexing(&self->md, buf.buf, buf.len, pad.buf, pad.len,
+			 (uint8_t *)PyBytes_AS_STRING(res), nbytes);
+	LEAVE_SPONGE(self);
+out:
+	PyBuffer_Release(&buf);
+	if (pad.obj)
+		PyBuffer_Release(&pad);
+	return res;
+}
+FASTCALL_WRAPPER(Duplex_duplexing)
+
+static const char Duplex_duplexing_into_doc[] =
+"duplexing_into(data, out, padding=b'\\\\x01') - one duplex step, output fills writable buffer.\n"
+"\n"
+"Same as duplexing(data, len(out), padding), without allocating result.";
+
+static PyObject *Duplex_duplexing_into(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	Py_buffer buf, pad, dst;
+	bool ok = false;
+
+	if (!get_duplex_args(args, nargs, "duplexing_into", &buf, &pad))
+		return NULL;
+	if (!get_write_buffer(args[1], &dst))
+		goto out;
+	if (check_duplex(self, buf.len, pad.len, dst.len)) {
+		ENTER_SPONGE(self);
+		keccak_duplexing(&self->md, buf.buf, buf.len, pad.buf, pad.len, dst.buf, dst.len);
+		LEAVE_SPONGE(self);
+		ok = true;
+	}
+	PyBuffer_Release(&dst);
+out:
+	PyBuffer_Release(&buf);
+	if (pad.obj)
+		PyBuffer_Release(&pad);
+	if (!ok)
+		return NULL;
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+FASTCALL_WRAPPER(Duplex_duplexing_into)
+
+static PyObject *Duplex_copy(PyObject *obj, PyObject *args)
+{
+	SpongeObject *self = (SpongeObject *)obj;
+	SpongeObject *res;
+
+	res = PyObject_New(SpongeObject, &DuplexType);
+	if (!res)
+		return NULL;
+	res->lock = NULL;
+
+	ENTER_SPONGE(self);
+	memcpy(&res->md, &self->md, sizeof(res->md));
+	LEAVE_SPONGE(self);
+
+	return (PyObject *)res;
+}
+
+static PyObject *Duplex_from_bytes(PyObject *cls, PyObject *args)
+{
+	return state_from_bytes(cls, args, &DuplexType);
+}
+
+static PyMethodDef Duplex_methods[] = {
+	FASTCALL_ENTRY("duplexing", Duplex_duplexing, Duplex_duplexing_doc),
+	FASTCALL_ENTRY("duplexing_into", Duplex_duplexing_into, Duplex_duplexing_into_doc),
+	{ "copy", Duplex_copy, METH_NOARGS, Sponge_copy_doc},
+	{ "to_bytes", Sponge_to_bytes, METH_NOARGS, Sponge_to_bytes_doc },
+	{ "from_bytes", Duplex_from_bytes, METH_VARARGS | METH_CLASS, Sponge_from_bytes_doc },
+	{ "__reduce__", Sponge_reduce, METH_NOARGS, NULL },
+	{ "__setstate__", Sponge_setstate, METH_VARARGS, NULL },
+	{ "reset", Sponge_reset, METH_NOARGS, Sponge_reset_doc },
+	{ NULL }
+};
+
+static PyGetSetDef Duplex_getters[] = {
+	/* name, get, set, doc, closure */
+	{ "name", Sponge_get_name, NULL, "Sponge name", NULL },
+	{ "rate", Sponge_get_rate, NULL, "Sponge rate in bits", NULL },
+	{ "capacity", Sponge_get_capacity, NULL, "Sponge capacity in bits", NULL },
+	{ "rounds", Sponge_get_rounds, NULL, "Number of rounds in permutation", NULL },
+	{ "rbytes", Sponge_get_rbytes, NULL, "Rate in bytes, limit for input+padding and output", NULL },
+	{ NULL }
+};
+
+static PyTypeObject DuplexType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	SPONGE_PACKAGE "." SPONGE_MODULE "." DUPLEX_CLASS,	/* tp_name */
+	sizeof(SpongeObject),	/* tp_size */
+	0,			/* tp_itemsize */
+	Sponge_dealloc,	/* tp_dealloc */
+	0,			/* tp_print */
+	0,			/* tp_getattr */
+	0,			/* tp_setattr */
+	0,			/* tp_reserved */
+	0,			/* tp_repr */
+	0,			/* tp_as_number */
+	0,			/* tp_as_sequence */
+	0,			/* tp_as_mapping */
+	PyObject_HashNotImplemented, /* tp_hash */
+	0,			/* tp_call */
+	0,			/* tp_str */
+	0,			/* tp_getattro */
+	0,			/* tp_setattro */
+	0,			/* tp_as_buffer */
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,	/* tp_flags */
+	Duplex_doc,		/* tp_doc */
+	0,			/* tp_traverse */
+	0,			/* tp_clear */
+	0,			/* tp_richcompare */
+	0,			/* tp_weaklistoffset */
+	0,			/* tp_iter */
+	0,			/* tp_iternext */
+	Duplex_methods,	/* tp_methods */
+	NULL,			/* tp_members */
+	Duplex_getters,	/* tp_getset */
+	0,			/* tp_base */
+	0,			/* tp_dict */
+	0,			/* tp_descr_get */
+	0,			/* tp_descr_set */
+	0,			/* tp_dictoffset */
+	Sponge_init,	/* tp_init */
+	PyType_GenericAlloc,	/* tp_alloc */
+	PyType_GenericNew,	/* tp_new */
+	PyObject_Del,		/* tp_free */
+};
+
+/*
+ * STROBE protocol object.
+ *
+ * Each operation is one call into strobe_operate(), which runs
+ * the framing and padding state machine in C.
+ */
+
+#define STROBE_CLASS		"Strobe"
+#define STROBE_STATE_VERSION	1
+#define STROBE_STATE_HDR	5
+
+typedef struct {
+	PyObject_HEAD
+	struct StrobeContext st;
+	PyThread_type_lock lock;
+} StrobeObject;
+
+static PyTypeObject StrobeType;
+
+static const char Strobe_doc[] =
+STROBE_CLASS "(proto) - STROBE v1.0.2 protocol state, 128-bit security.\n"
+"\n"
+"Protocol name is added with meta-AD.  Operations take data or\n"
+"length and optional 'more' flag, which continues previous operation.";
+
+/* exception class is defined in Python code */
+static PyObject *AuthenticationFailed;
+
+static void set_auth_failed(void)
+{
+	PyObject *mod;
+
+	if (!AuthenticationFailed) {
+		mod = PyImport_ImportModule(SPONGE_PACKAGE ".strobe");
+		if (!mod)
+			return;
+		AuthenticationFailed = PyObject_GetAttrString(mod, "AuthenticationFailed");
+		Py_DECREF(mod);
+		if (!AuthenticationFailed)
+			return;
+	}
+	PyErr_SetString(AuthenticationFailed, "MAC check failed");
+}
+
+static int Strobe_init(PyObject *obj, PyObject *args, PyObject *kws)
+{
+	StrobeObject *self = (StrobeObject *)obj;
+	static char *kwlist[] = { "proto", NULL };
+	PyObject *proto;
+	Py_buffer buf;
+
+	if (!PyArg_ParseTupleAndKeywords(args, kws, "O", kwlist, &proto))
+		return -1;
+	if (!get_buffer(proto, &buf))
+		return -1;
+
+	ENTER_SPONGE(self);
+	strobe_init(&self->st, buf.buf, buf.len);
+	LEAVE_SPONGE(self);
+
+	PyBuffer_Release(&buf);
+	return 0;
+}
+
+static void Strobe_dealloc(PyObject *obj)
+{
+	StrobeObject *self = (StrobeObject *)obj;
+	if (self->lock) {
+		PyThread_free_lock(self->lock);
+		self->lock = NULL;
+	}
+	memset(&self->st, 0, sizeof(self->st));
+	Py_TYPE(obj)->tp_free(obj);
+}
+
+/* run operation, without GIL for large buffers */
+static int run_strobe(StrobeObject *self, unsigned int flags, uint8_t *dst,
+		      const void *src, Py_ssize_t len, int more)
+{
+	int res;
+
+	if (len >= SPONGE_GIL_MINSIZE && !self->lock)
+		self->lock = PyThread_allocate_lock();
+	if (len >= SPONGE_GIL_MINSIZE && self->lock) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, 1);
+		res = strobe_operate(&self->st, flags, dst, src, len, more);
+		PyThread_release_lock(self->lock);
+		Py_END_ALLOW_THREADS
+	} else {
+		ENTER_SPONGE(self);
+		res = strobe_operate(&self->st, flags, dst, src, len, more);
+		LEAVE_SPONGE(self);
+	}
+	return res;
+}
+
+/*
+ * Common code for all operations.  Data argument is buffer
+ * for operations that take input, length for others.
+ */
+static PyObject *strobe_op(PyObject *obj, PyObject *dataobj, PyObject *moreobj,
+			   unsigned int flags)
+{
+	StrobeObject *self = (StrobeObject *)obj;
+	PyObject *res = NULL;
+	Py_buffer buf;
+	Py_ssize_t len;
+	uint8_t *dst = NULL;
+	int more = 0, r;
+
+	if (!check_init(&self->st.k))
+		return NULL;
+	if (moreobj) {
+		more = PyObject_IsTrue(moreobj);
+		if (more < 0)
+			return NULL;
+	}
+
+	buf.buf = NULL;
+	buf.obj = NULL;
+	if (strobe_has_input(flags)) {
+		if (!get_buffer(dataobj, &buf))
+			return NULL;
+		len = buf.len;
+	} else {
+		len = PyNumber_AsSsize_t(dataobj, PyExc_OverflowError);
+		if (len == -1 && PyErr_Occurred())
+			return NULL;
+		if (len < 0) {
+			PyErr_SetString(PyExc_ValueError, "length must not be negative");
+			return NULL;
+		}
+	}
+
+	if (strobe_has_output(flags)) {
+		res = PyBytes_FromStringAndSize(NULL, len);
+		if (!res)
+			goto out;
+		dst = (uint8_t *)PyBytes_AS_STRING(res);
+	}
+
+	r = run_strobe(self, flags, dst, buf.buf, len, more);
+	if (r <= 0) {
+		Py_CLEAR(res);
+		if (r == 0)
+			PyErr_SetString(PyExc_ValueError, "'more' does not continue same operation");
+		else
+			set_auth_failed();
+		goto out;
+	}
+	if (!res) {
+		Py_INCREF(Py_None);
+		res = Py_None;
+	}
+out:
+	if (buf.obj)
+		PyBuffer_Release(&buf);
+	return res;
+}
+
+static const char Strobe_operate_doc[] =
+"operate(flags, data, more=False) - run operation with given flags.\n"
+"\n"
+"Data is bytes for operations that take input, length otherwise.\n"
+"Returns bytes for operations with output, otherwise None.";
+
+static PyObject *Strobe_operate(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	unsigned int flags;
+
+	if (!check_nargs("operate", nargs, 2, 3) || !get_uint(args[0], &flags))
+		return NULL;
+	if (!strobe_valid_flags(flags)) {
+		PyErr_SetString(PyExc_ValueError, "Invalid flags");
+		return NULL;
+	}
+	return strobe_op(obj, args[1], nargs > 2 ? args[2] : NULL, flags);
+}
+FASTCALL_WRAPPER(Strobe_operate)
+
+/* named operation, with metadata variant */
+#define STROBE_OP(func, name, flags, argname, doc) \
+static const char Strobe_ ## func ## _doc[] = name "(" argname ", more=False) - " doc; \
+static PyObject *Strobe_ ## func(PyObject *obj, PyObject *const *args, Py_ssize_t nargs) \
+{ \
+	if (!check_nargs(name, nargs, 1, 2)) \
+		return NULL; \
+	return strobe_op(obj, args[0], nargs > 1 ? args[1] : NULL, flags); \
+} \
+FASTCALL_WRAPPER(Strobe_ ## func) \
+static const char Strobe_meta_ ## func ## _doc[] = "meta_" name "(" argname ", more=False) - " doc \
+	"\n\nMetadata variant, for framing."; \
+static PyObject *Strobe_meta_ ## func(PyObject *obj, PyObject *const *args, Py_ssize_t nargs) \
+{ \
+	if (!check_nargs("meta_" name, nargs, 1, 2)) \
+		return NULL; \
+	return strobe_op(obj, args[0], nargs > 1 ? args[1] : NULL, (flags) | STROBE_M); \
+} \
+FASTCALL_WRAPPER(Strobe_meta_ ## func)
+
+STROBE_OP(ad, "ad", STROBE_AD, "data", "add associated data.")
+STROBE_OP(key, "key", STROBE_KEY, "data", "add key, overwrites state.")
+STROBE_OP(prf, "prf", STROBE_PRF, "nbytes", "return pseudo-random bytes.")
+STROBE_OP(send_clr, "send_clr", STROBE_SEND_CLR, "data", "send cleartext, returns it.")
+STROBE_OP(recv_clr, "recv_clr", STROBE_RECV_CLR, "data", "receive cleartext, returns it.")
+STROBE_OP(send_enc, "send_enc", STROBE_SEND_ENC, "data", "encrypt, returns ciphertext.")
+STROBE_OP(recv_enc, "recv_enc", STROBE_RECV_ENC, "data", "decrypt, returns plaintext.")
+STROBE_OP(send_mac, "send_mac", STROBE_SEND_MAC, "nbytes", "returns MAC.")
+STROBE_OP(recv_mac, "recv_mac", STROBE_RECV_MAC, "data",
+	  "check MAC, raises spongeshaker.strobe.AuthenticationFailed if invalid.")
+STROBE_OP(ratchet, "ratchet", STROBE_RATCHET, "nbytes", "clear state to prevent rollback.")
+
+static const char Strobe_copy_doc[] =
+"copy() - Copy current state to new object.";
+
+static PyObject *Strobe_copy(PyObject *obj, PyObject *args)
+{
+	StrobeObject *self = (StrobeObject *)obj;
+	StrobeObject *res;
+
+	res = (StrobeObject *)Py_TYPE(obj)->tp_alloc(Py_TYPE(obj), 0);
+	if (!res)
+		return NULL;
+	res->lock = NULL;
+
+	ENTER_SPONGE(self);
+	memcpy(&res->st, &self->st, sizeof(res->st));
+	LEAVE_SPONGE(self);
+
+	return (PyObject *)res;
+}
+
+/*
+ * Serialized state:
+ *
+ *   version   - 1 byte
+ *   pos       - 1 byte
+ *   pos_begin - 1 byte
+ *   i0        - 1 byte, 0, 1 or 2 if role is not known yet
+ *   cur_flags - 1 byte
+ *   state     - 200 bytes, lanes in little-endian
+ */
+
+static const char Strobe_to_bytes_doc[] =
+"to_bytes() - Export current state as bytes.\n"
+"\n"
+"Result contains keyed state, so it must be kept secret.";
+
+static PyObject *Strobe_to_bytes(PyObject *obj, PyObject *args)
+{
+	StrobeObject *self = (StrobeObject *)obj;
+	PyObject *res;
+	uint8_t *p;
+
+	res = PyBytes_FromStringAndSize(NULL, STROBE_STATE_HDR + 200);
+	if (!res)
+		return NULL;
+	p = (uint8_t *)PyBytes_AsString(res);
+
+	ENTER_SPONGE(self);
+	p[0] = STROBE_STATE_VERSION;
+	p[1] = self->st.k.pos;
+	p[2] = self->st.pos_begin;
+	p[3] = self->st.i0;
+	p[4] = self->st.cur_flags;
+	keccak_export_state(&self->st.k, p + STROBE_STATE_HDR);
+	LEAVE_SPONGE(self);
+
+	return res;
+}
+
+static const char Strobe_from_bytes_doc[] =
+"from_bytes(data) - Create new object from to_bytes() result.";
+
+static PyObject *Strobe_from_bytes(PyObject *cls, PyObject *args)
+{
+	PyObject *dataobj;
+	StrobeObject *res = NULL;
+	const uint8_t *p;
+	Py_buffer buf;
+
+	if (!PyArg_ParseTuple(args, "O", &dataobj))
+		return NULL;
+	if (!PyType_Check(cls) || !PyType_IsSubtype((PyTypeObject *)cls, &StrobeType)) {
+		PyErr_SetString(PyExc_TypeError, "from_bytes: class does not create Strobe");
+		return NULL;
+	}
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+
+	p = buf.buf;
+	if (buf.len != STROBE_STATE_HDR + 200 || p[0] != STROBE_STATE_VERSION
+	    || p[1] >= STROBE_R || p[2] > STROBE_R || p[3] > STROBE_ROLE_NONE) {
+		PyErr_SetString(PyExc_ValueError, "Invalid Strobe state");
+		goto out;
+	}
+
+	res = (StrobeObject *)((PyTypeObject *)cls)->tp_alloc((PyTypeObject *)cls, 0);
+	if (!res)
+		goto out;
+	res->lock = NULL;
+	keccak_init(&res->st.k, 1600 - (STROBE_R + 2) * 8);
+	keccak_import_state(&res->st.k, p + STROBE_STATE_HDR);
+	res->st.k.pos = p[1];
+	res->st.pos_begin = p[2];
+	res->st.i0 = p[3];
+	res->st.cur_flags = p[4];
+out:
+	PyBuffer_Release(&buf);
+	return (PyObject *)res;
+}
+
+static PyObject *Strobe_reduce(PyObject *obj, PyObject *args)
+{
+	PyObject *state, *func;
+
+	func = PyObject_GetAttrString((PyObject *)Py_TYPE(obj), "from_bytes");
+	if (!func)
+		return NULL;
+	state = Strobe_to_bytes(obj, NULL);
+	if (!state) {
+		Py_DECREF(func);
+		return NULL;
+	}
+	return Py_BuildValue("N(N)", func, state);
+}
+
+#define STROBE_METHOD(func) \
+	FASTCALL_ENTRY(#func, Strobe_ ## func, Strobe_ ## func ## _doc), \
+	FASTCALL_ENTRY("meta_" #func, Strobe_meta_ ## func, Strobe_meta_ ## func ## _doc)
+
+static PyMethodDef Strobe_methods[] = {
+	STROBE_METHOD(ad),
+	STROBE_METHOD(key),
+	STROBE_METHOD(prf),
+	STROBE_METHOD(send_clr),
+	STROBE_METHOD(recv_clr),
+	STROBE_METHOD(send_enc),
+	STROBE_METHOD(recv_enc),
+	STROBE_METHOD(send_mac),
+	STROBE_METHOD(recv_mac),
+	STROBE_METHOD(ratchet),
+	FASTCALL_ENTRY("operate", Strobe_operate, Strobe_operate_doc),
+	{ "copy", Strobe_copy, METH_NOARGS, Strobe_copy_doc },
+	{ "to_bytes", Strobe_to_bytes, METH_NOARGS, Strobe_to_bytes_doc },
+	{ "from_bytes", Strobe_from_bytes, METH_VARARGS | METH_CLASS, Strobe_from_bytes_doc },
+	{ "__reduce__", Strobe_reduce, METH_NOARGS, NULL },
+	{ NULL }
+};
+
+static PyTypeObject StrobeType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	SPONGE_PACKAGE "." SPONGE_MODULE "." STROBE_CLASS,	/* tp_name */
+	sizeof(StrobeObject),	/* tp_size */
+	0,			/* tp_itemsize */
+	Strobe_dealloc,	/* tp_dealloc */
+	0,			/* tp_print */
+	0,			/* tp_getattr */
+	0,			/* tp_setattr */
+	0,			/* tp_reserved */
+	0,			/* tp_repr */
+	0,			/* tp_as_number */
+	0,			/* tp_as_sequence */
+	0,			/* tp_as_mapping */
+	PyObject_HashNotImplemented, /* tp_hash */
+	0,			/* tp_call */
+	0,			/* tp_str */
+	0,			/* tp_getattro */
+	0,			/* tp_setattro */
+	0,			/* tp_as_buffer */
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,	/* tp_flags */
+	Strobe_doc,		/* tp_doc */
+	0,			/* tp_traverse */
+	0,			/* tp_clear */
+	0,			/* tp_richcompare */
+	0,			/* tp_weaklistoffset */
+	0,			/* tp_iter */
+	0,			/* tp_iternext */
+	Strobe_methods,	/* tp_methods */
+	NULL,			/* tp_members */
+	NULL,			/* tp_getset */
+	0,			/* tp_base */
+	0,			/* tp_dict */
+	0,			/* tp_descr_get */
+	0,			/* tp_descr_set */
+	0,			/* tp_dictoffset */
+	Strobe_init,	/* tp_init */
+	PyType_GenericAlloc,	/* tp_alloc */
+	PyType_GenericNew,	/* tp_new */
+	PyObject_Del,		/* tp_free */
+};
+
+/*
+ * Hash object with hashlib API.
+ *
+ * Same interface as spongeshaker.hashing.SpongeHash, but all
+ * methods are in C, so there is no Python-level call
+ * between user and Keccak code.
+ */
+
+#define HASH_CLASS	"Sha3Hash"
+#define HASH_MAXPAD	16
+
+typedef struct {
+	SpongeObject sponge;	/* must be first, sponge helpers work on it */
+	PyObject *name;
+	Py_ssize_t digest_size;
+	uint8_t pad[HASH_MAXPAD];
+	uint8_t padlen;
+	bool extracting;
+} HashObject;
+
+static PyTypeObject HashType;
+
+static const char Hash_doc[] =
+HASH_CLASS "(capacity, output_bits, data=None, name=None, padding=b'\\x06', rounds=24)"
+" - hashlib-compatible hash object.\n"
+"\n"
+"Padding is given as for KeccakSponge.pad(), default is SHA3 padding.\n"
+"Methods are same as in spongeshaker.hashing.SpongeHash.";
+
+/* exception class is defined in Python code */
+static PyObject *InvalidStateError;
+
+static void set_invalid_state(void)
+{
+	PyObject *mod;
+
+	if (!InvalidStateError) {
+		mod = PyImport_ImportModule(SPONGE_PACKAGE ".hashing");
+		if (!mod)
+			return;
+		InvalidStateError = PyObject_GetAttrString(mod, "SpongeHashInvalidState");
+		Py_DECREF(mod);
+		if (!InvalidStateError)
+			return;
+	}
+	PyErr_SetNone(InvalidStateError);
+}
+
+static bool set_padding(HashObject *self, const void *pad, Py_ssize_t len)
+{
+	if (len > HASH_MAXPAD) {
+		PyErr_SetString(PyExc_ValueError, "padding too long");
+		return false;
+	}
+	memcpy(self->pad, pad, len);
+	self->padlen = len;
+	return true;
+}
+
+static void set_name(HashObject *self, PyObject *name)
+{
+	PyObject *old = self->name;
+
+	Py_INCREF(name);
+	self->name = name;
+	Py_XDECREF(old);
+}
+
+/* initialize object from constructor arguments */
+static int hash_setup(HashObject *self, unsigned int cap, unsigned int outbits,
+		      PyObject *data, PyObject *name, PyObject *padobj, unsigned int rounds)
+{
+	Py_buffer buf;
+	bool ok;
+
+	if (outbits % 8 != 0) {
+		PyErr_SetString(PyExc_ValueError, "output_bits must be multiple of 8");
+		return -1;
+	}
+	if (keccak_init_rounds(&self->sponge.md, cap, rounds) != 1) {
+		PyErr_SetString(PyExc_ValueError, "Invalid capacity or rounds");
+		return -1;
+	}
+	self->digest_size = outbits / 8;
+	self->extracting = false;
+
+	if (padobj && padobj != Py_None) {
+		if (!get_buffer(padobj, &buf))
+			return -1;
+		ok = set_padding(self, buf.buf, buf.len);
+		PyBuffer_Release(&buf);
+		if (!ok)
+			return -1;
+	} else {
+		set_padding(self, "\x06", 1);
+	}
+
+	if (name == Py_None) {
+		name = PyString_FromString(SPONGE_NAME);
+		if (!name)
+			return -1;
+		set_name(self, name);
+		Py_DECREF(name);
+	} else {
+		set_name(self, name);
+	}
+
+	if (data != Py_None) {
+		if (!get_buffer(data, &buf))
+			return -1;
+		sponge_absorb(&self->sponge, buf.buf, buf.len);
+		PyBuffer_Release(&buf);
+	}
+	return 0;
+}
+
+/* name and padding are valid even if __init__ is not run */
+static PyObject *Hash_new(PyTypeObject *type, PyObject *args, PyObject *kws)
+{
+	HashObject *self;
+
+	self = (HashObject *)type->tp_alloc(type, 0);
+	if (!self)
+		return NULL;
+	self->name = PyString_FromString(SPONGE_NAME);
+	if (!self->name) {
+		Py_DECREF(self);
+		return NULL;
+	}
+	set_padding(self, "\x06", 1);
+	return (PyObject *)self;
+}
+
+static int Hash_init(PyObject *obj, PyObject *args, PyObject *kws)
+{
+	unsigned int cap, outbits, rounds = 24;
+	PyObject *data = Py_None, *name = Py_None, *padobj = NULL;
+	static char *kwlist[] = { "capacity", "output_bits", "data", "name", "padding", "rounds", NULL };
+
+	if (!PyArg_ParseTupleAndKeywords(args, kws, "II|OOOI", kwlist,
+					 &cap, &outbits, &data, &name, &padobj, &rounds))
+		return -1;
+	return hash_setup((HashObject *)obj, cap, outbits, data, name, padobj, rounds);
+}
+
+#ifdef HAVE_VECTORCALL
+static PyObject *Hash_vectorcall(PyObject *type, PyObject *const *args, size_t nargsf, PyObject *kwnames)
+{
+	Py_ssize_t nargs = PyVectorcall_NARGS(nargsf);
+	unsigned int cap, outbits, rounds = 24;
+	PyObject *res;
+
+	if (kwnames || type != (PyObject *)&HashType)
+		return vectorcall_slow(type, args, nargs, kwnames);
+
+	if (!check_nargs(HASH_CLASS, nargs, 2, 6) || !get_uint(args[0], &cap) || !get_uint(args[1], &outbits))
+		return NULL;
+	if (nargs > 5 && !get_uint(args[5], &rounds))
+		return NULL;
+
+	res = PyType_GenericAlloc(&HashType, 0);
+	if (!res)
+		return NULL;
+	if (hash_setup((HashObject *)res, cap, outbits,
+		       nargs > 2 ? args[2] : Py_None,
+		       nargs > 3 ? args[3] : Py_None,
+		       nargs > 4 ? args[4] : NULL, rounds) < 0)
+		Py_CLEAR(res);
+	return res;
+}
+#endif
+
+static void Hash_dealloc(PyObject *obj)
+{
+	HashObject *self = (HashObject *)obj;
+
+	if (self->sponge.lock) {
+		PyThread_free_lock(self->sponge.lock);
+		self->sponge.lock = NULL;
+	}
+	memset(&self->sponge.md, 0, sizeof(self->sponge.md));
+	Py_CLEAR(self->name);
+	Py_TYPE(obj)->tp_free(obj);
+}
+
+static const char Hash_update_doc[] =
+"update(data) - Update state with data.\n"
+"\n"
+"Cannot be used after extract() is called.";
+
+static PyObject *Hash_update(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	HashObject *self = (HashObject *)obj;
+	Py_buffer buf;
+
+	if (!check_nargs("update", nargs, 1, 1) || !check_init(&self->sponge.md))
+		return NULL;
+	if (self->extracting) {
+		set_invalid_state();
+		return NULL;
+	}
+	if (!get_buffer(args[0], &buf))
+		return NULL;
+
+	sponge_absorb(&self->sponge, buf.buf, buf.len);
+
+	PyBuffer_Release(&buf);
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+FASTCALL_WRAPPER(Hash_update)
+
+/* pad and squeeze copy of state into dst */
+static bool hash_final(HashObject *self, uint8_t *dst)
+{
+	struct KeccakContext tmp;
+
+	if (!check_init(&self->sponge.md))
+		return false;
+	if (self->extracting) {
+		set_invalid_state();
+		return false;
+	}
+
+	ENTER_SPONGE(&self->sponge);
+	tmp = self->sponge.md;
+	LEAVE_SPONGE(&self->sponge);
+
+	keccak_pad(&tmp, self->pad, self->padlen);
+	keccak_squeeze(&tmp, dst, self->digest_size);
+	memset(&tmp, 0, sizeof(tmp));
+	return true;
+}
+
+static const char Hash_digest_doc[] =
+"digest() - Return final hash digest.\n"
+"\n"
+"State is not changed, so update() can be called again.";
+
+static PyObject *Hash_digest(PyObject *obj, PyObject *args)
+{
+	HashObject *self = (HashObject *)obj;
+	PyObject *res;
+
+	res = PyBytes_FromStringAndSize(NULL, self->digest_size);
+	if (!res)
+		return NULL;
+	if (!hash_final(self, (uint8_t *)PyBytes_AS_STRING(res)))
+		Py_CLEAR(res);
+	return res;
+}
+
+static const char Hash_hexdigest_doc[] =
+"hexdigest() - Return digest() value as hexadecimal string.";
+
+static PyObject *Hash_hexdigest(PyObject *obj, PyObject *args)
+{
+	static const char hextbl[] = "0123456789abcdef";
+	HashObject *self = (HashObject *)obj;
+	Py_ssize_t i, n = self->digest_size;
+	PyObject *res = NULL;
+	uint8_t *raw;
+	char *hex;
+
+	raw = PyMem_Malloc(n * 3 + 1);
+	if (!raw)
+		return PyErr_NoMemory();
+	hex = (char *)raw + n;
+
+	if (hash_final(self, raw)) {
+		for (i = 0; i < n; i++) {
+			hex[i * 2] = hextbl[raw[i] >> 4];
+			hex[i * 2 + 1] = hextbl[raw[i] & 15];
+		}
+		res = PyString_FromStringAndSize(hex, n * 2);
+	}
+
+	memset(raw, 0, n);
+	PyMem_Free(raw);
+	return res;
+}
+
+static const char Hash_extract_doc[] =
+"extract(count) - Extract data from hash state.\n"
+"\n"
+"Can be called repeatedly to get unlimited stream of bytes.\n"
+"After it, update() and digest() will throw error.";
+
+static PyObject *Hash_extract(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	HashObject *self = (HashObject *)obj;
+	unsigned int count;
+	PyObject *res;
+
+	if (!check_nargs("extract", nargs, 1, 1) || !check_init(&self->sponge.md) || !get_uint(args[0], &count))
+		return NULL;
+
+	res = PyBytes_FromStringAndSize(NULL, count);
+	if (!res)
+		return NULL;
+
+	if (!self->extracting) {
+		ENTER_SPONGE(&self->sponge);
+		keccak_pad(&self->sponge.md, self->pad, self->padlen);
+		LEAVE_SPONGE(&self->sponge);
+		self->extracting = true;
+	}
+	sponge_squeeze(&self->sponge, (uint8_t *)PyBytes_AS_STRING(res), count);
+	return res;
+}
+FASTCALL_WRAPPER(Hash_extract)
+
+static const char Hash_copy_doc[] =
+"copy() - Create copy of current state.";
+
+static PyObject *Hash_copy(PyObject *obj, PyObject *args)
+{
+	HashObject *self = (HashObject *)obj;
+	HashObject *res;
+
+	res = (HashObject *)Py_TYPE(obj)->tp_alloc(Py_TYPE(obj), 0);
+	if (!res)
+		return NULL;
+
+	ENTER_SPONGE(&self->sponge);
+	res->sponge.md = self->sponge.md;
+	LEAVE_SPONGE(&self->sponge);
+
+	set_name(res, self->name);
+	res->digest_size = self->digest_size;
+	memcpy(res->pad, self->pad, self->padlen);
+	res->padlen = self->padlen;
+	res->extracting = self->extracting;
+	return (PyObject *)res;
+}
+
+static const char Hash_reset_doc[] =
+"reset() - Clear state, so object can be reused for new message.";
+
+static PyObject *Hash_reset(PyObject *obj, PyObject *args)
+{
+	HashObject *self = (HashObject *)obj;
+
+	ENTER_SPONGE(&self->sponge);
+	keccak_reset(&self->sponge.md);
+	LEAVE_SPONGE(&self->sponge);
+	self->extracting = false;
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static const char Hash_reinit_doc[] =
+"reinit(data=None) - Reset state and start new message with data.";
+
+static PyObject *Hash_reinit(PyObject *obj, PyObject *const *args, Py_ssize_t nargs)
+{
+	HashObject *self = (HashObject *)obj;
+	bool have_data;
+	Py_buffer buf;
+
+	if (!check_nargs("reinit", nargs, 0, 1))
+		return NULL;
+	have_data = nargs > 0 && args[0] != Py_None;
+	if (have_data && !get_buffer(args[0], &buf))
+		return NULL;
+
+	ENTER_SPONGE(&self->sponge);
+	keccak_reset(&self->sponge.md);
+	LEAVE_SPONGE(&self->sponge);
+	self->extracting = false;
+
+	if (have_data) {
+		sponge_absorb(&self->sponge, buf.buf, buf.len);
+		PyBuffer_Release(&buf);
+	}
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+FASTCALL_WRAPPER(Hash_reinit)
+
+static const char Hash_update_from_file_doc[] =
+"update_from_file(f, bufsize=FILE_BUFSIZE) - Update state with data from binary file.\n"
+"\n"
+"See spongeshaker.hashing.SpongeHash.update_from_file().";
+
+static PyObject *Hash_update_from_file(PyObject *obj, PyObject *args, PyObject *kws)
+{
+	HashObject *self = (HashObject *)obj;
+	PyObject *mod, *func, *fargs, *res = NULL;
+	Py_ssize_t i, n;
+
+	if (self->extracting) {
+		set_invalid_state();
+		return NULL;
+	}
+
+	/* file handling is shared with SpongeHash */
+	mod = PyImport_ImportModule(SPONGE_PACKAGE ".hashing");
+	if (!mod)
+		return NULL;
+	func = PyObject_GetAttrString(mod, "_update_from_file");
+	Py_DECREF(mod);
+	if (!func)
+		return NULL;
+
+	n = PyTuple_GET_SIZE(args);
+	fargs = PyTuple_New(n + 1);
+	if (fargs) {
+		Py_INCREF(obj);
+		PyTuple_SET_ITEM(fargs, 0, obj);
+		for (i = 0; i < n; i++) {
+			Py_INCREF(PyTuple_GET_ITEM(args, i));
+			PyTuple_SET_ITEM(fargs, i + 1, PyTuple_GET_ITEM(args, i));
+		}
+		res = PyObject_Call(func, fargs, kws);
+		Py_DECREF(fargs);
+	}
+	Py_DECREF(func);
+	return res;
+}
+
+/*
+ * Serialized hash state, same as in SpongeHash.to_bytes():
+ *
+ *   version     - 1 byte
+ *   4 fields, each with 2-byte little-endian length prefix:
+ *     sponge    - KeccakSponge.to_bytes() result
+ *     name      - UTF-8
+ *     padding
+ *     extra     - digest_size as 4-byte little-endian, extracting flag as 1 byte
+ */
+
+#define HASH_STATE_VERSION	1
+#define HASH_STATE_FIELDS	4
+#define HASH_EXTRA_SIZE		5
+
+struct HashState {
+	const uint8_t *field[HASH_STATE_FIELDS];
+	Py_ssize_t len[HASH_STATE_FIELDS];
+	unsigned int cap, rounds;
+};
+
+static bool parse_hash_state(const uint8_t *p, Py_ssize_t len, struct HashState *st)
+{
+	Py_ssize_t pos = 1;
+	int i;
+
+	if (len < 1 || p[0] != HASH_STATE_VERSION)
+		goto invalid;
+	for (i = 0; i < HASH_STATE_FIELDS; i++) {
+		if (pos + 2 > len)
+			goto invalid;
+		st->len[i] = p[pos] | (p[pos + 1] << 8);
+		st->field[i] = p + pos + 2;
+		pos += 2 + st->len[i];
+		if (pos > len)
+			goto invalid;
+	}
+	/* prefix after extra is not supported */
+	if (pos != len || st->len[3] != HASH_EXTRA_SIZE || st->len[2] > HASH_MAXPAD)
+		goto invalid;
+	return parse_state(st->field[0], st->len[0], 1600, &st->cap, &st->rounds);
+invalid:
+	PyErr_SetString(PyExc_ValueError, "Invalid state");
+	return false;
+}
+
+static bool load_hash_state(HashObject *self, const struct HashState *st)
+{
+	const uint8_t *x = st->field[3];
+	PyObject *name;
+
+	name = PyUnicode_DecodeUTF8((const char *)st->field[1], st->len[1], NULL);
+	if (!name)
+		return false;
+	set_name(self, name);
+	Py_DECREF(name);
+
+	load_state(&self->sponge, st->field[0]);
+	set_padding(self, st->field[2], st->len[2]);
+	self->digest_size = x[0] | (x[1] << 8) | (x[2] << 16) | ((uint32_t)x[3] << 24);
+	self->extracting = x[4] != 0;
+	return true;
+}
+
+static const char Hash_to_bytes_doc[] =
+"to_bytes() - Export current state as bytes.\n"
+"\n"
+"Format is same as for spongeshaker.hashing.SpongeHash.";
+
+static PyObject *Hash_to_bytes(PyObject *obj, PyObject *args)
+{
+	HashObject *self = (HashObject *)obj;
+	PyObject *sponge, *name, *res = NULL;
+	const void *fdata[HASH_STATE_FIELDS];
+	Py_ssize_t flen[HASH_STATE_FIELDS], total = 1;
+	uint8_t extra[HASH_EXTRA_SIZE], *p;
+	int i;
+
+	if (!check_init(&self->sponge.md))
+		return NULL;
+	sponge = Sponge_to_bytes(obj, NULL);
+	if (!sponge)
+		return NULL;
+#if PY_MAJOR_VERSION >= 3
+	name = PyUnicode_AsUTF8String(self->name);
+#else
+	name = PyObject_Str(self->name);
+#endif
+	if (!name)
+		goto out;
+
+	extra[0] = self->digest_size & 0xFF;
+	extra[1] = (self->digest_size >> 8) & 0xFF;
+	extra[2] = (self->digest_size >> 16) & 0xFF;
+	extra[3] = (self->digest_size >> 24) & 0xFF;
+	extra[4] = self->extracting;
+
+	fdata[0] = PyBytes_AS_STRING(sponge);
+	flen[0] = PyBytes_GET_SIZE(sponge);
+	fdata[1] = PyBytes_AS_STRING(name);
+	flen[1] = PyBytes_GET_SIZE(name);
+	fdata[2] = self->pad;
+	flen[2] = self->padlen;
+	fdata[3] = extra;
+	flen[3] = HASH_EXTRA_SIZE;
+	for (i = 0; i < HASH_STATE_FIELDS; i++) {
+		if (flen[i] > 0xFFFF) {
+			PyErr_SetString(PyExc_ValueError, "Field too long");
+			goto out;
+		}
+		total += 2 + flen[i];
+	}
+
+	res = PyBytes_FromStringAndSize(NULL, total);
+	if (!res)
+		goto out;
+	p = (uint8_t *)PyBytes_AS_STRING(res);
+	*p++ = HASH_STATE_VERSION;
+	for (i = 0; i < HASH_STATE_FIELDS; i++) {
+		*p++ = flen[i] & 0xFF;
+		*p++ = flen[i] >> 8;
+		memcpy(p, fdata[i], flen[i]);
+		p += flen[i];
+	}
+out:
+	Py_DECREF(sponge);
+	Py_XDECREF(name);
+	return res;
+}
+
+static const char Hash_from_bytes_doc[] =
+"from_bytes(data) - Create hash object from to_bytes() result.";
+
+static PyObject *Hash_from_bytes(PyObject *cls, PyObject *args)
+{
+	PyObject *dataobj, *res = NULL;
+	struct HashState st;
+	Py_buffer buf;
+
+	if (!PyArg_ParseTuple(args, "O", &dataobj))
+		return NULL;
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+
+	if (parse_hash_state(buf.buf, buf.len, &st)) {
+		res = PyObject_CallFunction(cls, "IIOOOI", st.cap, 8, Py_None, Py_None, Py_None, st.rounds);
+		if (res && !PyObject_TypeCheck(res, &HashType)) {
+			PyErr_SetString(PyExc_TypeError, "from_bytes: class does not create hash");
+			Py_CLEAR(res);
+		}
+		if (res && !load_hash_state((HashObject *)res, &st))
+			Py_CLEAR(res);
+	}
+
+	PyBuffer_Release(&buf);
+	return res;
+}
+
+static PyObject *Hash_reduce(PyObject *obj, PyObject *args)
+{
+	HashObject *self = (HashObject *)obj;
+	PyObject *state;
+
+	state = Hash_to_bytes(obj, NULL);
+	if (!state)
+		return NULL;
+	return Py_BuildValue("O(IIOOOI)N", (PyObject *)Py_TYPE(obj),
+			     SPONGE_CAPACITY(self->sponge.md), 8, Py_None, Py_None, Py_None,
+			     self->sponge.md.rounds, state);
+}
+
+static PyObject *Hash_setstate(PyObject *obj, PyObject *args)
+{
+	PyObject *dataobj;
+	struct HashState st;
+	Py_buffer buf;
+	bool ok;
+
+	if (!PyArg_ParseTuple(args, "O", &dataobj))
+		return NULL;
+	if (!get_buffer(dataobj, &buf))
+		return NULL;
+
+	ok = parse_hash_state(buf.buf, buf.len, &st) && load_hash_state((HashObject *)obj, &st);
+
+	PyBuffer_Release(&buf);
+	if (!ok)
+		return NULL;
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static PyObject *Hash_get_name(PyObject *obj, void *xtra)
+{
+	HashObject *self = (HashObject *)obj;
+
+	Py_INCREF(self->name);
+	return self->name;
+}
+
+static PyObject *Hash_get_block_size(PyObject *obj, void *xtra)
+{
+	HashObject *self = (HashObject *)obj;
+	return PyLong_FromLong(self->sponge.md.rbytes);
+}
+
+static PyObject *Hash_get_digest_size(PyObject *obj, void *xtra)
+{
+	HashObject *self = (HashObject *)obj;
+	return PyLong_FromSsize_t(self->digest_size);
+}
+
+static PyMethodDef Hash_methods[] = {
+	FASTCALL_ENTRY("update", Hash_update, Hash_update_doc),
+	{ "digest", Hash_digest, METH_NOARGS, Hash_digest_doc },
+	{ "hexdigest", Hash_hexdigest, METH_NOARGS, Hash_hexdigest_doc },
+	FASTCALL_ENTRY("extract", Hash_extract, Hash_extract_doc),
+	{ "copy", Hash_copy, METH_NOARGS, Hash_copy_doc },
+	{ "reset", Hash_reset, METH_NOARGS, Hash_reset_doc },
+	FASTCALL_ENTRY("reinit", Hash_reinit, Hash_reinit_doc),
+	{ "update_from_file", (PyCFunction)Hash_update_from_file, METH_VARARGS | METH_KEYWORDS,
+	  Hash_update_from_file_doc },
+	{ "to_bytes", Hash_to_bytes, METH_NOARGS, Hash_to_bytes_doc },
+	{ "from_bytes", Hash_from_bytes, METH_VARARGS | METH_CLASS, Hash_from_bytes_doc },
+	{ "__reduce__", Hash_reduce, METH_NOARGS, NULL },
+	{ "__setstate__", Hash_setstate, METH_VARARGS, NULL },
+	{ NULL }
+};
+
+static PyGetSetDef Hash_getters[] = {
+	/* name, get, set, doc, closure */
+	{ "name", Hash_get_name, NULL, "Hash name", NULL },
+	{ "block_size", Hash_get_block_size, NULL, "Block size in bytes", NULL },
+	{ "digest_size", Hash_get_digest_size, NULL, "Digest size in bytes", NULL },
+	{ NULL }
+};
+
+static PyTypeObject HashType = {
+	PyVarObject_HEAD_INIT(NULL, 0)
+	SPONGE_PACKAGE "." SPONGE_MODULE "." HASH_CLASS,	/* tp_name */
+	sizeof(HashObject),	/* tp_size */
+	0,			/* tp_itemsize */
+	Hash_dealloc,		/* tp_dealloc */
+	0,			/* tp_print */
+	0,			/* tp_getattr */
+	0,			/* tp_setattr */
+	0,			/* tp_reserved */
+	0,			/* tp_repr */
+	0,			/* tp_as_number */
+	0,			/* tp_as_sequence */
+	0,			/* tp_as_mapping */
+	PyObject_HashNotImplemented, /* tp_hash */
+	0,			/* tp_call */
+	0,			/* tp_str */
+	0,			/* tp_getattro */
+	0,			/* tp_setattro */
+	0,			/* tp_as_buffer */
+	Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,	/* tp_flags */
+	Hash_doc,		/* tp_doc */
+	0,			/* tp_traverse */
+	0,			/* tp_clear */
+	0,			/* tp_richcompare */
+	0,			/* tp_weaklistoffset */
+	0,			/* tp_iter */
+	0,			/* tp_iternext */
+	Hash_methods,		/* tp_methods */
+	NULL,			/* tp_members */
+	Hash_getters,		/* tp_getset */
+	0,			/* tp_base */
+	0,			/* tp_dict */
+	0,			/* tp_descr_get */
+	0,			/* tp_descr_set */
+	0,			/* tp_dictoffset */
+	Hash_init,		/* tp_init */
+	PyType_GenericAlloc,	/* tp_alloc */
+	Hash_new,		/* tp_new */
+	PyObject_Del,		/* tp_free */
+};
+
+/*
+ * Module functions
+ */
+
+/*
+ * Parse offsets for hash_many().
+ *
+ * Integer arrays with buffer interface are read directly,
+ * anything else is taken as sequence of integers.
+ */
+static Py_ssize_t *get_offsets(PyObject *obj, Py_ssize_t *count_p)
+{
+	Py_ssize_t *res, count, i;
+	PyObject *seq;
+	Py_buffer buf;
+	const char *fmt;
+
+	if (PyObject_CheckBuffer(obj) && PyObject_GetBuffer(obj, &buf, PyBUF_FORMAT | PyBUF_ND) == 0) {
+		fmt = buf.format ? buf.format : "B";
+		if (*fmt == '@' || *fmt == '=')
+			fmt++;
+		if (fmt[0] == 0 || fmt[1] != 0 || strchr("bBhHiIlLqQnN", fmt[0]) == NULL) {
+			PyBuffer_Release(&buf);
+			PyErr_SetString(PyExc_TypeError, "offsets must contain integers");
+			return NULL;
+		}
+		count = buf.len / buf.itemsize;
+		res = PyMem_Malloc((count + 1) * sizeof(Py_ssize_t));
+		if (!res) {
+			PyBuffer_Release(&buf);
+			PyErr_NoMemory();
+			return NULL;
+		}
+		for (i = 0; i < count; i++) {
+			const char *p = (const char *)buf.buf + i * buf.itemsize;
+			bool is_signed = (fmt[0] >= 'a');
+			switch (buf.itemsize) {
+			case 1: res[i] = is_signed ? *(int8_t *)p : *(uint8_t *)p; break;
+			case 2: res[i] = is_signed ? *(int16_t *)p : *(uint16_t *)p; break;
+			case 4: res[i] = is_signed ? *(int32_t *)p : (Py_ssize_t)*(uint32_t *)p; break;
+			default: res[i] = is_signed ? (Py_ssize_t)*(int64_t *)p : (Py_ssize_t)*(uint64_t *)p; break;
+			}
+		}
+		PyBuffer_Release(&buf);
+		*count_p = count;
+		return res;
+	}
+	PyErr_Clear();
+
+	seq = PySequence_Fast(obj, "offsets must be sequence of integers");
+	if (!seq)
+		return NULL;
+	count = PySequence_Fast_GET_SIZE(seq);
+	res = PyMem_Malloc((count + 1) * sizeof(Py_ssize_t));
+	if (!res) {
+		Py_DECREF(seq);
+		PyErr_NoMemory();
+		return NULL;
+	}
+	for (i = 0; i < count; i++) {
+		res[i] = PyNumber_AsSsize_t(PySequence_Fast_GET_ITEM(seq, i), PyExc_OverflowError);
+		if (res[i] == -1 && PyErr_Occurred()) {
+			Py_DECREF(seq);
+			PyMem_Free(res);
+			return NULL;
+		}
+	}
+	Py_DECREF(seq);
+	*count_p = count;
+	return res;
+}
+
+static const char mod_hash_many_doc[] =
+"hash_many(capacity, padding, nbytes, messages, offsets=None, rounds=24) - hash list of messages.\n"
+"\n"
+"Each message is absorbed into fresh state with given capacity,\n"
+"padded with padding and nbytes are extracted from it.  Results are\n"
+"returned concatenated into one bytes object.\n"
+"\n"
+"Messages can be given as sequence of objects supporting buffer interface,\n"
+"or as single buffer plus offsets, which must contain N+1 increasing\n"
+"positions for N messages, message i being messages[offsets[i]:offsets[i+1]].\n"
+"\n"
+"Optional rounds selects reduced-round Keccak-p permutation.\n"
+"\n"
+"Messages are processed several at a time with SIMD instructions,\n"
+"batch_backend shows which implementation is used.";
+
+static PyObject *mod_hash_many(PyObject *mod, PyObject *args, PyObject *kws)
+{
+	unsigned int cap, rounds = 24;
+	Py_ssize_t nbytes, count = 0, nbufs = 0, i;
+	PyObject *padobj, *seqobj, *offsobj = Py_None;
+	PyObject *seq = NULL, *res = NULL;
+	Py_buffer pad, *bufs = NULL;
+	Py_ssize_t *offsets = NULL;
+	const uint8_t **msgs = NULL;
+	size_t *lens = NULL;
+	uint8_t *resdata;
+	int rc;
+	static char *kwlist[] = { "capacity", "padding", "nbytes", "messages", "offsets", "rounds", NULL };
+
+	if (!PyArg_ParseTupleAndKeywords(args, kws, "IOnO|OI", kwlist,
+					 &cap, &padobj, &nbytes, &seqobj, &offsobj, &rounds))
+		return NULL;
+	if (nbytes < 0) {
+		PyErr_SetString(PyExc_ValueError, "nbytes must not be negative");
+		return NULL;
+	}
+	if (!get_buffer(padobj, &pad))
+		return NULL;
+
+	if (offsobj == Py_None) {
+		/* sequence of buffers */
+		seq = PySequence_Fast(seqobj, "messages must be sequence");
+		if (!seq)
+			goto out;
+		count = PySequence_Fast_GET_SIZE(seq);
+		bufs = PyMem_Malloc((count + 1) * sizeof(Py_buffer));
+	} else {
+		/* one buffer with offsets */
+		offsets = get_offsets(offsobj, &count);
+		if (!offsets)
+			goto out;
+		if (count < 1) {
+			PyErr_SetString(PyExc_ValueError, "offsets must have at least one element");
+			goto out;
+		}
+		count--;
+		bufs = PyMem_Malloc(sizeof(Py_buffer));
+	}
+	if (nbytes > 0 && count > PY_SSIZE_T_MAX / nbytes) {
+		PyErr_NoMemory();
+		goto out;
+	}
+
+	msgs = PyMem_Malloc((count + 1) * sizeof(uint8_t *));
+	lens = PyMem_Malloc((count + 1) * sizeof(size_t));
+	if (!bufs || !msgs || !lens) {
+		PyErr_NoMemory();
+		goto out;
+	}
+
+	if (offsets) {
+		if (!get_buffer(seqobj, &bufs[0]))
+			goto out;
+		nbufs++;
+		for (i = 0; i < count; i++) {
+			if (offsets[i] < 0 || offsets[i] > offsets[i + 1] || offsets[i + 1] > bufs[0].len) {
+				PyErr_SetString(PyExc_ValueError, "offsets must be increasing and inside buffer");
+				goto out;
+			}
+			msgs[i] = (const uint8_t *)bufs[0].buf + offsets[i];
+			lens[i] = offsets[i + 1] - offsets[i];
+		}
+	} else {
+		for (i = 0; i < count; i++) {
+			if (!get_buffer(PySequence_Fast_GET_ITEM(seq, i), &bufs[i]))
+				goto out;
+			nbufs++;
+			msgs[i] = bufs[i].buf;
+			lens[i] = bufs[i].len;
+		}
+	}
+
+	res = PyBytes_FromStringAndSize(NULL, count * nbytes);
+	if (!res)
+		goto out;
+	resdata = (uint8_t *)PyBytes_AS_STRING(res);
+
+	Py_BEGIN_ALLOW_THREADS
+	rc = keccak_hash_many(cap, rounds, pad.buf, pad.len, msgs, lens, count, resdata, nbytes);
+	Py_END_ALLOW_THREADS
+
+	if (rc == 0) {
+		PyErr_SetString(PyExc_ValueError, "Invalid capacity or rounds");
+		Py_CLEAR(res);
+	} else if (rc < 0) {
+		PyErr_NoMemory();
+		Py_CLEAR(res);
+	}
+out:
+	for (i = 0; i < nbufs; i++)
+		PyBuffer_Release(&bufs[i]);
+	PyMem_Free(bufs);
+	PyMem_Free(msgs);
+	PyMem_Free(lens);
+	PyMem_Free(offsets);
+	Py_XDECREF(seq);
+	PyBuffer_Release(&pad);
+	return res;
+}
+
+static PyMethodDef mod_methods[] = {
+	{ "hash_many", (PyCFunction)mod_hash_many, METH_VARARGS | METH_KEYWORDS, mod_hash_many_doc },
+	{ NULL }
+};
+
+/*
+ * Module initialization
+ */
+
+/* set up type for smaller width */
+static bool add_small_type(PyObject *mod, PyTypeObject *type, const char *name)
+{
+	Py_SET_TYPE(type, &PyType_Type);
+	type->tp_base = &SpongeType;
+#ifdef HAVE_VECTORCALL
+	type->tp_vectorcall = Sponge_vectorcall;
+#endif
+	if (PyType_Ready(type) != 0)
+		return false;
+	Py_INCREF((PyObject *)type);
+	return PyModule_AddObject(mod, name, (PyObject *)type) == 0;
+}
+
+/*
+ * Pick Keccak-f1600 implementation, SPONGESHAKER_KECCAK_BACKEND
+ * environment variable can override automatic choice.
+ */
+static bool select_backend(void)
+{
+	const char *name = getenv("SPONGESHAKER_KECCAK_BACKEND");
+	char msg[128];
+
+	if (name && *name && strcmp(name, "auto") != 0) {
+		if (keccak_set_backend(name))
+			return true;
+		snprintf(msg, sizeof(msg), "Keccak backend '%.40s' not available, using default", name);
+		if (PyErr_WarnEx(PyExc_RuntimeWarning, msg, 1) != 0)
+			return false;
+	}
+	keccak_set_backend(NULL);
+	return true;
+}
+
+/* common module init */
+static PyObject *mod_init(PyObject *mod)
+{
+	PyObject *all;
+
+	if (!select_backend())
+		return NULL;
+
+	Py_SET_TYPE(&SpongeType, &PyType_Type);
+#ifdef HAVE_VECTORCALL
+	SpongeType.tp_vectorcall = Sponge_vectorcall;
+#endif
+	if (PyType_Ready(&SpongeType) != 0)
+		return NULL;
+
+	Py_INCREF((PyObject *)&SpongeType);
+	if (PyModule_AddObject(mod, SPONGE_CLASS, (PyObject *)&SpongeType) != 0)
+		return NULL;
+
+	if (!add_small_type(mod, &Sponge800Type, SPONGE_CLASS "800"))
+		return NULL;
+	if (!add_small_type(mod, &Sponge400Type, SPONGE_CLASS "400"))
+		return NULL;
+	if (!add_small_type(mod, &Sponge200Type, SPONGE_CLASS "200"))
+		return NULL;
+
+	Py_SET_TYPE(&DuplexType, &PyType_Type);
+	if (PyType_Ready(&DuplexType) != 0)
+		return NULL;
+	Py_INCREF((PyObject *)&DuplexType);
+	if (PyModule_AddObject(mod, DUPLEX_CLASS, (PyObject *)&DuplexType) != 0)
+		return NULL;
+
+	Py_SET_TYPE(&StrobeType, &PyType_Type);
+	if (PyType_Ready(&StrobeType) != 0)
+		return NULL;
+	Py_INCREF((PyObject *)&StrobeType);
+	if (PyModule_AddObject(mod, STROBE_CLASS, (PyObject *)&StrobeType) != 0)
+		return NULL;
+
+	Py_SET_TYPE(&HashType, &PyType_Type);
+#ifdef HAVE_VECTORCALL
+	HashType.tp_vectorcall = Hash_vectorcall;
+#endif
+	if (PyType_Ready(&HashType) != 0)
+		return NULL;
+
+	Py_INCREF((PyObject *)&HashType);
+	if (PyModule_AddObject(mod, HASH_CLASS, (PyObject *)&HashType) != 0)
+		return NULL;
+	if (PyModule_AddStringConstant(mod, "batch_backend", keccak_hash_many_backend()) != 0)
+		return NULL;
+	if (PyModule_AddStringConstant(mod, "backend", keccak_get_backend()) != 0)
+		return NULL;
+
+	all = Py_BuildValue("(ssssssss)", SPONGE_CLASS, SPONGE_CLASS "800", SPONGE_CLASS "400",
+			    SPONGE_CLASS "200", DUPLEX_CLASS, STROBE_CLASS, HASH_CLASS, "hash_many");
+	if (all)
+		PyModule_AddObject(mod, "__all__", all);
 
 	return mod;
 }
@@ -504,7 +2983,7 @@ PyMODINIT_FUNC MODINIT2(void)
 {
 	PyObject *m;
 
-	m = Py_InitModule(SPONGE_MODULE, NULL);
+	m = Py_InitModule(SPONGE_MODULE, mod_methods);
 	if (m == NULL)
 		return;
 
@@ -520,7 +2999,7 @@ static struct PyModuleDef modInfo = {
 	SPONGE_MODULE,		/* m_name */
 	mod_doc,		/* m_doc */
 	-1,			/* m_size */
-	NULL,			/* m_methods */
+	mod_methods,		/* m_methods */
 	NULL,			/* m_reload */
 	NULL,			/* m_traverse */
 	NULL,			/* m_clear */
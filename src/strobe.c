@@ -0,0 +1,193 @@
+/*
+ * STROBE protocol framework on Keccak-f1600.
+ *
+ * Copyright (c) 2026 Marko Kreen
+ *
+ * Permission to use, copy, modify, and/or distribute this software for any
+ * purpose with or without fee is hereby granted, provided that the above
+ * copyright notice and this permission notice appear in all copies.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+ * WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+ * MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ * ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+ * WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ * ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+ * OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+ */
+
+/*
+ * Sponge is set up with 256-bit capacity, so rate is 168 bytes:
+ * STROBE block of 166 bytes plus 2 bytes for padding.  Data is
+ * fed in pieces that end at most at STROBE_R, so keccak_* functions
+ * never permute by themselves, permutation happens in run_f().
+ */
+
+#include <string.h>
+
+#include "strobe.h"
+
+/* how data is combined with state */
+enum DuplexMode {
+	DUPLEX_ABSORB,		/* state ^= data */
+	DUPLEX_CAFTER,		/* state ^= data, out = state */
+	DUPLEX_CBEFORE,		/* out = state ^ data, state = data */
+};
+
+static const uint8_t zero_block[STROBE_R];
+
+/* pad with pos_begin and permute */
+static void run_f(struct StrobeContext *s)
+{
+	uint8_t pad[2];
+
+	pad[0] = s->pos_begin;
+	pad[1] = 0x04;
+	keccak_pad(&s->k, pad, 2);
+	s->pos_begin = 0;
+}
+
+/*
+ * Process data.  If src is NULL, zeroes are used.  If dst is NULL,
+ * output is discarded.  If mac is given, output bytes are ORed into it.
+ */
+static void duplex(struct StrobeContext *s, enum DuplexMode mode,
+		   uint8_t *dst, const uint8_t *src, size_t len, uint8_t *mac)
+{
+	uint8_t buf[STROBE_R];
+	uint8_t *out;
+	unsigned int n, i;
+
+	while (len > 0) {
+		n = STROBE_R - s->k.pos;
+		if (n > len)
+			n = len;
+		out = dst ? dst : buf;
+
+		switch (mode) {
+		case DUPLEX_ABSORB:
+			if (src)
+				keccak_absorb(&s->k, src, n);
+			else
+				s->k.pos += n;
+			if (dst && dst != src)
+				memcpy(dst, src, n);
+			break;
+		case DUPLEX_CAFTER:
+			if (src)
+				keccak_encrypt(&s->k, out, src, n);
+			else
+				keccak_squeeze(&s->k, out, n);
+			break;
+		case DUPLEX_CBEFORE:
+			keccak_decrypt(&s->k, out, src ? src : zero_block, n);
+			break;
+		}
+
+		if (mac) {
+			for (i = 0; i < n; i++)
+				*mac |= out[i];
+		}
+		if (src)
+			src += n;
+		if (dst)
+			dst += n;
+		len -= n;
+
+		if (s->k.pos == STROBE_R)
+			run_f(s);
+	}
+	memset(buf, 0, sizeof(buf));
+}
+
+static void begin_op(struct StrobeContext *s, unsigned int flags)
+{
+	uint8_t hdr[2];
+
+	/* sender and receiver must agree on transport direction */
+	if (flags & STROBE_T) {
+		if (s->i0 == STROBE_ROLE_NONE)
+			s->i0 = flags & STROBE_I;
+		flags ^= s->i0;
+	}
+
+	hdr[0] = s->pos_begin;
+	hdr[1] = flags;
+	s->pos_begin = s->k.pos + 1;
+	duplex(s, DUPLEX_ABSORB, NULL, hdr, 2, NULL);
+
+	/* cipher operations start from fresh block */
+	if ((flags & (STROBE_C | STROBE_K)) && s->k.pos != 0)
+		run_f(s);
+}
+
+int strobe_valid_flags(unsigned int flags)
+{
+	switch (flags & ~STROBE_M) {
+	case STROBE_AD:
+	case STROBE_KEY:
+	case STROBE_PRF:
+	case STROBE_SEND_CLR:
+	case STROBE_RECV_CLR:
+	case STROBE_SEND_ENC:
+	case STROBE_RECV_ENC:
+	case STROBE_SEND_MAC:
+	case STROBE_RECV_MAC:
+	case STROBE_RATCHET:
+		return 1;
+	}
+	return 0;
+}
+
+void strobe_init(struct StrobeContext *s, const void *proto, size_t len)
+{
+	static const uint8_t domain[] = {
+		1, STROBE_R + 2, 1, 0, 1, 12 * 8,
+		'S', 'T', 'R', 'O', 'B', 'E', 'v', '1', '.', '0', '.', '2'
+	};
+
+	keccak_init(&s->k, 1600 - (STROBE_R + 2) * 8);
+	keccak_absorb(&s->k, domain, sizeof(domain));
+	keccak_pad(&s->k, NULL, 0);
+
+	s->pos_begin = 0;
+	s->i0 = STROBE_ROLE_NONE;
+	s->cur_flags = 0;
+	strobe_operate(s, STROBE_A | STROBE_M, NULL, proto, len, 0);
+}
+
+int strobe_operate(struct StrobeContext *s, unsigned int flags,
+		   uint8_t *dst, const void *src, size_t len, int more)
+{
+	enum DuplexMode mode;
+	uint8_t mac = 0;
+
+	if (!strobe_valid_flags(flags))
+		return 0;
+	if (more) {
+		if (flags != s->cur_flags)
+			return 0;
+	} else {
+		begin_op(s, flags);
+		s->cur_flags = flags;
+	}
+
+	if (!strobe_has_input(flags))
+		src = NULL;
+	if (!strobe_has_output(flags))
+		dst = NULL;
+
+	if ((flags & (STROBE_C | STROBE_I | STROBE_T)) == (STROBE_C | STROBE_T))
+		mode = DUPLEX_CAFTER;
+	else if (flags & STROBE_C)
+		mode = DUPLEX_CBEFORE;
+	else
+		mode = DUPLEX_ABSORB;
+
+	if (strobe_is_mac_check(flags)) {
+		duplex(s, mode, NULL, src, len, &mac);
+		return mac ? -1 : 1;
+	}
+	duplex(s, mode, dst, src, len, NULL);
+	return 1;
+}
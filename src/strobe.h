@@ -0,0 +1,117 @@
+/*
+ * STROBE protocol framework on Keccak-f1600.
+ *
+ * Copyright (c) 2026 Marko Kreen
+ *
+ * Permission to use, copy, modify, and/or distribute this software for any
+ * purpose with or without fee is hereby granted, provided that the above
+ * copyright notice and this permission notice appear in all copies.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS" AND THE AUTHOR DISCLAIMS ALL WARRANTIES
+ * WITH REGARD TO THIS SOFTWARE INCLUDING ALL IMPLIED WARRANTIES OF
+ * MERCHANTABILITY AND FITNESS. IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR
+ * ANY SPECIAL, DIRECT, INDIRECT, OR CONSEQUENTIAL DAMAGES OR ANY DAMAGES
+ * WHATSOEVER RESULTING FROM LOSS OF USE, DATA OR PROFITS, WHETHER IN AN
+ * ACTION OF CONTRACT, NEGLIGENCE OR OTHER TORTIOUS ACTION, ARISING OUT OF
+ * OR IN CONNECTION WITH THE USE OR PERFORMANCE OF THIS SOFTWARE.
+ */
+
+/** @file
+ * STROBE v1.0.2 with 128-bit security, as specified in
+ * https://strobe.sourceforge.io/specs/
+ *
+ * Compatible with reference implementation and Merlin transcripts.
+ */
+
+#ifndef _USUAL_CRYPTO_STROBE_H_
+#define _USUAL_CRYPTO_STROBE_H_
+
+#include "keccak.h"
+
+/* operation flags */
+#define STROBE_I	0x01	/* inbound */
+#define STROBE_A	0x02	/* application data */
+#define STROBE_C	0x04	/* cipher */
+#define STROBE_T	0x08	/* transport */
+#define STROBE_M	0x10	/* metadata */
+#define STROBE_K	0x20	/* keytree, not supported */
+
+/* operations */
+#define STROBE_AD		(STROBE_A)
+#define STROBE_KEY		(STROBE_A | STROBE_C)
+#define STROBE_PRF		(STROBE_I | STROBE_A | STROBE_C)
+#define STROBE_SEND_CLR		(STROBE_A | STROBE_T)
+#define STROBE_RECV_CLR		(STROBE_I | STROBE_A | STROBE_T)
+#define STROBE_SEND_ENC		(STROBE_A | STROBE_C | STROBE_T)
+#define STROBE_RECV_ENC		(STROBE_I | STROBE_A | STROBE_C | STROBE_T)
+#define STROBE_SEND_MAC		(STROBE_C | STROBE_T)
+#define STROBE_RECV_MAC		(STROBE_I | STROBE_C | STROBE_T)
+#define STROBE_RATCHET		(STROBE_C)
+
+/* block size, 2 bytes of 168-byte rate are used by padding */
+#define STROBE_R		166
+
+/* role is not known before first transport operation */
+#define STROBE_ROLE_NONE	2
+
+/**
+ * STROBE state.
+ */
+struct StrobeContext {
+	struct KeccakContext k;	/* k.pos is STROBE pos */
+	uint8_t pos_begin;	/* start of current operation */
+	uint8_t i0;		/* initiator flag, or STROBE_ROLE_NONE */
+	uint8_t cur_flags;	/* flags of current operation */
+};
+
+/**
+ * Operation takes data, otherwise only length is given.
+ */
+static inline int strobe_has_input(unsigned int flags)
+{
+	return (flags & (STROBE_I | STROBE_T)) == (STROBE_I | STROBE_T)
+		|| (flags & (STROBE_I | STROBE_A)) == STROBE_A;
+}
+
+/**
+ * Operation returns len bytes.
+ */
+static inline int strobe_has_output(unsigned int flags)
+{
+	return (flags & (STROBE_I | STROBE_A)) == (STROBE_I | STROBE_A)
+		|| (flags & (STROBE_I | STROBE_T)) == STROBE_T;
+}
+
+/**
+ * Operation checks MAC.
+ */
+static inline int strobe_is_mac_check(unsigned int flags)
+{
+	return (flags & (STROBE_I | STROBE_A | STROBE_T)) == (STROBE_I | STROBE_T);
+}
+
+/**
+ * Flags are one of operations, optionally with STROBE_M.
+ */
+int strobe_valid_flags(unsigned int flags);
+
+/**
+ * Initialize state, protocol name is added with meta-AD.
+ */
+void strobe_init(struct StrobeContext *s, const void *proto, size_t len);
+
+/**
+ * Run operation with given flags, optionally with STROBE_M.
+ *
+ * src is used if strobe_has_input(), otherwise it can be NULL.
+ * len bytes are written to dst if strobe_has_output(), otherwise
+ * it can be NULL.  If more is set, previous operation is continued,
+ * then flags must be same.  dst may be same as src.
+ *
+ * Returns 1 if successful, 0 if flags are invalid,
+ * -1 if MAC check failed.
+ */
+int strobe_operate(struct StrobeContext *s, unsigned int flags,
+		   uint8_t *dst, const void *src, size_t len, int more);
+
+#endif
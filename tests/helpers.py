@@ -0,0 +1,9 @@
+"""Shared test helpers.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+
+def ptn(n):
+    """Return n bytes of repeating test pattern."""
+    return bytes(bytearray(i % 251 for i in range(n)))
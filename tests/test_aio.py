@@ -0,0 +1,130 @@
+"""Asyncio wrappers.
+"""
+
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from spongeshaker.aio import AsyncSpongeHash, AsyncStreamCipher, AsyncSpongeWrap
+from spongeshaker.sha3 import sha3_256, shake128
+from spongeshaker.spongewrap import SpongeWrap
+from spongeshaker.stream_cipher import KeccakStreamCipher
+
+from .helpers import ptn
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+CHUNKS = [ptn(10), ptn(300 * 1024), ptn(7), ptn(1), ptn(100 * 1024), ptn(3)]
+
+
+def test_hash_order():
+    exp = sha3_256(b''.join(CHUNKS)).hexdigest()
+
+    async def main():
+        h = AsyncSpongeHash(sha3_256(), inline_limit=1024)
+        # all started at once, must still be applied in call order
+        await asyncio.gather(*[h.update(c) for c in CHUNKS])
+        return await h.hexdigest()
+    assert run(main()) == exp
+
+    async def main2():
+        h = AsyncSpongeHash(shake128(), ThreadPoolExecutor(2), inline_limit=1024)
+        await h.update(b'abc')
+        return await h.extract(5000)
+    assert run(main2()) == shake128(b'abc').extract(5000)
+
+
+def test_hash_order_after_release():
+    big1, big2, small = ptn(200 * 1024), ptn(100 * 1024)[::-1], b'small'
+    exp = sha3_256(big1 + big2 + small).digest()
+
+    async def main():
+        h = AsyncSpongeHash(sha3_256(), inline_limit=1024)
+
+        async def first():
+            await h.update(big1)
+            # lock is released, but big2 is still queued
+            await h.update(small)
+        t1 = asyncio.ensure_future(first())
+        await asyncio.sleep(0)
+        t2 = asyncio.ensure_future(h.update(big2))
+        await asyncio.gather(t1, t2)
+        return await h.digest()
+    assert run(main()) == exp
+
+
+def test_sources():
+    exp = sha3_256(b''.join(CHUNKS)).digest()
+
+    async def agen():
+        for c in CHUNKS:
+            await asyncio.sleep(0)
+            yield c
+
+    async def main():
+        h1 = AsyncSpongeHash(sha3_256())
+        await h1.update_from(agen())
+
+        h2 = AsyncSpongeHash(sha3_256())
+        await h2.update_from(CHUNKS)
+
+        reader = asyncio.StreamReader()
+        for c in CHUNKS:
+            reader.feed_data(c)
+        reader.feed_eof()
+        h3 = AsyncSpongeHash(sha3_256())
+        await h3.update_from(reader)
+        return [await h.digest() for h in (h1, h2, h3)]
+    assert run(main()) == [exp] * 3
+
+
+def test_cipher():
+    c = KeccakStreamCipher()
+    c.add_initial_data(b'key')
+    exp = c.encrypt(b''.join(CHUNKS))
+
+    async def main():
+        ac = AsyncStreamCipher(KeccakStreamCipher(), inline_limit=1024)
+        await ac.add_initial_data(b'key')
+        parts = await asyncio.gather(*[ac.encrypt(c) for c in CHUNKS])
+        enc = b''.join(parts)
+
+        ad = AsyncStreamCipher(KeccakStreamCipher(), inline_limit=1024)
+        await ad.add_initial_data(b'key')
+        dec = b''
+        async for part in ad.decrypt_stream([enc[:5000], enc[5000:]]):
+            dec += part
+        return enc, dec
+    enc, dec = run(main())
+    assert enc == exp
+    assert dec == b''.join(CHUNKS)
+
+
+def test_spongewrap():
+    w = SpongeWrap()
+    w.add_header(b'hdr')
+    exp = w.encrypt_body(b''.join(CHUNKS))
+    tag = w.digest(16)
+
+    async def main():
+        aw = AsyncSpongeWrap(SpongeWrap(), inline_limit=1024)
+        await aw.add_header(b'hdr')
+        enc = b''
+        async for part in aw.encrypt_stream(CHUNKS):
+            enc += part
+        return enc, await aw.digest(16)
+    assert run(main()) == (exp, tag)
+
+    async def main2():
+        aw = AsyncSpongeWrap(SpongeWrap(), inline_limit=1024)
+        await aw.add_header(b'hdr')
+        dec = await aw.decrypt_body(exp)
+        return dec, await aw.digest(16)
+    assert run(main2()) == (b''.join(CHUNKS), tag)
@@ -0,0 +1,60 @@
+"""Keccak-f1600 implementation selection.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import os
+import subprocess
+import sys
+
+import spongeshaker.keccak
+
+BACKENDS = ('generic', 'lcomp', 'bmi1', '32bit', 'small')
+
+# prints backend name and outputs from several sponge configurations
+SCRIPT = '''
+import binascii
+from spongeshaker.keccak import KeccakSponge, backend
+from spongeshaker.sha3 import sha3_256, shake128
+data = bytes(bytearray(i % 251 for i in range(1000)))
+out = [backend, sha3_256(b'').hexdigest(), sha3_256(b'abc').hexdigest(),
+       binascii.hexlify(shake128(data).extract(500)).decode()]
+for cap, rounds in ((512, 24), (256, 12), (8, 4)):
+    s = KeccakSponge(cap, rounds)
+    s.absorb(data)
+    s.pad(b'\\x1f')
+    out.append(binascii.hexlify(s.squeeze(400)).decode())
+print(' '.join(out))
+'''
+
+
+def run(backend):
+    env = dict(os.environ)
+    env['SPONGESHAKER_KECCAK_BACKEND'] = backend
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    p = subprocess.Popen([sys.executable, '-c', SCRIPT], env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = p.communicate()
+    assert p.returncode == 0, err
+    return out.decode().split(), err.decode()
+
+
+def test_backends():
+    assert spongeshaker.keccak.backend in BACKENDS
+
+    ref = None
+    for name in BACKENDS:
+        res, err = run(name)
+        if res[0] != name:
+            # not compiled in or not supported by CPU
+            assert 'RuntimeWarning' in err
+            continue
+        assert res[1] == 'a7ffc6f8bf1ed76651c14756a061d662f580ff4de43b49fa82d80a4b80f8434a'
+        assert res[2] == '3a985da74fe225b2045c172d6bd390bd855f086e3e9d525b46bfe24511431532'
+        if ref is None:
+            ref = res[1:]
+        assert res[1:] == ref
+
+    res, err = run('auto')
+    assert res[0] == spongeshaker.keccak.backend
+    assert not err
@@ -0,0 +1,88 @@
+"""Batch hashing.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from array import array
+
+from spongeshaker import keccak
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.sha3 import sha3_224, sha3_256, sha3_384, sha3_512, shake128, shake256
+from spongeshaker.sha3 import sha3_224_many, sha3_256_many, sha3_384_many, sha3_512_many
+from spongeshaker.sha3 import shake128_many, shake256_many
+
+
+def make_messages(count):
+    msgs = []
+    for i in range(count):
+        n = (i * 37) % 613
+        msgs.append(bytes(bytearray((i + j) & 0xFF for j in range(n))))
+    return msgs
+
+
+def single(capacity, padding, nbytes, msg):
+    s = KeccakSponge(capacity)
+    s.absorb(msg)
+    s.pad(padding)
+    return s.squeeze(nbytes)
+
+
+def test_backend():
+    assert keccak.batch_backend in ('avx512', 'avx2', 'generic', 'scalar')
+
+
+def test_hash_many():
+    msgs = make_messages(150)
+    for capacity, padding, nbytes in ((512, b'\x06', 32),
+                                      (256, b'\x1f', 400),
+                                      (1000, b'\x01', 7),
+                                      (576, b'ab\x03', 64),
+                                      (1024, b'', 64)):
+        res = keccak.hash_many(capacity, padding, nbytes, msgs)
+        assert len(res) == len(msgs) * nbytes
+        for i, msg in enumerate(msgs):
+            got = res[i * nbytes : (i + 1) * nbytes]
+            assert got == single(capacity, padding, nbytes, msg), (capacity, i)
+
+
+def test_hash_many_empty():
+    assert keccak.hash_many(512, b'\x06', 32, []) == b''
+
+
+def test_sha3_many():
+    msgs = make_messages(40)
+    for func, many in ((sha3_224, sha3_224_many),
+                       (sha3_256, sha3_256_many),
+                       (sha3_384, sha3_384_many),
+                       (sha3_512, sha3_512_many),
+                       (shake128, shake128_many),
+                       (shake256, shake256_many)):
+        n = func().digest_size
+        res = many(msgs)
+        assert res == b''.join(func(m).digest() for m in msgs)
+
+        # concatenated buffer with offsets
+        offsets = [0]
+        for m in msgs:
+            offsets.append(offsets[-1] + len(m))
+        data = b''.join(msgs)
+        assert many(data, offsets) == res
+        assert many(bytearray(data), array('q', offsets)) == res
+        assert many(data, array('I', offsets)) == res
+        assert len(res) == n * len(msgs)
+
+
+def test_shake_many_size():
+    msgs = make_messages(5)
+    res = shake128_many(msgs, digest_size=1000 * 8)
+    assert res[:1000] == shake128(msgs[0]).extract(1000)
+
+
+def test_bad_offsets():
+    for offsets in ([], [0, 5, 3], [0, 100], [-1, 2]):
+        try:
+            sha3_256_many(b'abcd', offsets)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError: %r" % offsets)
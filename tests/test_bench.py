@@ -0,0 +1,33 @@
+"""Benchmark tool.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import json
+import os
+import tempfile
+
+from spongeshaker import keccak
+from spongeshaker.bench import main
+
+
+def test_bench_json():
+    fd, fn = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        args = ['--quick', '--sizes', '16,300', '--capacity', '512',
+                '--min-time', '0.0001', '--repeat', '1', '--mhz', '1000',
+                '--json', fn]
+        assert main(args) == 0
+        with open(fn) as f:
+            doc = json.load(f)
+    finally:
+        os.unlink(fn)
+    groups = set(r['group'] for r in doc['results'])
+    assert groups == set(['permute', 'sponge', 'hash', 'modes'])
+    for r in doc['results']:
+        assert r['capacity'] == 512
+        assert r['mb_per_sec'] > 0
+        assert r['cycles_per_byte'] > 0
+    assert doc['info']['mhz'] == 1000
+    assert doc['info']['backend'] == keccak.backend
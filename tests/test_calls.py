@@ -0,0 +1,81 @@
+"""Argument handling of C methods and constructors.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.keccak import KeccakSponge, KeccakSponge800, KeccakDuplex, Sha3Hash
+from spongeshaker.strobe import Strobe
+
+
+class SubSponge(KeccakSponge):
+    pass
+
+
+def expect(exc, func, *args, **kws):
+    try:
+        func(*args, **kws)
+    except exc:
+        pass
+    else:
+        raise AssertionError('%s expected' % exc.__name__)
+
+
+def test_constructors():
+    for s in (KeccakSponge(256, 12), KeccakSponge(256, rounds=12),
+              KeccakSponge(capacity=256, rounds=12), SubSponge(256, 12)):
+        assert (s.capacity, s.rounds) == (256, 12)
+    assert type(SubSponge(512)) is SubSponge
+    expect(TypeError, KeccakSponge)
+    expect(TypeError, KeccakSponge, 512, 24, 1)
+    expect(TypeError, KeccakSponge, 512, foo=1)
+    expect(ValueError, KeccakSponge, 513)
+
+    h1 = Sha3Hash(512, 256, b'abc', 'X', b'\x06', 24)
+    h2 = Sha3Hash(512, 256, data=b'abc', name='X')
+    h3 = Sha3Hash(capacity=512, output_bits=256, data=b'abc', name='X', rounds=24)
+    assert h1.digest() == h2.digest() == h3.digest()
+    assert h1.name == h3.name == 'X'
+    expect(TypeError, Sha3Hash, 512)
+    expect(TypeError, Sha3Hash, 512, 256, None, None, None, 24, 1)
+
+
+def test_method_args():
+    s = KeccakSponge(512)
+    for meth, args in (('absorb', ()), ('absorb', (b'a', b'b')), ('squeeze', ()),
+                       ('squeeze', ('x',)), ('pad', ()), ('encrypt', ()),
+                       ('encrypt_into', (b'a',)), ('wrap_encrypt', (b'a',)),
+                       ('wrap_encrypt_into', (b'a', bytearray(1))), ('finalize_copy', (b'\x06',))):
+        expect(TypeError, getattr(s, meth), *args)
+    expect(OverflowError, s.squeeze, -1)
+    expect(TypeError, s.absorb, u'text')
+    assert s.finalize_copy(b'\x06', 4) == s.copy().finalize_copy(b'\x06', 4)
+
+
+def test_uninitialized():
+    # __init__ not run, methods must not touch state
+    for cls in (KeccakSponge, KeccakSponge800, SubSponge):
+        s = cls.__new__(cls)
+        for meth, args in (('absorb', (b'x' * 500,)), ('pad', (b'\x01',)), ('squeeze', (10,)),
+                           ('squeeze_into', (bytearray(10),)), ('encrypt', (b'x',)),
+                           ('decrypt_into', (b'x', bytearray(1))), ('wrap_absorb', (b'x', b'\x01')),
+                           ('finalize_copy', (b'\x01', 4))):
+            expect(ValueError, getattr(s, meth), *args)
+    expect(ValueError, KeccakDuplex.__new__(KeccakDuplex).duplexing, b'x', 4)
+    st = Strobe.__new__(Strobe)
+    expect(ValueError, st.ad, b'x')
+    expect(ValueError, st.prf, 10)
+    h = Sha3Hash.__new__(Sha3Hash)
+    for meth, args in (('update', (b'x',)), ('digest', ()), ('hexdigest', ()), ('extract', (4,)),
+                       ('to_bytes', ())):
+        expect(ValueError, getattr(h, meth), *args)
+
+
+def test_hash_without_init():
+    class NoInit(Sha3Hash):
+        def __init__(self):
+            pass
+    for h in (Sha3Hash.__new__(Sha3Hash), NoInit()):
+        assert h.name == 'Keccak'
+        assert h.digest_size == 0
+        assert type(h.copy()) is type(h)
+        expect(ValueError, h.to_bytes)
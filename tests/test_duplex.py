@@ -0,0 +1,80 @@
+"""Duplex object.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import pickle
+
+from spongeshaker.keccak import KeccakSponge, KeccakDuplex
+
+from .helpers import ptn
+
+
+def ref_duplexing(sponge, data, nbytes, pad=b'\x01'):
+    # duplex step with sponge primitives
+    sponge.rewind()
+    sponge.absorb(data)
+    sponge.pad(pad)
+    return sponge.copy().squeeze(nbytes)
+
+
+def test_duplexing():
+    for cap, rounds in ((512, 24), (256, 12), (1600 - 64, 24)):
+        d = KeccakDuplex(cap, rounds)
+        s = KeccakSponge(cap, rounds)
+        rb = d.rbytes
+        assert rb == s.rbytes and d.rate == s.rate and d.capacity == cap and d.rounds == rounds
+        steps = [(b'', 0, b'\x01'), (ptn(rb - 1), rb, b'\x01'), (ptn(3), min(16, rb), b'\x06'),
+                 (ptn(rb - 2), 1, b'\x02\x03'), (b'', rb, b'\x1f'), (ptn(rb // 2), 5, b'\x01')]
+        for data, n, pad in steps:
+            assert d.duplexing(data, n, pad) == ref_duplexing(s, data, n, pad)
+            assert d.to_bytes() == s.to_bytes()
+        assert d.duplexing(b'abc', 7) == ref_duplexing(s, b'abc', 7)
+
+        d2 = d.copy()
+        out = bytearray(rb)
+        d2.duplexing_into(ptn(min(10, rb - 1)), out)
+        assert bytes(out) == d.duplexing(ptn(min(10, rb - 1)), rb)
+        out = bytearray(4)
+        d2.duplexing_into(ptn(min(10, rb - 1)), memoryview(out), b'\x06')
+        assert bytes(out) == d.duplexing(ptn(min(10, rb - 1)), 4, b'\x06')
+
+
+def test_limits():
+    d = KeccakDuplex(512)
+    rb = d.rbytes
+    state = d.to_bytes()
+    for args in ((ptn(rb), 1), (ptn(rb - 1), 1, b'\x01\x01'), (b'', rb + 1), (b'', 1, b'')):
+        try:
+            d.duplexing(*args)
+            assert False
+        except ValueError:
+            pass
+    try:
+        d.duplexing_into(b'', bytearray(rb + 1))
+        assert False
+    except ValueError:
+        pass
+    assert d.to_bytes() == state
+    for args in ((), (b'',), (b'', 1, b'\x01', 1)):
+        try:
+            d.duplexing(*args)
+            assert False
+        except TypeError:
+            pass
+
+
+def test_state():
+    d = KeccakDuplex(256, 12)
+    d.duplexing(b'key', 0)
+    for d2 in (d.copy(), KeccakDuplex.from_bytes(d.to_bytes()), pickle.loads(pickle.dumps(d))):
+        assert type(d2) is KeccakDuplex
+        assert d2.rounds == 12 and d2.capacity == 256
+        assert d2.duplexing(b'x', 32) == d.copy().duplexing(b'x', 32)
+    d.reset()
+    assert d.duplexing(b'', 8) == KeccakDuplex(256, 12).duplexing(b'', 8)
+    try:
+        KeccakDuplex.from_bytes(KeccakSponge(256, 12).to_bytes()[:-1])
+        assert False
+    except ValueError:
+        pass
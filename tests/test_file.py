@@ -0,0 +1,69 @@
+"""Hashing files.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import io
+import os
+import tempfile
+
+from spongeshaker.hashing import hash_file
+from spongeshaker.sha3 import sha3_256, shake128
+
+DATA = bytes(bytearray(range(256))) * 4000 + b"tail"
+
+
+def make_file(data=DATA):
+    fd, fn = tempfile.mkstemp()
+    os.write(fd, data)
+    os.close(fd)
+    return fn
+
+
+def test_hash_file():
+    fn = make_file()
+    try:
+        exp = sha3_256(DATA).hexdigest()
+        assert hash_file(fn, sha3_256).hexdigest() == exp
+        assert hash_file(fn, 'sha3_256').hexdigest() == exp
+        assert hash_file(fn, shake128).extract(100) == shake128(DATA).extract(100)
+
+        fd = os.open(fn, os.O_RDONLY)
+        try:
+            os.lseek(fd, 1000, os.SEEK_SET)
+            assert hash_file(fd, sha3_256).digest() == sha3_256(DATA[1000:]).digest()
+        finally:
+            os.close(fd)
+
+        with open(fn, 'rb') as f:
+            f.read(5)
+            h = sha3_256(b'x')
+            h.update_from_file(f)
+            assert h.digest() == sha3_256(b'x' + DATA[5:]).digest()
+            assert f.read() == b''
+    finally:
+        os.unlink(fn)
+
+
+def test_empty_file():
+    fn = make_file(b'')
+    try:
+        assert hash_file(fn, sha3_256).digest() == sha3_256(b'').digest()
+    finally:
+        os.unlink(fn)
+
+
+def test_stream():
+    h = sha3_256()
+    h.update_from_file(io.BytesIO(DATA), 1000)
+    assert h.digest() == sha3_256(DATA).digest()
+
+
+def test_unknown_algo():
+    for algo in ('md5', 'sha3_256_many', 'shake128_many', 'PAD_SHA3'):
+        try:
+            hash_file(__file__, algo)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError expected')
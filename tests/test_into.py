@@ -0,0 +1,91 @@
+"""Tests for *_into() APIs.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.spongewrap import SpongeWrap
+from spongeshaker.stream_cipher import KeccakStreamCipher
+
+DATA = bytes(bytearray(range(256))) * 5 + b"tail"
+
+
+def keyed(capacity=512):
+    s = KeccakSponge(capacity)
+    s.absorb(b"key")
+    s.pad(b"\x01")
+    return s
+
+
+def test_squeeze_into():
+    buf = bytearray(500)
+    keyed().squeeze_into(buf)
+    assert bytes(buf) == keyed().squeeze(500)
+
+
+def test_sponge_ops_into():
+    for name in ('squeeze_xor', 'encrypt', 'decrypt'):
+        exp = getattr(keyed(), name)(DATA)
+
+        # separate buffer
+        out = bytearray(len(DATA))
+        getattr(keyed(), name + '_into')(DATA, out)
+        assert bytes(out) == exp, name
+
+        # in-place
+        buf = bytearray(DATA)
+        s = keyed()
+        getattr(s, name + '_into')(buf, buf)
+        assert bytes(buf) == exp, name
+
+        # state must match too
+        s2 = keyed()
+        getattr(s2, name)(DATA)
+        assert s.squeeze(32) == s2.squeeze(32), name
+
+
+def test_out_too_small():
+    try:
+        keyed().encrypt_into(DATA, bytearray(10))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_stream_cipher_into():
+    c = KeccakStreamCipher()
+    c.add_initial_data(b"key")
+    exp = c.encrypt(DATA)
+
+    c = KeccakStreamCipher()
+    c.add_initial_data(b"key")
+    buf = bytearray(DATA)
+    c.encrypt_into(buf, buf)
+    assert bytes(buf) == exp
+
+    c = KeccakStreamCipher()
+    c.add_initial_data(b"key")
+    c.decrypt_into(buf, buf)
+    assert bytes(buf) == DATA
+
+
+def test_spongewrap_into():
+    w = SpongeWrap(1536)
+    w.add_header(b"password")
+    exp = w.encrypt_body(DATA)
+    tag = w.digest(16)
+
+    w = SpongeWrap(1536)
+    w.add_header(b"password")
+    buf = bytearray(DATA)
+    w.encrypt_body_into(buf, buf)
+    assert bytes(buf) == exp
+    assert w.digest(16) == tag
+
+    w = SpongeWrap(1536)
+    w.add_header(b"password")
+    out = bytearray(len(buf))
+    w.decrypt_body_into(buf, out)
+    assert bytes(out) == DATA
+    assert w.digest(16) == tag
@@ -0,0 +1,68 @@
+r"""TurboSHAKE and KangarooTwelve.
+
+Values from RFC 9861.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.k12 import k12, turboshake128, turboshake256
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.util import fromhex
+
+from .helpers import ptn
+
+
+def test_turboshake():
+    r"""
+    >>> turboshake128().hexdigest()
+    '1e415f1c5983aff2169217277d17bb538cd945a397ddec541f1ce41af2c1b74c'
+    >>> turboshake128(ptn(17**2)).hexdigest()
+    '96c77c279e0126f7fc07c9b07f5cdae1e0be60bdbe10620040e75d7223a624d2'
+    >>> turboshake128(fromhex('ffffff'), 0x06).hexdigest()
+    '3d03988bb59e681851a192f429ae03988e8f444bc06036a3f1a7d2ccd758d174'
+    >>> turboshake256(ptn(17**2)).hexdigest()
+    '66b810db8e90780424c0847372fdc95710882fde31c6df75beb9d4cd9305cfcae35e7b83e8b7e6eb4b78605880116316fe2c078a09b94ad7b8213c0a738b65c0'
+    """
+
+def test_k12():
+    r"""
+    >>> k12().hexdigest()
+    '1ac2d450fc3b4205d19da7bfca1b37513c0803577ac7167f06fe2ce1f0ef39e5'
+    >>> k12(ptn(17)).hexdigest()
+    '6bf75fa2239198db4772e36478f8e19b0f371205f6a9a93a273f51df37122888'
+    >>> k12(ptn(17**3)).hexdigest()
+    'cb552e2ec77d9910701d578b457ddf772c12e322e4ee7fe417f92c758f0d59d0'
+    >>> k12(ptn(1), ptn(41)).hexdigest()
+    '8234d8630d549449dca134f63793c219c6d60a3ea53f7881c8042c226ea17e1e'
+    >>> k12(ptn(17**4), ptn(41**3)).hexdigest()
+    '2abe569393989a13ad0a52ecb3b12e7713b1169eadd463f189e9f16d77eca323'
+    """
+
+def test_k12_split():
+    data = ptn(17**4)
+    exp = k12(data).digest()
+    for step in (1000, 8191, 8192, 8193, 30000):
+        h = k12()
+        for i in range(0, len(data), step):
+            h.update(data[i : i + step])
+        assert h.digest() == exp, step
+        assert h.copy().extract(32) == exp
+
+def test_k12_empty_update():
+    data = ptn(8192 + 10)
+    for pos in (0, 8191, 8192, 8193):
+        h = k12(data[:pos])
+        h.update(b'')
+        h.update(data[pos:])
+        h.update(b'')
+        assert h.digest() == k12(data).digest(), pos
+
+def test_rounds():
+    assert KeccakSponge(256, 12).rounds == 12
+    for rounds in (0, 6, 28):
+        try:
+            KeccakSponge(256, rounds)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("expected ValueError")
@@ -0,0 +1,96 @@
+"""Parallel AEAD mode.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from concurrent.futures import ThreadPoolExecutor
+
+from spongeshaker.parallel_wrap import ParallelWrap, AuthenticationFailed
+
+from .helpers import ptn
+
+
+def test_roundtrip():
+    for pistons in (1, 2, 4):
+        pw = ParallelWrap(b'key', pistons, segment_size=100)
+        for n in (0, 1, 99, 100, 101, 399, 400, 1000):
+            for adlen in (0, 150, 1000):
+                ct = pw.encrypt(b'nonce', ptn(adlen), ptn(n))
+                assert len(ct) == n + 16
+                if n > 16:
+                    assert ct[:n] != ptn(n)
+                assert pw.decrypt(b'nonce', ptn(adlen), ct) == ptn(n)
+
+
+def test_segments():
+    # each piston sees its segments as one continuous SpongeWrap body
+    pw = ParallelWrap(b'key', 3, segment_size=50)
+    data = ptn(1000)
+    ct = pw.encrypt(b'n', b'', data)
+    for i in range(3):
+        sponge = pw._keyed[i].copy()
+        sponge.wrap_absorb(b'\x01\x08n', b'\x02')
+        sponge.pad(b'\x03')
+        parts = [(pos, pos + 50) for pos in range(i * 50, 1000, 150)]
+        body = sponge.wrap_encrypt(b''.join(data[a:b] for a, b in parts), b'\x03')
+        assert body == b''.join(ct[a:b] for a, b in parts)
+
+
+def test_executor():
+    data = ptn(300 * 1024)
+    serial = ParallelWrap(b'key', 4, 32, 8192)
+    with ThreadPoolExecutor(4) as ex:
+        par = ParallelWrap(b'key', 4, 32, 8192, executor=ex)
+        ct = par.encrypt(b'nonce', b'ad', data)
+        assert ct == serial.encrypt(b'nonce', b'ad', data)
+        assert par.decrypt(b'nonce', b'ad', ct) == data
+
+
+def test_tamper():
+    pw = ParallelWrap(b'key', 2, segment_size=64)
+    ct = pw.encrypt(b'nonce', b'header', ptn(500))
+    bad = [(b'nonce2', b'header', ct), (b'nonce', b'header2', ct), (b'nonce', b'header', ct[:-1]),
+           (b'nonce', b'header', ct[:300] + b'x' + ct[301:]), (b'nonce', b'header', ct[:10]),
+           (b'nonce', b'header', ct[:-1] + bytes(bytearray([ct[-1:][0] ^ 1])))]
+    for args in bad:
+        try:
+            pw.decrypt(*args)
+            assert False
+        except AuthenticationFailed:
+            pass
+    others = [ParallelWrap(b'key2', 2, segment_size=64), ParallelWrap(b'key', 3, segment_size=64),
+              ParallelWrap(b'key', 2, segment_size=65), ParallelWrap(b'key', 2, 17, 64)]
+    for other in others:
+        try:
+            other.decrypt(b'nonce', b'header', ct)
+            assert False
+        except AuthenticationFailed:
+            pass
+    for args in ((b'k', 0), (b'k', 256), (b'k', 2, 0)):
+        try:
+            ParallelWrap(*args)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_into():
+    pw = ParallelWrap(b'key', 2, segment_size=64)
+    ct = pw.encrypt(b'nonce', b'ad', ptn(300))
+    out = bytearray(316)
+    pw.encrypt_into(b'nonce', b'ad', ptn(300), out)
+    assert bytes(out) == ct
+    buf = bytearray(300)
+    pw.decrypt_into(b'nonce', b'ad', ct, memoryview(buf))
+    assert bytes(buf) == ptn(300)
+    try:
+        pw.decrypt_into(b'nonce', b'ad2', ct, buf)
+        assert False
+    except AuthenticationFailed:
+        assert buf == bytearray(300)
+    for func, data, n in ((pw.encrypt_into, ptn(300), 315), (pw.decrypt_into, ct, 301)):
+        try:
+            func(b'nonce', b'ad', data, bytearray(n))
+            assert False
+        except ValueError:
+            pass
@@ -0,0 +1,132 @@
+"""KeccakRandom.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import copy
+import os
+import pickle
+from unittest import SkipTest
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.prng import KeccakRandom, KeccakPRNG, KeccakBitGenerator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def keyed_prng(key=b'key'):
+    prng = KeccakPRNG()
+    prng.add_entropy(key)
+    return prng
+
+
+def test_deterministic():
+    a = KeccakRandom(42)
+    b = KeccakRandom(42, bufsize=24)
+    assert [a.random() for _ in range(1000)] == [b.random() for _ in range(1000)]
+    assert a.getrandbits(64) == b.getrandbits(64)
+    assert KeccakRandom(bytearray(b'x')).random() == KeccakRandom(b'x').random()
+    assert KeccakRandom(memoryview(b'x')).random() == KeccakRandom(b'x').random()
+    seeds = [1, 1.0, 1.5, '1', b'1', '\x01', b'\x01', 'x', b'x', "bytearray(b'ab')", bytearray(b'ab')]
+    assert len(set(KeccakRandom(a).random() for a in seeds)) == len(seeds)
+    assert KeccakRandom(1).random() != KeccakRandom(2).random()
+    assert KeccakRandom().random() != KeccakRandom().random()
+
+
+def test_values():
+    r = KeccakRandom(1)
+    vals = [r.random() for _ in range(10000)]
+    assert 0.0 <= min(vals) and max(vals) < 1.0
+    assert 0.45 < sum(vals) / len(vals) < 0.55
+    for k in (0, 1, 7, 64, 65, 200, 1000):
+        assert 0 <= r.getrandbits(k) < 2**k
+    assert len(r.randbytes(10000)) == 10000
+    assert 1 <= r.randint(1, 6) <= 6
+    assert r.choice('abc') in 'abc'
+
+
+def test_stream():
+    # words are taken little-endian from squeeze output
+    s = KeccakSponge(512)
+    s.absorb(b'i2a')
+    s.pad(b'\x01')
+    data = bytearray(s.squeeze(16))
+    r = KeccakRandom(42)
+    for i in (0, 8):
+        exp = sum(data[i + j] << (8 * j) for j in range(8))
+        assert r.getrandbits(64) == exp
+
+
+def test_getstate():
+    r = KeccakRandom(1, capacity=256, bufsize=24)
+    r.random()
+    r.gauss(0, 1)
+    other = KeccakRandom()
+    other.setstate(r.getstate())
+    copies = [other, copy.copy(r), pickle.loads(pickle.dumps(r))]
+    for t in copies:
+        assert t.getstate() == r.getstate()
+    exp = [r.gauss(0, 1), r.random(), r.getrandbits(100), r.randbytes(30), r.random()]
+    for t in copies:
+        assert [t.gauss(0, 1), t.random(), t.getrandbits(100), t.randbytes(30), t.random()] == exp
+    for bad in ((2,) + r.getstate()[1:], r.getstate()[:4], None):
+        try:
+            r.setstate(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError expected')
+
+
+def check_fork(reseed):
+    r = KeccakRandom(42, reseed_on_fork=reseed)
+    r.random()
+    rd, wr = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(wr, repr(r.random()).encode('ascii'))
+        os._exit(0)
+    os.waitpid(pid, 0)
+    child = os.read(rd, 100).decode('ascii')
+    os.close(rd)
+    os.close(wr)
+    return child == repr(r.random())
+
+
+def test_fork():
+    if not hasattr(os, 'register_at_fork'):
+        raise SkipTest("os.register_at_fork not available")
+    assert not check_fork(True)
+    assert check_fork(False)
+
+
+def test_fill():
+    buf = bytearray(1000)
+    keyed_prng().fill(buf)
+    assert bytes(buf) == keyed_prng().get_random_bytes(1000)
+
+
+def test_numpy_arrays():
+    if numpy is None:
+        raise SkipTest("numpy not installed")
+    data = keyed_prng().get_random_bytes(80)
+    assert keyed_prng().random_uint32(20).tobytes() == data
+    arr = keyed_prng().random_uint64((2, 5))
+    assert arr.shape == (2, 5)
+    assert arr.tobytes() == data
+    vals = keyed_prng().random_float64(10)
+    assert vals.tolist() == [(int(x) >> 11) / 2.0**53 for x in arr.flat]
+
+
+def test_numpy_generator():
+    if numpy is None:
+        raise SkipTest("numpy not installed")
+    gen = numpy.random.Generator(KeccakBitGenerator(b'key'))
+    assert gen.random(100).tolist() == keyed_prng().random_float64(100).tolist()
+    assert 0 <= gen.integers(0, 10) < 10
+    bg = KeccakBitGenerator(b'key')
+    assert bg.random_raw() == int(keyed_prng().random_uint64(1)[0])
+    assert bg.random_raw(3).tolist() == keyed_prng().random_uint64(4)[1:].tolist()
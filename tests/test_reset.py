@@ -0,0 +1,72 @@
+"""finalize_copy() and hash reset.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import pickle
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.sha3 import sha3_256, shake128
+from spongeshaker.sp800_185 import cshake128, kmac128, kmac256_key, tuplehash128
+
+from .helpers import ptn
+
+
+def test_finalize_copy():
+    for cap in (256, 512, 1024):
+        for n in (0, 1, 135, 136, 300):
+            for nbytes in (0, 32, 5000):
+                s = KeccakSponge(cap)
+                s.absorb(ptn(n))
+                before = s.to_bytes()
+                tmp = s.copy()
+                tmp.pad(b'\x06')
+                assert s.finalize_copy(b'\x06', nbytes) == tmp.squeeze(nbytes)
+                assert s.to_bytes() == before
+
+
+def test_sponge_reset():
+    s = KeccakSponge(512, 12)
+    s.absorb(ptn(1000))
+    s.pad(b'\x01')
+    s.squeeze(10)
+    s.reset()
+    assert s.to_bytes() == KeccakSponge(512, 12).to_bytes()
+
+
+def test_hash_reset():
+    h = sha3_256(b'foo')
+    h.reset()
+    assert h.digest() == sha3_256().digest()
+    h.update(b'abc')
+    assert h.hexdigest() == sha3_256(b'abc').hexdigest()
+    h.reinit(ptn(500))
+    assert h.digest() == sha3_256(ptn(500)).digest()
+
+    x = shake128(b'abc')
+    x.extract(10)
+    x.reinit(b'xyz')
+    assert x.extract(64) == shake128(b'xyz').extract(64)
+
+
+def test_prefix_reset():
+    objs = [
+        (lambda: cshake128(None, b'N', b'S'), b'data'),
+        (lambda: kmac128(b'key', None, b'S'), b'data'),
+        (lambda: kmac256_key(b'key').new(), b'data'),
+        (lambda: tuplehash128(None, b'S'), b'data'),
+    ]
+    for mk, data in objs:
+        h = mk()
+        h.update(b'garbage')
+        h.extract(5)
+        h.reset()
+        h.update(data)
+        ref = mk()
+        ref.update(data)
+        assert h.digest() == ref.digest()
+
+        # prefix survives copy and pickle
+        h2 = pickle.loads(pickle.dumps(h.copy()))
+        h2.reinit(data)
+        assert h2.digest() == ref.digest()
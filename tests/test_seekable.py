@@ -0,0 +1,81 @@
+"""Seekable stream cipher.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import struct
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.stream_cipher import KeccakSeekableCipher
+
+from .helpers import ptn
+
+SEGMENT = 1000
+
+
+def ref_keystream(key, nbytes):
+    # documented format
+    base = KeccakSponge(512)
+    base.absorb(key)
+    base.pad(b'\x01')
+    res = []
+    for i in range((nbytes + SEGMENT - 1) // SEGMENT):
+        s = base.copy()
+        s.absorb(struct.pack('<Q', i))
+        s.pad(b'\x01')
+        res.append(s.squeeze(SEGMENT))
+    return b''.join(res)[:nbytes]
+
+
+def xor(a, b):
+    return bytes(bytearray(x ^ y for x, y in zip(bytearray(a), bytearray(b))))
+
+
+def cipher():
+    c = KeccakSeekableCipher(512, SEGMENT)
+    c.add_initial_data(b'key+iv')
+    return c
+
+DATA = ptn(20000)
+ENC = xor(DATA, ref_keystream(b'key+iv', len(DATA)))
+
+
+def test_sequential():
+    c = cipher()
+    res = []
+    pos = 0
+    for n in (0, 1, 998, 1, 1000, 1500, 7000, 20000):
+        res.append(c.encrypt(DATA[pos : pos + n]))
+        pos += n
+    assert b''.join(res) == ENC
+    assert c.tell() == len(DATA)
+
+
+def test_seek():
+    c = cipher()
+    c.seek(12345)
+    assert c.decrypt(ENC[12345:13000]) == DATA[12345:13000]
+    buf = bytearray(ENC[999:3001])
+    c.seek(999)
+    c.decrypt_into(buf, buf)
+    assert bytes(buf) == DATA[999:3001]
+
+
+def test_range():
+    c = cipher()
+    for ofs, length in ((0, 10), (999, 2), (5000, 10000), (19990, 100), (12345, None)):
+        end = None if length is None else ofs + length
+        assert c.decrypt_range(ENC, ofs, length) == DATA[ofs:end]
+        assert c.encrypt_range(DATA, ofs, length) == ENC[ofs:end]
+    assert c.keystream(1500, 100) == xor(DATA[1500:1600], ENC[1500:1600])
+
+
+def test_executor():
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        return
+    c = cipher()
+    with ThreadPoolExecutor(4) as ex:
+        assert c.decrypt_range(ENC, 777, None, ex) == DATA[777:]
+        assert c.encrypt_range(DATA, 0, None, ex) == ENC
@@ -0,0 +1,121 @@
+"""C hash object.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import hashlib
+import io
+import pickle
+
+from spongeshaker.hashing import SpongeHash, SpongeHashInvalidState
+from spongeshaker.keccak import KeccakSponge, Sha3Hash
+from spongeshaker.sha3 import sha3_224, sha3_256, sha3_384, sha3_512, shake128, shake256
+from spongeshaker.sha3 import PAD_SHA3, PAD_SHAKE
+
+from .helpers import ptn
+
+
+def py_hash(capacity, bits, pad, name, rounds=24):
+    return SpongeHash(capacity, bits, None, name,
+                      lambda c: KeccakSponge(c, rounds), pad)
+
+
+def test_same_as_spongehash():
+    for cap, bits, pad in ((448, 224, PAD_SHA3), (512, 256, PAD_SHA3),
+                           (1024, 512, PAD_SHA3), (256, 1000 * 8, PAD_SHAKE)):
+        for rounds in (24, 12):
+            h = Sha3Hash(cap, bits, None, "X", pad, rounds)
+            ref = py_hash(cap, bits, pad, "X", rounds)
+            assert (h.name, h.block_size, h.digest_size) == (ref.name, ref.block_size, ref.digest_size)
+            for n in (0, 1, 71, 136, 5000):
+                h.update(ptn(n))
+                ref.update(ptn(n))
+                assert h.digest() == ref.digest()
+                assert h.hexdigest() == ref.hexdigest()
+            c = h.copy()
+            assert c.extract(3000) == ref.extract(3000)
+            assert c.extract(7) == ref.extract(7)
+            assert h.digest() == c.copy().__class__.from_bytes(h.to_bytes()).digest()
+
+
+def test_hashlib():
+    data = ptn(1000)
+    for func in (sha3_224, sha3_256, sha3_384, sha3_512):
+        h = func(data)
+        assert type(h) is Sha3Hash
+        ref = getattr(hashlib, func.__name__, None)
+        if ref:
+            assert h.hexdigest() == ref(data).hexdigest()
+    if hasattr(hashlib, 'shake_128'):
+        assert shake128(data).extract(100) == hashlib.shake_128(data).digest(100)
+        assert shake256(data).extract(100) == hashlib.shake_256(data).digest(100)
+
+
+def test_invalid_state():
+    h = shake128(b'abc')
+    h.extract(1)
+    for func, args in ((h.update, (b'x',)), (h.digest, ()), (h.hexdigest, ()),
+                       (h.update_from_file, (io.BytesIO(b'x'),))):
+        try:
+            func(*args)
+        except SpongeHashInvalidState:
+            pass
+        else:
+            raise AssertionError('SpongeHashInvalidState expected')
+    h.reset()
+    h.update(b'abc')
+    assert h.digest() == shake128(b'abc').digest()
+    h.reinit(b'x')
+    assert h.digest() == shake128(b'x').digest()
+
+
+def test_errors():
+    for args in ((511, 256), (512, 255), (512, 256, None, None, b'x' * 17), (512, 256, None, None, None, 3)):
+        try:
+            Sha3Hash(*args)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError expected: %r' % (args,))
+    h = sha3_256()
+    for bad in (u'text', 5):
+        try:
+            h.update(bad)
+        except TypeError:
+            pass
+        else:
+            raise AssertionError('TypeError expected')
+    try:
+        h.update()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('TypeError expected')
+
+
+def test_state_compat():
+    h = sha3_384(ptn(300))
+    ref = py_hash(768, 384, PAD_SHA3, "SHA3-384")
+    ref.update(ptn(300))
+    assert h.to_bytes() == ref.to_bytes()
+    assert SpongeHash.from_bytes(h.to_bytes()).digest() == h.digest()
+    assert Sha3Hash.from_bytes(ref.to_bytes()).digest() == h.digest()
+    for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+        t = pickle.loads(pickle.dumps(h, proto))
+        assert type(t) is Sha3Hash
+        assert t.name == "SHA3-384"
+        assert t.digest() == h.digest()
+    for bad in (b'', h.to_bytes()[:-1], h.to_bytes() + b'x'):
+        try:
+            Sha3Hash.from_bytes(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError expected')
+
+
+def test_file():
+    data = ptn(100000)
+    h = sha3_256()
+    h.update_from_file(io.BytesIO(data), bufsize=1000)
+    assert h.digest() == sha3_256(data).digest()
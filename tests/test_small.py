@@ -0,0 +1,170 @@
+"""Keccak-p with smaller widths.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import pickle
+
+from spongeshaker.keccak import KeccakSponge, KeccakSponge800, KeccakSponge400, KeccakSponge200
+from spongeshaker.hashing import SpongeHash
+from spongeshaker.prng import SpongePRNG
+from spongeshaker.sha3 import sha3_256
+from spongeshaker.spongewrap import SpongeWrap
+from spongeshaker.stream_cipher import SpongeStreamCipher
+from spongeshaker.util import sponge_from_bytes
+
+from .helpers import ptn
+
+# class, width, full rounds, capacity for tests
+CLASSES = ((KeccakSponge800, 800, 22, 256), (KeccakSponge400, 400, 20, 160),
+           (KeccakSponge200, 200, 18, 96))
+
+ROT = [0, 1, 62, 28, 27, 36, 44, 6, 55, 20, 3, 10, 43, 25, 39, 41, 45, 15, 21, 8, 18, 2, 61, 56, 14]
+
+
+def rc_bit(t):
+    # LFSR from FIPS 202, algorithm 5
+    r = 1
+    for _ in range(t % 255):
+        r <<= 1
+        if r & 0x100:
+            r ^= 0x171
+    return r & 1
+
+
+def ref_permute(state, w, rounds):
+    """Keccak-p[25*w, rounds] directly from spec, on bytearray."""
+    nb = w // 8
+    mask = (1 << w) - 1
+    rol = lambda v, n: ((v << (n % w)) | (v >> (w - n % w))) & mask
+    A = [sum(state[i * nb + j] << (8 * j) for j in range(nb)) for i in range(25)]
+    full = 12 + 2 * {8: 3, 16: 4, 32: 5, 64: 6}[w]
+    for ir in range(full - rounds, full):
+        C = [A[x] ^ A[x + 5] ^ A[x + 10] ^ A[x + 15] ^ A[x + 20] for x in range(5)]
+        A = [A[i] ^ C[(i + 4) % 5] ^ rol(C[(i + 1) % 5], 1) for i in range(25)]
+        B = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                B[y + 5 * ((2 * x + 3 * y) % 5)] = rol(A[x + 5 * y], ROT[x + 5 * y])
+        A = [B[i] ^ (~B[(i // 5) * 5 + (i + 1) % 5] & B[(i // 5) * 5 + (i + 2) % 5]) & mask
+             for i in range(25)]
+        for j in range(7):
+            if rc_bit(j + 7 * ir) and (1 << j) - 1 < w:
+                A[0] ^= 1 << ((1 << j) - 1)
+    return bytearray((v >> (8 * j)) & 0xFF for v in A for j in range(nb))
+
+
+def ref_sponge(width, capacity, rounds, data, pad, outlen):
+    rate = (width - capacity) // 8
+    st = bytearray(width // 8)
+    msg = bytearray(data) + bytearray(pad)
+    msg += bytearray(-len(msg) % rate)
+    msg[-1] ^= 0x80
+    for i in range(0, len(msg), rate):
+        for j in range(rate):
+            st[j] ^= msg[i + j]
+        st = ref_permute(st, width // 25, rounds)
+    out = bytearray()
+    while True:
+        out += st[:rate]
+        if len(out) >= outlen:
+            return bytes(out[:outlen])
+        st = ref_permute(st, width // 25, rounds)
+
+
+def test_reference():
+    # reference itself, against SHA3
+    data = ptn(200)
+    assert ref_sponge(1600, 512, 24, data, b'\x06', 32) == sha3_256(data).digest()
+
+    for cls, width, full, cap in CLASSES:
+        for c in (8, cap, width - 8):
+            for rounds in (full, 12, 1):
+                for n in (0, 1, (width - c) // 8, 77):
+                    s = cls(c, rounds)
+                    s.absorb(ptn(n))
+                    s.pad(b'\x01')
+                    assert s.squeeze(60) == ref_sponge(width, c, rounds, ptn(n), b'\x01', 60)
+
+
+def test_attributes():
+    for cls, width, full, cap in CLASSES:
+        s = cls(cap)
+        assert isinstance(s, KeccakSponge)
+        assert s.rounds == full
+        assert (s.capacity, s.rate) == (cap, width - cap)
+        assert s.name == 'Keccak%d-%d' % (width, cap)
+        assert cls(64, 12).name == 'Keccak%d-64-r12' % width
+        assert type(s.copy()) is cls
+        for args in ((width,), (0,), (12,), (64, full + 1), (64, 0)):
+            try:
+                cls(*args)
+                assert False
+            except ValueError:
+                pass
+    assert KeccakSponge(512).name == 'Keccak1600-512'
+
+
+def test_state():
+    for cls, width, full, cap in CLASSES:
+        s = cls(cap, full - 2)
+        s.absorb(ptn(33))
+        data = s.to_bytes()
+        assert len(data) == 6 + width // 8
+        for t in (sponge_from_bytes(data), cls.from_bytes(data), pickle.loads(pickle.dumps(s))):
+            assert type(t) is cls
+            assert (t.capacity, t.rounds, t.pos) == (s.capacity, s.rounds, s.pos)
+            assert t.squeeze(40) == s.copy().squeeze(40)
+        for other in (KeccakSponge, KeccakSponge800, KeccakSponge200):
+            if other is not cls:
+                try:
+                    other.from_bytes(data)
+                    assert False
+                except ValueError:
+                    pass
+    assert type(sponge_from_bytes(KeccakSponge(512).to_bytes())) is KeccakSponge
+
+
+def test_modes():
+    for cls, width, full, cap in CLASSES:
+        h = SpongeHash(cap, 128, ptn(100), sponge_class=cls, padding=b'\x06')
+        assert h.digest() == ref_sponge(width, cap, full, ptn(100), b'\x06', 16)
+        assert SpongeHash.from_bytes(h.to_bytes()).digest() == h.digest()
+
+        rng = SpongePRNG(cls(cap))
+        rng.add_entropy(b'seed')
+        rng2 = pickle.loads(pickle.dumps(rng))
+        assert rng.get_random_bytes(50) == rng2.get_random_bytes(50)
+
+        c1 = SpongeStreamCipher(cls(cap))
+        c1.add_initial_data(b'key')
+        c2 = SpongeStreamCipher(cls(cap))
+        c2.add_initial_data(b'key')
+        assert c2.decrypt(c1.encrypt(ptn(300))) == ptn(300)
+
+        w1 = SpongeWrap(cap, cls)
+        w1.add_header(b'key')
+        w2 = SpongeWrap.from_bytes(w1.to_bytes())
+        enc = w1.encrypt_body(ptn(200))
+        assert w2.decrypt_body(enc) == ptn(200)
+        assert w1.digest(16) == w2.digest(16)
+
+
+def test_block_paths():
+    # whole-block paths must match byte-at-a-time processing
+    data = ptn(3000)
+    for cls, cap in ((KeccakSponge, 512), (KeccakSponge, 8), (KeccakSponge, 1600 - 72),
+                     (KeccakSponge800, 256), (KeccakSponge200, 96)):
+        for ofs in (0, 1, 7):
+            s1, s2 = cls(cap), cls(cap)
+            s1.absorb(data[ofs:])
+            for i in range(ofs, len(data), 101):
+                s2.absorb(data[i:i + 101])
+            s1.pad(b'\x06')
+            s2.pad(b'\x06')
+            s3 = s1.copy()
+            out = s1.squeeze(2000)
+            assert b''.join(s2.squeeze(n) for n in (3, 997, 1000)) == out
+            src = data[ofs:ofs + 2000]
+            xored = s3.squeeze_xor(src)
+            assert xored == bytes(bytearray(a ^ b for a, b in zip(bytearray(out), bytearray(src))))
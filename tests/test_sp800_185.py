@@ -0,0 +1,93 @@
+r"""SP 800-185 functions.
+
+Values from NIST SP 800-185 examples.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.sp800_185 import (
+    cshake128, cshake256, kmac128, kmac256, kmac128_key, kmac256_key,
+    tuplehash128, tuplehash256, parallelhash128, parallelhash256)
+from spongeshaker.sha3 import shake128
+from spongeshaker.util import fromhex
+
+from .helpers import ptn
+
+
+SAMPLE = bytes(bytearray(list(range(0x00, 0x08)) + list(range(0x10, 0x18)) + list(range(0x20, 0x28))))
+
+KEY = bytes(bytearray(range(0x40, 0x60)))
+
+
+def test_cshake():
+    r"""
+    >>> cshake128(fromhex('00010203'), b'', b'Email Signature').hexdigest()
+    'c1c36925b6409a04f1b504fcbca9d82b4017277cb5ed2b2065fc1d3814d5aaf5'
+    >>> cshake128(b'abc').digest() == shake128(b'abc').digest()
+    True
+    """
+
+def test_kmac():
+    r"""
+    >>> kmac128(KEY, fromhex('00010203')).hexdigest()
+    'e5780b0d3ea6f7d3a429c5706aa43a00fadbd7d49628839e3187243f456ee14e'
+    >>> kmac128(KEY, fromhex('00010203'), b'My Tagged Application').hexdigest()
+    '3b1fba963cd8b0b59e8c1a6d71888b7143651af8ba0a7070c0979e2811324aa5'
+    >>> h = kmac256(KEY, ptn(200), b'My Tagged Application')
+    >>> h.extract(64) == fromhex('d5be731c954ed7732846bb59dbe3a8e30f83e77a4bff4459f2f1c2b4ecebb8ce67ba01c62e8ab8578d2d499bd1bb276768781190020a306a97de281dcc30305d')
+    True
+    """
+
+def test_kmac_key():
+    key = kmac128_key(KEY, b'app')
+    for n in (0, 1, 167, 168, 1000):
+        exp = kmac128(KEY, ptn(n), b'app').digest()
+        assert key.mac(ptn(n)) == exp
+        h = key.new()
+        h.update(ptn(n))
+        assert h.digest() == exp
+        assert h.copy().digest() == exp
+    key = kmac256_key(KEY, digest_size=256)
+    assert key.mac(b'x') == kmac256(KEY, b'x', digest_size=256).digest()
+    assert key.mac(b'x', 128) == kmac256(KEY, b'x', digest_size=128).digest()
+
+def test_tuplehash():
+    r"""
+    >>> tuplehash128([fromhex('000102'), fromhex('101112131415')]).hexdigest()
+    'c5d8786c1afb9b82111ab34b65b2c0048fa64e6d48e263264ce1707d3ffc8ed1'
+    >>> tuplehash256([b'ab', b'c']).digest() == tuplehash256([b'a', b'bc']).digest()
+    False
+    """
+
+def test_parallelhash():
+    r"""
+    >>> parallelhash128(SAMPLE, 8).hexdigest()
+    'ba8dc1d1d979331d3f813603c67f72609ab5e44b94a0b8f9af46514454a2b4f5'
+    >>> parallelhash256(SAMPLE, 8).hexdigest()
+    'bc1ef124da34495e948ead207dd9842235da432d2bbc54b4c110e64c451105531b7f2a3e0ce055c02805e7c2de1fb746af97a1dd01f43b824e31b87612410429'
+    """
+
+def test_parallelhash_split():
+    data = ptn(100003)
+    exp = parallelhash128(data, 1000, b'split').digest()
+    for step in (999, 1000, 1001, 30000):
+        h = parallelhash128(None, 1000, b'split')
+        for i in range(0, len(data), step):
+            h.update(data[i : i + step])
+        assert h.digest() == exp, step
+
+def test_parallelhash_executor():
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+    except ImportError:
+        return
+    data = ptn(300001)
+    exp = parallelhash256(data, 1000).digest()
+    with ThreadPoolExecutor(4) as ex:
+        assert parallelhash256(data, 1000, executor=ex).digest() == exp
+
+def test_parallelhash_xof():
+    h = parallelhash128(ptn(5000), 100)
+    out = h.extract(10) + h.extract(20)
+    assert out == parallelhash128(ptn(5000), 100).extract(30)
+    assert out != parallelhash128(ptn(5000), 100, digest_size=240).digest()
@@ -0,0 +1,79 @@
+"""SpongeWrap block processing in C.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.spongewrap import SpongeWrap
+
+from .helpers import ptn
+
+PAD = b'\x03'
+
+
+def ref_wrap(sponge, data, func):
+    # block loop as done in Python before
+    res = []
+    dpos = 0
+    maxbytes = sponge.rbytes - 1
+    while dpos < len(data):
+        avail = maxbytes - sponge.pos
+        if avail == 0:
+            sponge.pad(PAD)
+            continue
+        n = min(avail, len(data) - dpos)
+        res.append(func(sponge, data[dpos : dpos + n]))
+        dpos += n
+    return b''.join(r or b'' for r in res)
+
+
+def test_wrap_ops():
+    for cap in (256, 512, 1584):
+        for size in (0, 1, 8, 135, 136, 137, 1000):
+            data = ptn(size)
+            for name in ('absorb', 'encrypt', 'decrypt'):
+                a = KeccakSponge(cap)
+                a.absorb(b'key' * 50)
+                b = a.copy()
+                res = getattr(a, 'wrap_' + name)(data, PAD)
+                exp = ref_wrap(b, data, getattr(KeccakSponge, name))
+                if name != 'absorb':
+                    assert res == exp, (cap, size, name)
+                assert a.squeeze(32) == b.squeeze(32), (cap, size, name)
+
+
+def test_wrap_into():
+    s = KeccakSponge(512)
+    exp = s.copy().wrap_encrypt(ptn(1000), PAD)
+    buf = bytearray(ptn(1000))
+    s.wrap_encrypt_into(buf, buf, PAD)
+    assert bytes(buf) == exp
+    s = KeccakSponge(512)
+    s.wrap_decrypt_into(buf, buf, PAD)
+    assert bytes(buf) == ptn(1000)
+    try:
+        s.wrap_encrypt_into(ptn(10), bytearray(5), PAD)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('ValueError expected')
+
+
+def test_roundtrip():
+    w = SpongeWrap(512)
+    w.add_header(ptn(300))
+    enc = w.encrypt_body(ptn(5000))
+    tag = w.digest(16)
+    w = SpongeWrap(512)
+    w.add_header(ptn(300))
+    assert w.decrypt_body(enc) == ptn(5000)
+    assert w.digest(16) == tag
+
+
+def test_small_rate():
+    try:
+        SpongeWrap(1592).add_header(b'x')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('ValueError expected')
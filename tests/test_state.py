@@ -0,0 +1,109 @@
+"""Exporting and importing state.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import pickle
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.k12 import turboshake128
+from spongeshaker.prng import KeccakPRNG
+from spongeshaker.sha3 import sha3_256, shake256
+from spongeshaker.sp800_185 import tuplehash128, kmac128
+from spongeshaker.spongewrap import SpongeWrap
+from spongeshaker.stream_cipher import KeccakStreamCipher
+from spongeshaker.util import pack_state, unpack_state
+
+from .helpers import ptn
+
+
+def roundtrips(obj):
+    yield obj.__class__.from_bytes(obj.to_bytes())
+    for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+        yield pickle.loads(pickle.dumps(obj, proto))
+
+
+def test_sponge():
+    s = KeccakSponge(256, 12)
+    s.absorb(ptn(1000))
+    data = s.to_bytes()
+    assert len(data) == 206
+    for t in roundtrips(s):
+        assert type(t) is KeccakSponge
+        assert (t.capacity, t.rounds, t.pos) == (256, 12, s.pos)
+        assert t.squeeze(300) == s.copy().squeeze(300)
+
+    for bad in (b'', data[:-1], b'\x02' + data[1:], data[:5] + b'\xff' + data[6:]):
+        try:
+            KeccakSponge.from_bytes(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('ValueError expected')
+
+
+def test_hash_resume():
+    h = sha3_256(ptn(5000))
+    for t in roundtrips(h):
+        t.update(b'more')
+        assert t.name == 'SHA3-256'
+        assert t.digest() == sha3_256(ptn(5000) + b'more').digest()
+
+    for h in (shake256(ptn(100)), turboshake128(ptn(100)), tuplehash128([b'a', b'b'])):
+        h2 = h.copy()
+        h2.extract(10)
+        for t in roundtrips(h):
+            assert type(t) is type(h)
+            assert t.digest() == h.digest()
+        for t in roundtrips(h2):
+            assert t.extract(20) == h2.copy().extract(20)
+
+
+def test_prng():
+    p = KeccakPRNG()
+    p.add_entropy(b'seed')
+    p.get_random_bytes(10)
+    state = p.to_bytes()
+    exp = p.get_random_bytes(100)
+    for t in roundtrips(KeccakPRNG.from_bytes(state)):
+        assert type(t) is KeccakPRNG
+        assert t.get_random_bytes(100) == exp
+
+
+def test_stream_cipher():
+    c = KeccakStreamCipher()
+    c.add_initial_data(b'key')
+    c.encrypt(ptn(100))
+    state = c.to_bytes()
+    exp = c.encrypt(ptn(1000))
+    for t in roundtrips(KeccakStreamCipher.from_bytes(state)):
+        assert t.encrypt(ptn(1000)) == exp
+
+
+def test_spongewrap():
+    w = SpongeWrap(512)
+    w.add_header(b'hdr')
+    w.encrypt_body(ptn(300))
+    state = w.to_bytes()
+    exp = w.encrypt_body(ptn(300)) + w.digest(16)
+    for t in roundtrips(SpongeWrap.from_bytes(state)):
+        assert t.encrypt_body(ptn(300)) + t.digest(16) == exp
+    t = SpongeWrap.from_bytes(w.to_bytes())
+    try:
+        t.add_header(b'x')
+    except Exception:
+        pass
+    else:
+        raise AssertionError('digest state not restored')
+
+
+def test_pack_state():
+    fields = [b'', ptn(10), ptn(0xFFFF)]
+    assert unpack_state(pack_state(3, *fields), 3, 3) == fields
+    for func in (lambda: pack_state(3, ptn(0x10000)), kmac128(ptn(0x10000)).to_bytes):
+        try:
+            func()
+        except ValueError as e:
+            assert 'too long' in str(e)
+        else:
+            raise AssertionError('ValueError expected')
@@ -0,0 +1,214 @@
+"""STROBE protocol framework.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import pickle
+import random
+import struct
+
+from spongeshaker.keccak import KeccakSponge
+from spongeshaker.strobe import (Strobe, AuthenticationFailed, FLAG_I, FLAG_A, FLAG_C, FLAG_T,
+                                 FLAG_M, OP_AD, OP_KEY, OP_PRF, OP_SEND_CLR, OP_RECV_CLR,
+                                 OP_SEND_ENC, OP_RECV_ENC, OP_SEND_MAC, OP_RECV_MAC, OP_RATCHET)
+from spongeshaker.util import tohex
+
+from .helpers import ptn
+
+OPS = (OP_AD, OP_KEY, OP_PRF, OP_SEND_CLR, OP_RECV_CLR, OP_SEND_ENC, OP_RECV_ENC,
+       OP_SEND_MAC, OP_RECV_MAC, OP_RATCHET)
+
+
+def keccak_f(st):
+    # permute raw state via sponge serialization
+    sp = KeccakSponge.from_bytes(bytes(bytearray([1, 200, 0, 1, 24, 0]) + bytes(st)))
+    sp.pad(b'')
+    return bytearray(sp.to_bytes()[6:])
+
+
+class RefStrobe(object):
+    """Reference from STROBE v1.0.2 spec, byte at a time."""
+    R = 166
+
+    def __init__(self, proto):
+        self.st = bytearray(200)
+        domain = bytearray([1, self.R + 2, 1, 0, 1, 12 * 8]) + bytearray(b'STROBEv1.0.2')
+        self.st[:len(domain)] = domain
+        self.st = keccak_f(self.st)
+        self.pos = self.posbegin = 0
+        self.i0 = None
+        self.cur_flags = None
+        self.operate(FLAG_A | FLAG_M, proto)
+
+    def run_f(self):
+        self.st[self.pos] ^= self.posbegin
+        self.st[self.pos + 1] ^= 0x04
+        self.st[self.R + 1] ^= 0x80
+        self.st = keccak_f(self.st)
+        self.pos = self.posbegin = 0
+
+    def duplex(self, data, cbefore=False, cafter=False, force_f=False):
+        data = bytearray(data)
+        for i in range(len(data)):
+            if cbefore:
+                data[i] ^= self.st[self.pos]
+            self.st[self.pos] ^= data[i]
+            if cafter:
+                data[i] = self.st[self.pos]
+            self.pos += 1
+            if self.pos == self.R:
+                self.run_f()
+        if force_f and self.pos != 0:
+            self.run_f()
+        return data
+
+    def begin_op(self, flags):
+        if flags & FLAG_T:
+            if self.i0 is None:
+                self.i0 = flags & FLAG_I
+            flags ^= self.i0
+        old_begin, self.posbegin = self.posbegin, self.pos + 1
+        self.duplex([old_begin, flags], force_f=flags & FLAG_C)
+
+    def operate(self, flags, data, more=False):
+        if more:
+            assert flags == self.cur_flags
+        else:
+            self.begin_op(flags)
+            self.cur_flags = flags
+        if (flags & (FLAG_I | FLAG_T)) != (FLAG_I | FLAG_T) and (flags & (FLAG_I | FLAG_A)) != FLAG_A:
+            data = bytearray(data)
+        cafter = (flags & (FLAG_C | FLAG_I | FLAG_T)) == (FLAG_C | FLAG_T)
+        cbefore = bool(flags & FLAG_C) and not cafter
+        res = self.last = self.duplex(data, cbefore, cafter)
+        if (flags & (FLAG_I | FLAG_A)) == (FLAG_I | FLAG_A) or (flags & (FLAG_I | FLAG_T)) == FLAG_T:
+            return bytes(res)
+        elif (flags & (FLAG_I | FLAG_A | FLAG_T)) == (FLAG_I | FLAG_T):
+            if any(bytearray(res)):
+                raise AuthenticationFailed()
+        return None
+
+
+def test_merlin():
+    # Merlin transcript test vector, Merlin uses STROBE-128
+    s = Strobe(b'Merlin v1.0')
+
+    def append(label, msg):
+        s.meta_ad(label)
+        s.meta_ad(struct.pack('<I', len(msg)), True)
+        s.ad(msg)
+
+    append(b'dom-sep', b'test protocol')
+    append(b'some label', b'some data')
+    s.meta_ad(b'challenge')
+    s.meta_ad(struct.pack('<I', 32), True)
+    assert tohex(s.prf(32)) == 'd5a21972d0d5fe320c0d263fac7fffb8145aa640af6e9bca177c03c7efcf0615'
+
+
+def test_reference():
+    rnd = random.Random(5)
+    for proto in (b'', b'proto', ptn(400)):
+        s = Strobe(proto)
+        ref = RefStrobe(proto)
+        flags = None
+        for _ in range(300):
+            if flags is None or rnd.random() < 0.7:
+                flags = rnd.choice(OPS) | rnd.choice((0, FLAG_M))
+                more = False
+            else:
+                more = True
+            n = rnd.choice((0, 1, 2, 16, 165, 166, 167, 400))
+            data = bytes(bytearray(rnd.getrandbits(8) for i in range(n)))
+            if flags & ~FLAG_M == OP_RECV_MAC:
+                # checking zeroes on copy gives valid MAC
+                tmp = RefStrobe.__new__(RefStrobe)
+                tmp.__dict__.update(ref.__dict__, st=bytearray(ref.st))
+                try:
+                    tmp.operate(flags, bytes(n), more)
+                except AuthenticationFailed:
+                    pass
+                if rnd.random() < 0.5:
+                    data = bytes(tmp.last)
+            if flags & (FLAG_I | FLAG_T) != (FLAG_I | FLAG_T) and flags & (FLAG_I | FLAG_A) != FLAG_A:
+                data = n
+            try:
+                exp = ref.operate(flags, data, more)
+            except AuthenticationFailed:
+                exp = AuthenticationFailed
+            try:
+                got = s.operate(flags, data, more)
+            except AuthenticationFailed:
+                got = AuthenticationFailed
+            assert got == exp
+            assert s.to_bytes()[5:] == bytes(ref.st)
+
+
+def test_named_ops():
+    a, b = Strobe(b'test'), Strobe(b'test')
+    for s in (a, b):
+        s.key(b'key')
+        s.ad(b'ad')
+        s.meta_ad(b'meta')
+    assert a.prf(16) == b.prf(16)
+    assert a.send_clr(b'hello') == b'hello'
+    assert b.recv_clr(b'hello') == b'hello'
+    ct = a.send_enc(b'secret')
+    ct += a.send_enc(ptn(300), True)
+    assert ct != b'secret' + ptn(300)
+    assert b.recv_enc(ct[:3]) + b.recv_enc(ct[3:], True) == b'secret' + ptn(300)
+    a.meta_send_clr(b'hdr')
+    b.meta_recv_clr(b'hdr')
+    mac = a.send_mac(16)
+    try:
+        b.copy().recv_mac(mac[:-1] + b'\x00')
+        assert False
+    except AuthenticationFailed:
+        pass
+    assert b.recv_mac(mac) is None
+    a.ratchet(32)
+    b.ratchet(32)
+    assert a.prf(8) == b.prf(8)
+
+    try:
+        a.ad(b'x', True)
+        assert False
+    except ValueError:
+        pass
+    for bad in (FLAG_C | FLAG_A | FLAG_T | FLAG_I | 0x20, FLAG_T, 0):
+        try:
+            a.operate(bad, b'x')
+            assert False
+        except ValueError:
+            pass
+    try:
+        a.prf(-1)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_state():
+    s = Strobe(b'state')
+    s.key(ptn(200))
+    s.send_clr(b'x')
+    for t in (s.copy(), Strobe.from_bytes(s.to_bytes()), pickle.loads(pickle.dumps(s))):
+        assert type(t) is Strobe
+        assert t.to_bytes() == s.to_bytes()
+        assert t.copy().recv_enc(ptn(50)) == s.copy().recv_enc(ptn(50))
+    for data in (s.to_bytes()[:-1], b'\x02' + s.to_bytes()[1:]):
+        try:
+            Strobe.from_bytes(data)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_subclass():
+    class MyStrobe(Strobe):
+        pass
+    s = MyStrobe(b'sub')
+    s.key(b'key')
+    t = s.copy()
+    assert type(t) is MyStrobe
+    assert t.prf(16) == s.prf(16)
+    del t
@@ -0,0 +1,128 @@
+"""Tree hash.
+"""
+
+from __future__ import division, absolute_import, print_function
+
+import os
+import pickle
+import struct
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from spongeshaker.sha3 import shake128, shake256
+from spongeshaker.treehash import TreeHash, tree_hash
+
+from .helpers import ptn
+
+CHUNK = 1000
+
+
+def ref_tree(data, chunk_size=CHUNK, shake=shake128):
+    # documented format
+    cvlen = 32 if shake is shake128 else 64
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    cvs = b''.join(shake(c + b'\x00').extract(cvlen) for c in chunks)
+    info = struct.pack('<QQQ', len(chunks), chunk_size, len(data))
+    return shake(cvs + info + b'\x01').extract(cvlen)
+
+
+def test_format():
+    for n in (0, 1, CHUNK - 1, CHUNK, CHUNK + 1, 5 * CHUNK, 17 * CHUNK + 3):
+        data = ptn(n)
+        assert tree_hash(data, chunk_size=CHUNK).digest() == ref_tree(data)
+        assert tree_hash(data, 512, CHUNK).digest() == ref_tree(data, shake=shake256)
+    th = tree_hash(b'', digest_size=128)
+    assert len(th.digest()) == 16
+    assert th.chunk_count == 0
+
+
+def test_batches():
+    data = ptn(40 * CHUNK + 7)
+    exp = ref_tree(data)
+    for batch in (1, 3, 16, 100):
+        th = TreeHash(chunk_size=CHUNK)
+        th.update(data, batch=batch)
+        assert th.digest() == exp
+
+
+def test_incremental():
+    data = bytearray(ptn(20 * CHUNK + 500))
+    th = tree_hash(data, chunk_size=CHUNK)
+
+    data[5 * CHUNK + 10] ^= 1
+    data[12 * CHUNK - 1] ^= 1
+    th.update(data, [(5 * CHUNK + 10, 1), (12 * CHUNK - 1, 1)])
+    assert th.digest() == ref_tree(bytes(data))
+
+    # change outside given ranges is not noticed
+    stale = th.leaf_digest(2)
+    data[2 * CHUNK] ^= 1
+    th.update(data, [])
+    assert th.leaf_digest(2) == stale
+    th.update(data, [(2 * CHUNK, 1)])
+    assert th.digest() == ref_tree(bytes(data))
+
+    # append and truncate
+    data += ptn(3 * CHUNK)
+    th.update(data, [])
+    assert th.digest() == ref_tree(bytes(data))
+    del data[7 * CHUNK + 3:]
+    th.update(data, [])
+    assert th.digest() == ref_tree(bytes(data))
+    del data[7 * CHUNK:]
+    th.update(data, [])
+    assert th.chunk_count == 7
+    assert th.digest() == ref_tree(bytes(data))
+
+
+def test_executor():
+    data = ptn(50 * CHUNK + 1)
+    exp = ref_tree(data)
+    with ThreadPoolExecutor(2) as ex:
+        th = TreeHash(chunk_size=CHUNK)
+        th.update(data, executor=ex, batch=3, max_pending=2)
+        assert th.digest() == exp
+
+
+def test_file():
+    data = ptn(30 * CHUNK + 11)
+    fd, fn = tempfile.mkstemp()
+    try:
+        os.write(fd, data)
+        os.close(fd)
+        assert tree_hash(fn, chunk_size=CHUNK).digest() == ref_tree(data)
+        with ThreadPoolExecutor(2) as ex:
+            assert tree_hash(fn, chunk_size=CHUNK, executor=ex).digest() == ref_tree(data)
+        with ProcessPoolExecutor(2) as ex:
+            th = TreeHash(chunk_size=CHUNK)
+            th.update(fn, executor=ex, batch=4)
+            assert th.digest() == ref_tree(data)
+
+        with open(fn, 'wb'):
+            pass
+        assert tree_hash(fn, chunk_size=CHUNK).digest() == ref_tree(b'')
+    finally:
+        os.remove(fn)
+
+
+def test_state():
+    data = ptn(9 * CHUNK + 100)
+    th = tree_hash(data, 512, CHUNK, 384)
+    th2 = TreeHash.from_bytes(th.to_bytes())
+    assert th2.digest() == th.digest()
+    assert len(th2.digest()) == 48
+    th3 = pickle.loads(pickle.dumps(th))
+    assert th3.hexdigest() == th.hexdigest()
+
+    # cached index continues incrementally
+    data = data[:4 * CHUNK] + b'x' + data[4 * CHUNK + 1:]
+    th2.update(data, [(4 * CHUNK, 1)])
+    assert th2.digest() == ref_tree(data, shake=shake256)[:48]
+    assert th2.digest() == tree_hash(data, 512, CHUNK, 384).digest()
+
+    try:
+        TreeHash.from_bytes(th.to_bytes()[:-1])
+        assert False
+    except ValueError:
+        pass